@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class PostsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'posts'
+
+    def ready(self):
+        from django.core import checks
+        from django.db.models.signals import post_migrate
+
+        from . import dbrouting, signals
+
+        post_migrate.connect(signals.ensure_search_index, sender=self)
+        checks.register(dbrouting.check_sticky_cache)
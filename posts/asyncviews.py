@@ -0,0 +1,165 @@
+# posts/asyncviews.py
+"""
+Async-native read path for ASGI deployments.
+
+With settings.ASYNC_READS on (opt-in: DJANGO_ASYNC_READS=1 under ASGI), the list /
+retrieve routes of viewsets using AsyncReadMixin are coroutines: authentication,
+the page query, per-viewer flags, conditional GET and the response cache go
+through the async ORM (aiterator / acount / afirst) and the cache's async API, so
+a request waiting on I/O doesn't hold a worker thread.
+
+Everything else -- writes, HEAD, custom actions, the browsable API -- runs the
+regular DRF view through sync_to_async, exactly as Django would for a sync view.
+Under WSGI (ASYNC_READS off) as_view() returns the plain DRF view.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse
+from rest_framework.exceptions import APIException
+
+from .instrumentation import phase
+from .previews import QUERY_PARAM as COMMENTS_PREVIEW, CommentPreviews
+from .viewer import ViewerState
+
+# DRF action -> async handler
+ASYNC_ACTIONS = {"list": "alist", "retrieve": "aretrieve"}
+
+
+def enabled():
+    return getattr(settings, "ASYNC_READS", False)
+
+
+class AsyncReadMixin:
+    """
+    Serves ASYNC_ACTIONS with coroutine handlers when ASYNC_READS is on.
+    The handlers themselves live next to their sync twins (ConditionalGetMixin.alist,
+    ResponseCacheMixin.alist, ...); this mixin provides the async dispatch and the
+    async versions of the GenericAPIView hooks they call.
+    """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if not enabled() or not any(action in ASYNC_ACTIONS for action in actions.values()):
+            return view
+        sync_view = sync_to_async(view)
+
+        async def async_view(request, *args, **kwargs):
+            action = actions.get(request.method.lower())
+            if action in ASYNC_ACTIONS:
+                self = cls(**initkwargs)
+                self.action_map = actions
+                response = await self.adispatch(request, ASYNC_ACTIONS[action], *args, **kwargs)
+                if response is not None:
+                    return response
+            return await sync_view(request, *args, **kwargs)
+
+        # cls / initkwargs / actions / csrf_exempt, as routers and schema generators expect
+        async_view.__dict__.update(view.__dict__)
+        async_view.__name__ = view.__name__
+        async_view.__doc__ = view.__doc__
+        return async_view
+
+    # -------- dispatch --------
+    async def adispatch(self, request, handler_name, *args, **kwargs):
+        """
+        APIView.dispatch for one async handler. Returns None when the negotiated
+        renderer isn't JSON (the browsable API renders forms from the database),
+        so the caller can fall back to the sync view.
+        """
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            if not await self.ainitial(request, *args, **kwargs):
+                return None
+            response = await getattr(self, handler_name)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        # render here and hand Django a plain HttpResponse: a template response
+        # would cost two more thread hops (template-response middleware + render)
+        with phase("render"):
+            self.response.render()
+        plain = HttpResponse(self.response.content, status=self.response.status_code)
+        for name, value in self.response.items():
+            plain[name] = value
+        return plain
+
+    async def ainitial(self, request, *args, **kwargs):
+        self.format_kwarg = self.get_format_suffix(**kwargs)
+        renderer, media_type = self.perform_content_negotiation(request)
+        if renderer.format != "json":
+            return False
+        request.accepted_renderer, request.accepted_media_type = renderer, media_type
+        request.version, request.versioning_scheme = self.determine_version(request, *args, **kwargs)
+
+        with phase("auth"):
+            await self.aperform_authentication(request)
+            self.check_permissions(request)
+            self.check_throttles(request)
+        return True
+
+    async def aperform_authentication(self, request):
+        """Request._authenticate, awaiting authenticators that have `aauthenticate`."""
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, "aauthenticate"):
+                    user_auth = await authenticator.aauthenticate(request)
+                else:
+                    user_auth = await sync_to_async(authenticator.authenticate)(request)
+            except APIException:
+                request._not_authenticated()
+                raise
+            if user_auth is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth
+                return
+        request._not_authenticated()
+
+    # -------- GenericAPIView hooks --------
+    async def aget_queryset(self):
+        """The (lazy) queryset; override when building it needs database lookups."""
+        return self.get_queryset()
+
+    async def aget_object(self):
+        queryset = self.filter_queryset(await self.aget_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]}).afirst()
+        except (TypeError, ValueError, ValidationError):
+            obj = None
+        if obj is None:
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        with phase("queryset"):
+            return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+
+    async def aprepare_serializer(self, serializer, rows):
+        """Resolve up front anything the serializer would otherwise query synchronously."""
+
+
+class AsyncPostReadMixin(AsyncReadMixin):
+    """Post endpoints: per-viewer flags (and comment previews) for the page are resolved concurrently."""
+
+    async def aprepare_serializer(self, serializer, rows):
+        fields = serializer.child.fields if hasattr(serializer, "child") else serializer.fields
+        n = serializer.context.get(COMMENTS_PREVIEW)
+        if not n:
+            serializer.context["viewer_state"] = await ViewerState.afor_posts(self.request.user, rows, flags=fields)
+            return
+        serializer.context["viewer_state"], serializer.context["comment_previews"] = await asyncio.gather(
+            ViewerState.afor_posts(self.request.user, rows, flags=fields), CommentPreviews.afor_posts(rows, n)
+        )
@@ -0,0 +1,389 @@
+# posts/benchmarks.py
+"""
+Endpoint benchmarks with per-endpoint SQL query budgets.
+
+Each endpoint is hit `iterations` times through the Django test client as an
+authenticated viewer; we record p50/p95/p99 latency and the query count. A run
+fails when an endpoint exceeds its query budget, or when its p95 is more than
+`threshold` slower than in a stored baseline.
+
+`serve` measures the deployment side instead: the read endpoints under N concurrent
+clients, driven through the real WSGI handler (one thread per client, like a
+threaded WSGI worker) or the real ASGI handler (one task per client on one event
+loop), reporting throughput, latency percentiles and the worker's peak thread count.
+
+`sketch_accuracy` measures the trending counters (posts/trending.py) on a synthetic
+Zipf-distributed event stream: memory, estimation error against exact counts,
+top-k recall and ingest rate for a given sketch WIDTH / DEPTH.
+
+`ratelimit_overhead` times the write rate limiter's decision (posts/ratelimit.py)
+per store, alone and from concurrent threads.
+"""
+import asyncio
+import json
+import platform
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Callable, Optional
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import ratelimit, trending
+from .models import Post, Like, Bookmark
+
+
+@dataclass
+class Endpoint:
+    name: str
+    method: str
+    path: Callable[[dict], str]
+    budget: int  # max SQL queries per request
+    teardown: Optional[Callable[[dict], None]] = None  # untimed, after each request
+
+
+ENDPOINTS = [
+    Endpoint("feed", "get", lambda ctx: "/api/feed/", budget=5),
+    Endpoint("feed_top", "get", lambda ctx: "/api/feed/?rank=top", budget=5),
+    Endpoint("feed_comments_preview", "get", lambda ctx: "/api/feed/?comments_preview=3", budget=6),
+    Endpoint("posts_list", "get", lambda ctx: "/api/posts/", budget=5),
+    Endpoint("posts_search", "get", lambda ctx: "/api/posts/?q=seed", budget=5),
+    Endpoint("post_detail", "get", lambda ctx: f"/api/posts/{ctx['post_id']}/", budget=5),
+    Endpoint("comments_by_post", "get", lambda ctx: f"/api/comments/?post={ctx['post_id']}", budget=3),
+    Endpoint("bookmarks", "get", lambda ctx: "/api/posts/bookmarks/", budget=5),
+    Endpoint("likers", "get", lambda ctx: f"/api/posts/{ctx['post_id']}/likes/", budget=3),
+    Endpoint("likers_summary", "get", lambda ctx: f"/api/posts/{ctx['post_id']}/likes/?summary=1", budget=3),
+    Endpoint("user_profile", "get", lambda ctx: f"/api/users/{ctx['user_id']}/", budget=2),
+    Endpoint("followers", "get", lambda ctx: f"/api/users/{ctx['user_id']}/followers/", budget=3),
+    Endpoint("tag_posts", "get", lambda ctx: "/api/tags/bench/posts/", budget=5),
+    Endpoint("trending_posts", "get", lambda ctx: "/api/trending/posts/?window=24h", budget=5),
+    Endpoint("trending_tags", "get", lambda ctx: "/api/trending/tags/?window=24h", budget=1),
+    Endpoint(
+        "like", "post", lambda ctx: f"/api/posts/{ctx['post_id']}/like/", budget=10,
+        teardown=lambda ctx: _undo(Like, ctx),
+    ),
+    Endpoint(
+        "bookmark", "post", lambda ctx: f"/api/posts/{ctx['post_id']}/bookmark/", budget=10,
+        teardown=lambda ctx: _undo(Bookmark, ctx),
+    ),
+]
+
+
+def _undo(model, ctx):
+    model.objects.filter(user_id=ctx["user_id"], post_id=ctx["post_id"]).delete()
+    # the limiter stays on the timed path, but repeated runs never hit the limit
+    limiter = ratelimit.get_limiter()
+    if limiter is not None:
+        limiter.refill(f"user:{ctx['user_id']}")
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered))) - 1))]
+
+
+def default_context():
+    """Busiest viewer (most follows) and hottest post (most likes) they haven't liked."""
+    viewer = User.objects.annotate(n=Count("following")).order_by("-n", "id").first()
+    if viewer is None:
+        raise ValueError("No users to benchmark with; run seed_social_graph first.")
+    post = (
+        Post.objects.exclude(likes__user=viewer).exclude(bookmarks__user=viewer)
+        .order_by("-likes_count", "-id").first()
+    )
+    if post is None:
+        raise ValueError("No posts to benchmark with; run seed_social_graph first.")
+    return {"user_id": viewer.id, "post_id": post.id, "token": str(AccessToken.for_user(viewer))}
+
+
+def run(iterations=30, warmup=3, endpoints=None, context=None):
+    ctx = context or default_context()
+    client = Client(SERVER_NAME="localhost", HTTP_AUTHORIZATION=f"Bearer {ctx['token']}")
+    results = {}
+    for ep in endpoints or ENDPOINTS:
+        url = ep.path(ctx)
+        timings, queries, statuses = [], [], set()
+        for i in range(warmup + iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = getattr(client, ep.method)(url)
+                elapsed = time.perf_counter() - started
+            if ep.teardown:
+                ep.teardown(ctx)
+            if i < warmup:
+                continue
+            timings.append(elapsed * 1000)
+            queries.append(len(captured.captured_queries))
+            statuses.add(response.status_code)
+        results[ep.name] = {
+            "url": url,
+            "p50_ms": round(percentile(timings, 0.50), 3),
+            "p95_ms": round(percentile(timings, 0.95), 3),
+            "p99_ms": round(percentile(timings, 0.99), 3),
+            "queries": max(queries),
+            "budget": ep.budget,
+            "statuses": sorted(statuses),
+        }
+    return {
+        "meta": {
+            "created_at": timezone.now().isoformat(),
+            "iterations": iterations,
+            "python": platform.python_version(),
+            "posts": Post.objects.count(),
+            "users": User.objects.count(),
+        },
+        "endpoints": results,
+    }
+
+
+# -------- WSGI vs ASGI --------
+SERVE_ENDPOINTS = ("feed", "posts_list", "post_detail", "comments_by_post")
+
+
+def _wsgi_get(app, url, token):
+    parts = urlsplit(url)
+    environ = {
+        "REQUEST_METHOD": "GET", "PATH_INFO": parts.path, "QUERY_STRING": parts.query,
+        "SERVER_NAME": "localhost", "SERVER_PORT": "80", "SERVER_PROTOCOL": "HTTP/1.1",
+        "HTTP_HOST": "localhost", "HTTP_AUTHORIZATION": f"Bearer {token}",
+        "wsgi.input": BytesIO(), "wsgi.errors": BytesIO(), "wsgi.url_scheme": "http",
+        "wsgi.version": (1, 0), "wsgi.multithread": True, "wsgi.multiprocess": False, "wsgi.run_once": False,
+    }
+    status = []
+    body = app(environ, lambda s, headers, exc_info=None: status.append(int(s.split()[0])))
+    try:
+        b"".join(body)
+    finally:
+        body.close()  # request_finished: returns the DB connection
+    return status[0]
+
+
+async def _asgi_get(app, url, token):
+    parts = urlsplit(url)
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": parts.path, "raw_path": parts.path.encode(),
+        "query_string": parts.query.encode(), "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"authorization", f"Bearer {token}".encode())],
+        "server": ("localhost", 80), "client": ("127.0.0.1", 0),
+    }
+    sent = asyncio.Event()
+    status = []
+
+    async def receive():
+        if not sent.is_set():
+            sent.set()
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.Future()  # no disconnect
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+
+    await app(scope, receive, send)
+    return status[0]
+
+
+class _ThreadPeak:
+    """Samples threading.active_count() in the background."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def serve(server, concurrency=50, requests=1000, endpoints=SERVE_ENDPOINTS, context=None):
+    """
+    Hit the read endpoints `requests` times with `concurrency` clients through the
+    WSGI or ASGI handler. ASGI runs the async views only when ASYNC_READS is on
+    (the run_server_benchmark command sets it per server).
+    """
+    ctx = context or default_context()
+    by_name = {ep.name: ep for ep in ENDPOINTS}
+    urls = [by_name[name].path(ctx) for name in endpoints]
+    plan = [urls[i % len(urls)] for i in range(requests)]
+    token = ctx["token"]
+    timings, statuses = [], {}
+
+    def record(started, status):
+        timings.append((time.perf_counter() - started) * 1000)
+        statuses[status] = statuses.get(status, 0) + 1
+
+    if server == "wsgi":
+        from django.core.wsgi import get_wsgi_application
+
+        app = get_wsgi_application()
+
+        def one(url):
+            started = time.perf_counter()
+            record(started, _wsgi_get(app, url, token))
+
+        with _ThreadPeak() as threads:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                list(pool.map(one, plan))
+            elapsed = time.perf_counter() - started
+    elif server == "asgi":
+        from django.core.asgi import get_asgi_application
+
+        app = get_asgi_application()
+
+        async def main():
+            gate = asyncio.Semaphore(concurrency)
+
+            async def one(url):
+                async with gate:
+                    started = time.perf_counter()
+                    record(started, await _asgi_get(app, url, token))
+
+            await asyncio.gather(*(one(url) for url in plan))
+
+        with _ThreadPeak() as threads:
+            started = time.perf_counter()
+            asyncio.run(main())
+            elapsed = time.perf_counter() - started
+    else:
+        raise ValueError(f"Unknown server {server!r} (wsgi or asgi).")
+
+    return {
+        "server": server,
+        "concurrency": concurrency,
+        "requests": requests,
+        "endpoints": list(endpoints),
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(timings, 0.50), 3),
+        "p95_ms": round(percentile(timings, 0.95), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+        "peak_threads": threads.peak,
+        "statuses": {str(code): n for code, n in sorted(statuses.items())},
+    }
+
+
+def check(report, baseline=None, threshold=0.25):
+    """Return a list of human-readable failures (empty when everything passes)."""
+    failures = []
+    previous = (baseline or {}).get("endpoints", {})
+    for name, row in report["endpoints"].items():
+        if row["queries"] > row["budget"]:
+            failures.append(f"{name}: {row['queries']} queries > budget {row['budget']}")
+        if any(code >= 400 for code in row["statuses"]):
+            failures.append(f"{name}: error status {row['statuses']}")
+        before = previous.get(name)
+        if before and row["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            failures.append(
+                f"{name}: p95 {row['p95_ms']}ms is more than {threshold:.0%} over baseline {before['p95_ms']}ms"
+            )
+    return failures
+
+
+def dump(report, path):
+    with open(path, "w") as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+# -------- trending sketch accuracy --------
+def sketch_accuracy(width, depth, events=200_000, keys=20_000, skew=1.1, top_k=50, seed=0):
+    """
+    Feed `events` Zipf(`skew`)-distributed keys into a 1h SlidingWindow of the given
+    size and compare with exact counts.
+    """
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) ** skew for rank in range(keys)]
+    stream = rng.choices(range(keys), weights=weights, k=events)
+    start = 0.0  # bucket-aligned, so runs are comparable
+    window = trending.SlidingWindow(3600, 12, width, depth, top_k)
+
+    began = time.perf_counter()
+    for i, key in enumerate(stream):
+        window.add(key, 1, start + 3000 * i / events)  # spread over the window
+    ingest = time.perf_counter() - began
+
+    exact = Counter(stream)
+    errors = [window.estimate(key) - count for key, count in exact.items()]
+    bound = 2.718281828 / width * events
+    true_top = {key for key, _ in exact.most_common(top_k)}
+    found_top = {key for key, _ in window.top(top_k, start + 3000)}
+    return {
+        "width": width,
+        "depth": depth,
+        "events": events,
+        "keys": len(exact),
+        "memory_kb": round(window.nbytes / 1024, 1),
+        "mean_error": round(sum(errors) / len(errors), 3),
+        "max_error": max(errors),
+        "error_bound": round(bound, 1),
+        "within_bound": round(sum(e <= bound for e in errors) / len(errors), 4),
+        "top_k_recall": round(len(true_top & found_top) / len(true_top), 3),
+        "events_per_s": round(events / ingest),
+    }
+
+
+# -------- rate limiter overhead --------
+def ratelimit_overhead(backend="process", decisions=100_000, clients=1_000, threads=1, rate="120/min", seed=0):
+    """
+    Time `decisions` Limiter.take() calls spread over `clients` random clients
+    (from `threads` threads), against a fresh limiter with the given store.
+    """
+    limiter = ratelimit.Limiter({**ratelimit.config(), "BACKEND": backend, "RATES": {"bench": rate},
+                                 "KEY_PREFIX": f"ratelimit-bench-{seed}"})
+    rng = random.Random(seed)
+    per_thread = decisions // threads
+    streams = [[f"user:{rng.randrange(clients)}" for _ in range(per_thread)] for _ in range(threads)]
+    allowed = Counter()
+
+    def work(stream):
+        take, n = limiter.take, 0
+        for client in stream:
+            if not take("bench", client):
+                n += 1
+        return n
+
+    began = time.perf_counter()
+    if threads == 1:
+        allowed["n"] = work(streams[0])
+    else:
+        with ThreadPoolExecutor(threads) as pool:
+            allowed["n"] = sum(pool.map(work, streams))
+    elapsed = time.perf_counter() - began
+    limiter.store.delete([f"bench:user:{c}" for c in range(clients)])
+    total = per_thread * threads
+    return {
+        "backend": backend,
+        "threads": threads,
+        "decisions": total,
+        "clients": clients,
+        "us_per_decision": round(elapsed / total * 1e6, 3),
+        "decisions_per_s": round(total / elapsed),
+        "allowed": round(allowed["n"] / total, 4),
+    }
@@ -0,0 +1,144 @@
+# posts/conditional.py
+"""
+Conditional GET for list and detail endpoints: ETag on both, Last-Modified on
+details only. A list's newest timestamp doesn't move when a row is deleted or drops
+off the page, or when the viewer unfollows someone, so lists are validated by ETag.
+
+Validators are built from the rows the view already fetched -- ids, timestamps and
+the stored counters -- plus the viewer, so a matching If-None-Match or
+If-Modified-Since returns 304 before any serializer or per-viewer lookup runs.
+
+`alist` / `aretrieve` are the same handlers for async views (posts/asyncviews.py).
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import likebuffer
+from .followgraph import get_graph
+
+
+class ConditionalGetMixin:
+    # model fields that change the representation of a row
+    etag_fields = ("id", "updated_at")
+    # fields whose max() is a detail response's Last-Modified date
+    last_modified_fields = ("updated_at",)
+
+    def get_etag_extra(self, rows):
+        """Viewer-dependent inputs to the ETag (override to add more)."""
+        user = self.request.user
+        return [user.pk if user.is_authenticated else "anon"]
+
+    async def aget_etag_extra(self, rows):
+        """get_etag_extra for async views (override if it touches the database)."""
+        return self.get_etag_extra(rows)
+
+    def get_validators(self, rows, extra=None, many=False):
+        digest = hashlib.sha1()
+        for row in rows:
+            digest.update(repr([getattr(row, f) for f in self.etag_fields]).encode())
+        if extra is None:
+            extra = self.get_etag_extra(rows)
+        digest.update(repr(extra).encode())
+        etag = f'W/"{digest.hexdigest()}"'
+
+        if many:
+            return etag, None
+        stamps = [getattr(row, f) for row in rows for f in self.last_modified_fields]
+        stamps = [s for s in stamps if s is not None]
+        last_modified = int(max(stamps).timestamp()) if stamps else None
+        return etag, last_modified
+
+    def conditional_response(self, rows, extra=None, many=False):
+        """A 304 if the client's copy is current, else None; remembers headers for the 200."""
+        etag, last_modified = self.get_validators(rows, extra, many)
+        self._validators = (etag, last_modified)
+        response = get_conditional_response(self.request._request, etag=etag, last_modified=last_modified)
+        if response is not None and response.status_code == status.HTTP_304_NOT_MODIFIED:
+            return self._with_validators(Response(status=status.HTTP_304_NOT_MODIFIED))
+        return None
+
+    def _with_validators(self, response):
+        etag, last_modified = getattr(self, "_validators", (None, None))
+        if etag:
+            response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified)
+        patch_vary_headers(response, ("Authorization",))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        rows = list(page if page is not None else queryset)
+
+        not_modified = self.conditional_response(rows, many=True)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.get_serializer(rows, many=True)
+        if page is not None:
+            return self._with_validators(self.get_paginated_response(serializer.data))
+        return self._with_validators(Response(serializer.data))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        not_modified = self.conditional_response([instance])
+        if not_modified is not None:
+            return not_modified
+        return self._with_validators(Response(self.get_serializer(instance).data))
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(await self.aget_queryset())
+        page = await self.apaginate_queryset(queryset)
+        rows = page if page is not None else [row async for row in queryset.aiterator()]
+
+        not_modified = self.conditional_response(rows, await self.aget_etag_extra(rows), many=True)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.get_serializer(rows, many=True)
+        await self.aprepare_serializer(serializer, rows)
+        if page is not None:
+            return self._with_validators(self.get_paginated_response(serializer.data))
+        return self._with_validators(Response(serializer.data))
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        not_modified = self.conditional_response([instance], await self.aget_etag_extra([instance]))
+        if not_modified is not None:
+            return not_modified
+        serializer = self.get_serializer(instance)
+        await self.aprepare_serializer(serializer, [instance])
+        return self._with_validators(Response(serializer.data))
+
+
+class PostConditionalGetMixin(ConditionalGetMixin):
+    etag_fields = ("id", "author_id", "updated_at", "activity_at", "likes_count", "comments_count", "bookmarks_count")
+    last_modified_fields = ("updated_at", "activity_at")
+
+    def get_etag_extra(self, rows):
+        user = self.request.user
+        following = get_graph().following(user.pk) if user.is_authenticated else ()
+        return self._post_etag_extra(rows, following)
+
+    async def aget_etag_extra(self, rows):
+        user = self.request.user
+        following = await get_graph().afollowing(user.pk) if user.is_authenticated else ()
+        return self._post_etag_extra(rows, following)
+
+    def _post_etag_extra(self, rows, following):
+        extra = super().get_etag_extra(rows)
+        user = self.request.user
+        if user.is_authenticated:
+            # the viewer's own likes/bookmarks move the counters; follows don't
+            extra.append(sorted({r.author_id for r in rows if r.author_id in following}))
+        buffer = likebuffer.get_buffer()
+        if buffer is not None:
+            extra.append([buffer.post_delta(r.pk) for r in rows])
+            if user.is_authenticated:
+                extra.append(sorted(buffer.pending_for_user(user.pk).items()))
+        return extra
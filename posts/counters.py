@@ -0,0 +1,96 @@
+# posts/counters.py
+"""
+Helpers for the denormalized engagement counters stored on Post
+(likes_count, comments_count, bookmarks_count).
+"""
+from django.db import connection
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Now
+from django.utils import timezone
+
+# counter field on Post -> related model name
+COUNTER_FIELDS = {
+    "likes_count": "Like",
+    "comments_count": "Comment",
+    "bookmarks_count": "Bookmark",
+}
+
+
+def bump(post_model, post_id, field, delta):
+    """
+    Atomically add `delta` to Post.<field> for one post (UPDATE ... SET x = x + n).
+    Decrements never push the counter below zero.
+    """
+    if not delta:
+        return 0
+    qs = post_model.objects.filter(pk=post_id)
+    if delta < 0:
+        qs = qs.filter(**{f"{field}__gte": -delta})
+    return qs.update(**{field: F(field) + delta, "activity_at": Now()})
+
+
+# backends whose INSERT ... ON CONFLICT DO NOTHING can return the rows it wrote
+RETURNING_VENDORS = ("sqlite", "postgresql")
+INSERT_CHUNK = 500
+
+
+def insert_new(model, pairs):
+    """
+    Insert the (user_id, post_id) rows of `model` (Like / Bookmark) in `pairs`,
+    skipping ones that exist; returns the pairs this call actually inserted, i.e.
+    the ones to bump counters for. A pair a concurrent writer got in first (and
+    counted) conflicts and isn't returned.
+    """
+    pairs = list(set(pairs))
+    if not pairs:
+        return set()
+    if connection.vendor not in RETURNING_VENDORS:
+        # no RETURNING: count what wasn't there before the insert
+        existing = set(model.objects.filter(
+            user_id__in={u for u, _ in pairs}, post_id__in={p for _, p in pairs},
+        ).values_list("user_id", "post_id"))
+        model.objects.bulk_create(
+            [model(user_id=u, post_id=p) for u, p in pairs if (u, p) not in existing], ignore_conflicts=True
+        )
+        return set(pairs) - existing
+
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    inserted = set()
+    with connection.cursor() as cursor:
+        for i in range(0, len(pairs), INSERT_CHUNK):
+            chunk = pairs[i:i + INSERT_CHUNK]
+            cursor.execute(
+                f"INSERT INTO {model._meta.db_table} (user_id, post_id, created_at) "
+                f"VALUES {', '.join(['(%s, %s, %s)'] * len(chunk))} "
+                "ON CONFLICT DO NOTHING RETURNING user_id, post_id",
+                [value for u, p in chunk for value in (u, p, now)],
+            )
+            inserted.update(map(tuple, cursor.fetchall()))
+    return inserted
+
+
+def _count_subquery(related_model):
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(post=OuterRef("pk"))
+            .order_by()
+            .values("post")
+            .annotate(n=Count("pk"))
+            .values("n"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def rebuild(post_model, related_models, queryset=None):
+    """
+    Recompute every counter from the source tables in a single UPDATE.
+    `related_models` maps model name -> model class (works with migration apps too).
+    Returns the number of posts updated.
+    """
+    qs = queryset if queryset is not None else post_model.objects.all()
+    return qs.update(**{
+        field: _count_subquery(related_models[name])
+        for field, name in COUNTER_FIELDS.items()
+    })
@@ -0,0 +1,225 @@
+# posts/dbrouting.py
+"""
+Read/write splitting with read-your-writes stickiness.
+
+- Writes -- and every read outside replica-enabled views -- go to the primary.
+- Safe-method requests on views using ReplicaReadMixin (posts, feed, comments)
+  read from a replica, picked at random per request.
+- After a user's successful write, ReadYourWritesMiddleware marks them sticky for
+  STICKY_SECONDS; their reads stay on the primary for that window, so a new post or
+  like shows up right away despite replica lag. Marks live in a Django cache alias
+  so every worker sees them; with replicas configured, a process-local alias
+  (locmem, dummy) fails the posts.E001 system check and middleware startup.
+
+Locally a replica is a second SQLite file refreshed from the primary with the
+backup API (`copy_database`, `manage.py replicate_sqlite`).
+"""
+import random
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.permissions import SAFE_METHODS
+
+DEFAULTS = {
+    "PRIMARY": "default",
+    "REPLICAS": None,        # aliases; None = every DATABASES alias but PRIMARY
+    "STICKY_SECONDS": 5,
+    "ALIAS": "default",      # cache holding the sticky marks
+    "KEY_PREFIX": "rw",
+}
+
+# cache backends whose entries other workers can't see
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+_replica = ContextVar("replica_alias", default=None)
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, "DB_ROUTING", {})}
+
+
+def replicas():
+    cfg = config()
+    if cfg["REPLICAS"] is not None:
+        return list(cfg["REPLICAS"])
+    return [alias for alias in settings.DATABASES if alias != cfg["PRIMARY"]]
+
+
+def current_replica():
+    """The replica alias reads are routed to right now, or None (primary)."""
+    return _replica.get()
+
+
+@contextmanager
+def on_primary():
+    """
+    Read from the primary inside the block. For reads whose result outlives the
+    request (shared caches), so replica lag can't be cached past the write that
+    invalidated it.
+    """
+    token = _replica.set(None)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+# -------- stickiness --------
+def _key(user_id):
+    return f"{config()['KEY_PREFIX']}:{user_id}"
+
+
+def check_sticky_cache(app_configs=None, **kwargs):
+    """System check: with replicas, the sticky marks need a cache every worker shares."""
+    alias = config()["ALIAS"]
+    backend = settings.CACHES.get(alias, {}).get("BACKEND")
+    if not replicas() or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [checks.Error(
+        f"DB_ROUTING['ALIAS'] = {alias!r} is a process-local cache ({backend.rsplit('.', 1)[-1]}): "
+        "a write's read-your-writes mark wouldn't reach the other workers.",
+        hint="Point it at a cache shared by all workers (FileBasedCache, memcached, redis).",
+        id="posts.E001",
+    )]
+
+
+def mark_write(user_id):
+    cfg = config()
+    if cfg["STICKY_SECONDS"] > 0:
+        caches[cfg["ALIAS"]].set(_key(user_id), 1, cfg["STICKY_SECONDS"])
+
+
+def is_sticky(user_id):
+    return caches[config()["ALIAS"]].get(_key(user_id)) is not None
+
+
+async def ais_sticky(user_id):
+    return await caches[config()["ALIAS"]].aget(_key(user_id)) is not None
+
+
+def _candidates(request):
+    if request.method not in SAFE_METHODS:
+        return []
+    return replicas()
+
+
+def choose_replica(request):
+    """Replica for this (authenticated) request's reads, or None for the primary."""
+    pool = _candidates(request)
+    if not pool or (request.user.is_authenticated and is_sticky(request.user.pk)):
+        return None
+    return random.choice(pool)
+
+
+async def achoose_replica(request):
+    pool = _candidates(request)
+    if not pool or (request.user.is_authenticated and await ais_sticky(request.user.pk)):
+        return None
+    return random.choice(pool)
+
+
+# -------- router --------
+class ReadReplicaRouter:
+    """settings.DATABASE_ROUTERS entry; replica choice is made per request by ReplicaReadMixin."""
+
+    def db_for_read(self, model, **hints):
+        # None lets Django fall back to the instance's database / the default
+        return _replica.get()
+
+    def db_for_write(self, model, **hints):
+        return config()["PRIMARY"]
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # replicas hold the same rows as the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas are copies of the primary, not migrated on their own
+        return db == config()["PRIMARY"]
+
+
+# -------- view / middleware integration --------
+class ReplicaReadMixin:
+    """Route the reads of safe-method requests to a replica unless the viewer is sticky."""
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _replica.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _replica.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        # after authentication: the user row itself always comes from the primary
+        super().initial(request, *args, **kwargs)
+        _replica.set(choose_replica(request))
+
+    async def adispatch(self, request, *args, **kwargs):
+        token = _replica.set(None)
+        try:
+            return await super().adispatch(request, *args, **kwargs)
+        finally:
+            _replica.reset(token)
+
+    async def ainitial(self, request, *args, **kwargs):
+        if not await super().ainitial(request, *args, **kwargs):
+            return False
+        _replica.set(await achoose_replica(request))
+        return True
+
+
+class ReadYourWritesMiddleware:
+    """Marks the user sticky to the primary after any successful unsafe request."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        # WSGI/ASGI servers don't run system checks: refuse to start with unshared marks
+        errors = check_sticky_cache()
+        if errors:
+            raise ImproperlyConfigured(errors[0].msg)
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            self._record(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            # request.user may still be the lazy session user: resolve it off the loop
+            await sync_to_async(self._record)(request, response)
+        return response
+
+    def _record(self, request, response):
+        # DRF copies the authenticated (e.g. JWT) user onto the Django request
+        user = getattr(request, "user", None)
+        if response.status_code < 400 and user is not None and user.is_authenticated:
+            mark_write(user.pk)
+
+
+# -------- replication stand-in --------
+def copy_database(source, target, pages=-1):
+    """Copy SQLite file `source` over `target` with the online backup API."""
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst, pages=pages)
+    finally:
+        dst.close()
+        src.close()
@@ -0,0 +1,88 @@
+# posts/engagement.py
+"""
+Batched like/unlike/bookmark/unbookmark for one user.
+
+Operations are replayed in order against the user's current state (read once),
+which gives each item the same status the single-post endpoints would return.
+Only the net difference is written: one multi-row insert and one set-based delete per
+model, inside a single transaction. Counters and scores move only for the rows the
+insert actually wrote (counters.insert_new), not for pairs a concurrent like or
+bookmark of the same post got in first.
+
+With write-behind likes enabled (posts/likebuffer.py), the user's buffered intents
+are written first, so the batch and the single-post endpoints see the same state.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Now
+
+from . import counters, likebuffer, ranking, responsecache, trending
+from .models import Post, Like, Bookmark
+
+# action -> (model, counter field, adds?)
+ACTIONS = {
+    "like": (Like, "likes_count", True),
+    "unlike": (Like, "likes_count", False),
+    "bookmark": (Bookmark, "bookmarks_count", True),
+    "unbookmark": (Bookmark, "bookmarks_count", False),
+}
+
+# (model, adds, was_present) -> (status, detail) -- same as the single-post actions
+OUTCOMES = {
+    (Like, True, False): (201, "liked"),
+    (Like, True, True): (200, "already liked"),
+    (Like, False, True): (204, "unliked"),
+    (Like, False, False): (404, "not liked"),
+    (Bookmark, True, False): (201, "bookmarked"),
+    (Bookmark, True, True): (200, "already bookmarked"),
+    (Bookmark, False, True): (204, "unbookmarked"),
+    (Bookmark, False, False): (404, "not bookmarked"),
+}
+
+
+def apply_batch(user, operations):
+    """
+    `operations` is a list of {"action": ..., "post_id": ...}.
+    Returns one {"action", "post_id", "status", "detail"} per operation, in order.
+    """
+    buffer = likebuffer.get_buffer()
+    if buffer is not None and buffer.pending_for_user(user.pk):
+        buffer.flush(user.pk)
+    post_ids = {op["post_id"] for op in operations}
+    with transaction.atomic():
+        existing_posts = set(Post.objects.filter(pk__in=post_ids).values_list("pk", flat=True))
+        before = {
+            model: set(model.objects.filter(user=user, post_id__in=existing_posts).values_list("post_id", flat=True))
+            for model in (Like, Bookmark)
+        }
+        state = {model: set(ids) for model, ids in before.items()}
+
+        results = []
+        for op in operations:
+            post_id = op["post_id"]
+            model, _, adds = ACTIONS[op["action"]]
+            if post_id not in existing_posts:
+                status, detail = 404, "post not found"
+            else:
+                present = post_id in state[model]
+                status, detail = OUTCOMES[(model, adds, present)]
+                if adds:
+                    state[model].add(post_id)
+                else:
+                    state[model].discard(post_id)
+            results.append({"action": op["action"], "post_id": post_id, "status": status, "detail": detail})
+
+        for model, counter in ((Like, "likes_count"), (Bookmark, "bookmarks_count")):
+            added = state[model] - before[model]
+            removed = before[model] - state[model]
+            if removed:
+                # post_delete signals keep the counters in step
+                model.objects.filter(user=user, post_id__in=removed).delete()
+            inserted = [pid for _, pid in counters.insert_new(model, [(user.pk, pid) for pid in added])]
+            if inserted:
+                # the insert sends no signals
+                Post.objects.filter(pk__in=inserted).update(**{counter: F(counter) + 1, "activity_at": Now()})
+                ranking.record(model._meta.model_name, inserted)
+                trending.record(model._meta.model_name, inserted)
+                responsecache.invalidate_posts(inserted)
+    return results
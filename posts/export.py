@@ -0,0 +1,105 @@
+# posts/export.py
+"""
+Streaming export of one user's data as NDJSON (optionally gzip-compressed).
+
+One JSON object per line, section by section (posts, comments, likes, bookmarks,
+follows), each section in primary-key order:
+
+    {"type": "post", "cursor": "posts:42", "data": {...}}
+    ...
+    {"type": "end"}
+
+Rows come from values() + iterator(chunk_size=...), so memory stays flat however
+long the history is. Every line carries the cursor of its row: passing the last
+one received (?cursor=posts:42, `export_user_data --cursor`) resumes right after
+it. A stream that ends without the {"type": "end"} line was cut short.
+
+Under ASGI the view streams `astream()` instead: Django would otherwise consume a
+sync iterator in full before sending the first byte.
+"""
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Post, Comment, Like, Bookmark, Follow
+
+CHUNK_SIZE = 2000  # rows per database round trip, and per yielded piece of output
+
+# section -> (line type, model, column holding the exporting user, exported fields)
+SECTIONS = {
+    "posts": ("post", Post, "author", ("id", "content", "media_url", "created_at", "updated_at",
+                                       "likes_count", "comments_count", "bookmarks_count")),
+    "comments": ("comment", Comment, "user", ("id", "post_id", "content", "created_at")),
+    "likes": ("like", Like, "user", ("id", "post_id", "created_at")),
+    "bookmarks": ("bookmark", Bookmark, "user", ("id", "post_id", "created_at")),
+    "follows": ("follow", Follow, "follower", ("id", "following_id", "created_at")),
+}
+
+_encoder = DjangoJSONEncoder(separators=(",", ":"))
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def parse_cursor(cursor):
+    """'section:pk' -> (section, pk); None/'' -> (first section, 0)."""
+    if not cursor:
+        return next(iter(SECTIONS)), 0
+    section, _, pk = cursor.partition(":")
+    if section not in SECTIONS or not pk.isdigit():
+        raise InvalidCursor(f"Invalid cursor {cursor!r}; expected <section>:<id> with section in "
+                            f"{', '.join(SECTIONS)}.")
+    return section, int(pk)
+
+
+def lines(user_id, cursor=None, chunk_size=CHUNK_SIZE):
+    """Yield the export as NDJSON text, a chunk of rows at a time."""
+    start_section, after = parse_cursor(cursor)
+    names = list(SECTIONS)
+    for section in names[names.index(start_section):]:
+        kind, model, owner, fields = SECTIONS[section]
+        rows = (
+            model.objects.filter(**{owner: user_id, "pk__gt": after})
+            .order_by("pk").values_list(*fields).iterator(chunk_size=chunk_size)
+        )
+        batch = []
+        for row in rows:
+            data = dict(zip(fields, row))
+            batch.append(_encoder.encode({"type": kind, "cursor": f"{section}:{data['id']}", "data": data}))
+            if len(batch) >= chunk_size:
+                yield "\n".join(batch) + "\n"
+                batch = []
+        if batch:
+            yield "\n".join(batch) + "\n"
+        after = 0
+    yield json.dumps({"type": "end"}) + "\n"
+
+
+def gzipped(chunks):
+    """Compress a stream of text chunks into one gzip member, incrementally."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream(user_id, cursor=None, compress=False, chunk_size=CHUNK_SIZE):
+    """Bytes of the export, gzip-compressed when `compress`."""
+    chunks = lines(user_id, cursor, chunk_size)
+    if compress:
+        return gzipped(chunks)
+    return (chunk.encode() for chunk in chunks)
+
+
+async def astream(user_id, cursor=None, compress=False, chunk_size=CHUNK_SIZE):
+    """stream() as an async iterator: each chunk is produced on the sync thread, one at a time."""
+    chunks = stream(user_id, cursor, compress, chunk_size)
+    # thread_sensitive: the database cursor behind the generator stays on one connection
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    while (chunk := await next_chunk(chunks, None)) is not None:
+        yield chunk
@@ -0,0 +1,323 @@
+# posts/followgraph.py
+"""
+Cached follow graph: per-user following / follower id sets.
+
+Sets are stored as sorted int64 arrays (8 bytes per id, bisect membership) and
+invalidated from the Follow signals, i.e. whenever FollowViewSet.perform_create /
+perform_destroy (or anything else) adds or removes a relation -- in the backend of
+the worker that made the change.
+
+Backends (settings.FOLLOW_GRAPH_CACHE["BACKEND"]):
+- "process": in-process LRU with TTL, an entry cap and a memory ceiling. Only
+             consistent within one worker: other workers keep serving their copy
+             of a changed set for up to TTL seconds
+- "django":  any Django cache alias shared by the workers (file-based, memcached,
+             ...), so invalidations reach all of them; TTL comes from the cache timeout
+"""
+import threading
+import time
+import uuid
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .dbrouting import on_primary
+
+DEFAULTS = {
+    "BACKEND": "process",
+    "ALIAS": "default",
+    "TTL": 300,
+    "MAX_ENTRIES": 50_000,
+    "MAX_BYTES": 64 * 1024 * 1024,
+    "KEY_PREFIX": "followgraph",
+}
+ENTRY_OVERHEAD = 100  # rough per-entry bytes for key, timestamps and bookkeeping
+
+
+class IdSet:
+    """Immutable sorted set of user ids packed into an int64 array."""
+
+    __slots__ = ("_ids",)
+
+    def __init__(self, ids=()):
+        self._ids = ids if isinstance(ids, array) else array("q", sorted(set(ids)))
+
+    def __contains__(self, user_id):
+        i = bisect_left(self._ids, user_id)
+        return i < len(self._ids) and self._ids[i] == user_id
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __repr__(self):
+        return f"IdSet({len(self)} ids)"
+
+    @property
+    def nbytes(self):
+        return self._ids.itemsize * len(self._ids)
+
+    def to_bytes(self):
+        return self._ids.tobytes()
+
+    @classmethod
+    def from_bytes(cls, raw):
+        ids = array("q")
+        ids.frombytes(raw)
+        return cls(ids)
+
+
+# -------- Backends --------
+class LocalLRUBackend:
+    """Thread-safe LRU with per-entry TTL, entry cap and byte ceiling."""
+
+    def __init__(self, ttl, max_entries, max_bytes):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (expires_at, IdSet)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                self._drop(key)
+                self.expirations += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    async def aget(self, key):
+        return self.get(key)
+
+    def set(self, key, value):
+        size = value.nbytes + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    async def aset(self, key, value):
+        self.set(key, value)
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _drop(self, key):
+        _, value = self._data.pop(key)
+        self._bytes -= value.nbytes + ENTRY_OVERHEAD
+
+    def info(self):
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class DjangoCacheBackend:
+    """
+    Stores packed id arrays in a Django cache so workers can share them.
+    Entries carry the generation they were written in; clear() starts a new one,
+    which orphans this backend's entries without touching the rest of the alias.
+    """
+
+    def __init__(self, alias, ttl, prefix):
+        self.cache = caches[alias]
+        self.ttl = ttl
+        self.generation_key = f"{prefix}:generation"
+
+    def _generation(self):
+        generation = self.cache.get(self.generation_key)
+        if generation is None:
+            self.cache.add(self.generation_key, uuid.uuid4().hex, None)
+            generation = self.cache.get(self.generation_key)
+        return generation
+
+    async def _ageneration(self):
+        generation = await self.cache.aget(self.generation_key)
+        if generation is None:
+            await self.cache.aadd(self.generation_key, uuid.uuid4().hex, None)
+            generation = await self.cache.aget(self.generation_key)
+        return generation
+
+    def _unpack(self, key, found):
+        entry = found.get(key)
+        if entry is None or entry[0] != found.get(self.generation_key):
+            return None
+        return IdSet.from_bytes(entry[1])
+
+    def get(self, key):
+        # one round trip for the entry and the current generation
+        return self._unpack(key, self.cache.get_many([key, self.generation_key]))
+
+    async def aget(self, key):
+        return self._unpack(key, await self.cache.aget_many([key, self.generation_key]))
+
+    def set(self, key, value):
+        self.cache.set(key, (self._generation(), value.to_bytes()), self.ttl)
+
+    async def aset(self, key, value):
+        await self.cache.aset(key, (await self._ageneration(), value.to_bytes()), self.ttl)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+    def clear(self):
+        self.cache.set(self.generation_key, uuid.uuid4().hex, None)
+
+    def info(self):
+        return {}
+
+
+# -------- Graph --------
+class FollowGraph:
+    def __init__(self, config=None):
+        self.config = {**DEFAULTS, **(config or {})}
+        if self.config["BACKEND"] == "django":
+            self.backend = DjangoCacheBackend(self.config["ALIAS"], self.config["TTL"], self.config["KEY_PREFIX"])
+        else:
+            self.backend = LocalLRUBackend(
+                self.config["TTL"], self.config["MAX_ENTRIES"], self.config["MAX_BYTES"]
+            )
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _key(self, kind, user_id):
+        return f"{self.config['KEY_PREFIX']}:{kind}:{user_id}"
+
+    def _get(self, kind, user_id, load):
+        key = self._key(kind, user_id)
+        value = self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        with on_primary():
+            value = IdSet(load())
+        self.backend.set(key, value)
+        return value
+
+    async def _aget(self, kind, user_id, load):
+        # same as _get, through the async cache and ORM APIs
+        key = self._key(kind, user_id)
+        value = await self.backend.aget(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        with on_primary():
+            value = IdSet([uid async for uid in load()])
+        await self.backend.aset(key, value)
+        return value
+
+    @staticmethod
+    def _following_ids(user_id):
+        from .models import Follow
+
+        return Follow.objects.filter(follower_id=user_id).values_list("following_id", flat=True)
+
+    @staticmethod
+    def _follower_ids(user_id):
+        from .models import Follow
+
+        return Follow.objects.filter(following_id=user_id).values_list("follower_id", flat=True)
+
+    @staticmethod
+    def _high_fanout_ids():
+        from .models import HighFanoutAuthor
+
+        return HighFanoutAuthor.objects.values_list("user_id", flat=True)
+
+    def following(self, user_id):
+        """Ids of the users `user_id` follows."""
+        return self._get("following", user_id, lambda: self._following_ids(user_id))
+
+    def followers(self, user_id):
+        """Ids of the users following `user_id`."""
+        return self._get("followers", user_id, lambda: self._follower_ids(user_id))
+
+    def high_fanout_authors(self):
+        """Ids of authors whose posts are merged into feeds at read time."""
+        return self._get("high_fanout", "all", self._high_fanout_ids)
+
+    async def afollowing(self, user_id):
+        return await self._aget("following", user_id, lambda: self._following_ids(user_id))
+
+    async def ahigh_fanout_authors(self):
+        return await self._aget("high_fanout", "all", self._high_fanout_ids)
+
+    def invalidate(self, follower_id=None, following_id=None, high_fanout=False):
+        keys = []
+        if follower_id is not None:
+            keys.append(self._key("following", follower_id))
+        if following_id is not None:
+            keys.append(self._key("followers", following_id))
+        if high_fanout:
+            keys.append(self._key("high_fanout", "all"))
+        for key in keys:
+            self.backend.delete(key)
+        self.invalidations += len(keys)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.config["BACKEND"],
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            **self.backend.info(),
+        }
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_graph():
+    global _graph
+    if _graph is None:
+        with _graph_lock:
+            if _graph is None:
+                _graph = FollowGraph(getattr(settings, "FOLLOW_GRAPH_CACHE", None))
+    return _graph
+
+
+@receiver(setting_changed)
+def _reset_graph(setting, **kwargs):
+    global _graph
+    if setting in ("FOLLOW_GRAPH_CACHE", "CACHES"):
+        _graph = None
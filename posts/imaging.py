@@ -0,0 +1,104 @@
+# posts/imaging.py
+"""
+Decoding, resizing and re-encoding for media variants (posts/media.py).
+
+Plain Pillow, no Django: `render` runs in the media pool's worker processes, which
+only ever see bytes in and bytes out.
+"""
+import math
+from io import BytesIO
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # optional: uploads answer 503 without it
+    Image = None
+
+EXTENSIONS = {"WEBP": "webp", "JPEG": "jpg", "PNG": "png", "GIF": "gif"}
+ACCEPTED = ("JPEG", "PNG", "WEBP", "GIF")
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def available():
+    return Image is not None
+
+
+def output_format(preferred):
+    """`preferred` ("WEBP" or "JPEG"), falling back to JPEG when Pillow lacks WebP."""
+    if preferred == "WEBP" and not features.check("webp"):
+        return "JPEG"
+    return preferred
+
+
+def probe(data, max_pixels):
+    """(format, width, height) from the header only -- no pixel decoding."""
+    try:
+        with Image.open(BytesIO(data)) as im:
+            fmt, (width, height) = im.format, im.size
+    except Exception as e:  # Pillow raises a zoo of errors on junk input
+        raise InvalidImage(f"Not a readable image ({e.__class__.__name__}).")
+    if fmt not in ACCEPTED:
+        raise InvalidImage(f"Unsupported image format {fmt}; use {', '.join(ACCEPTED)}.")
+    if width * height > max_pixels:
+        raise InvalidImage(f"Image is {width}x{height}; the limit is {max_pixels} pixels.")
+    return fmt, width, height
+
+
+def _encode(im, fmt, quality):
+    out = BytesIO()
+    if fmt == "WEBP":
+        im.save(out, "WEBP", quality=quality, method=4)
+    else:
+        im.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def _needed(size, width, height, crop):
+    """Pixels a spec needs from an image of `size`: its fitted size, or for crops the size it's cut from."""
+    w, h = size
+    if crop:
+        scale = max(width / w, height / h)
+        return math.ceil(w * scale), math.ceil(h * scale)
+    scale = min(width / w, height / h, 1.0)
+    return round(w * scale), round(h * scale)
+
+
+def render(data, specs, fmt, quality, max_pixels):
+    """
+    {name: (encoded bytes, width, height)} for each spec, name -> (width, height, crop).
+    Box specs shrink to fit (never enlarge); crop specs are center-cropped to the exact
+    size. The original is decoded once; each size is then made from the smallest
+    earlier box result that still covers it (else the original), so nothing is
+    upscaled however the boxes relate. EXIF orientation is applied and metadata
+    dropped.
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    with Image.open(BytesIO(data)) as im:
+        # JPEG: decode at a reduced scale when it's enough for every spec
+        im.draft("RGB", (max(w for w, _, _ in specs.values()), max(h for _, h, _ in specs.values())))
+        im = ImageOps.exif_transpose(im)
+        if im.mode in ("RGBA", "LA", "PA") or "transparency" in im.info:
+            im = im.convert("RGBA")
+            if fmt == "JPEG":  # no alpha channel: flatten onto white
+                flat = Image.new("RGB", im.size, "white")
+                flat.paste(im, mask=im.getchannel("A"))
+                im = flat
+        elif im.mode != "RGB":
+            im = im.convert("RGB")
+
+        results = {}
+        sources = [im]  # the original and the box results, all with its aspect ratio
+        for name, (width, height, crop) in sorted(specs.items(), key=lambda s: -s[1][0] * s[1][1]):
+            need_w, need_h = _needed(im.size, width, height, crop)
+            source = min((s for s in sources if s.width >= need_w and s.height >= need_h),
+                         key=lambda s: s.width * s.height, default=im)
+            if crop:
+                out = ImageOps.fit(source, (width, height), Image.Resampling.LANCZOS)
+            else:
+                out = source.copy()
+                out.thumbnail((width, height), Image.Resampling.LANCZOS)
+                sources.append(out)
+            results[name] = (_encode(out, fmt, quality), out.width, out.height)
+        return results
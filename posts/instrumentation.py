@@ -0,0 +1,231 @@
+# posts/instrumentation.py
+"""
+Per-request timing and SQL instrumentation, reported as Server-Timing headers
+and one structured log line per sampled request.
+
+Recorded per request:
+- SQL: query count, total time, the slowest statement, and statements repeated
+  REPEAT_THRESHOLD+ times (the N+1 signature)
+- phases: auth (DRF initial: authentication, permissions, throttles), queryset
+  (get/filter/paginate, including the SQL they run), serialize, render, total
+
+Queries are recorded by an execute wrapper installed once per DB connection that
+reports to the current request's stats (a context variable, so it follows async
+requests into the threads their ORM calls run on). Unsampled requests
+(SERVER_TIMING["SAMPLE_RATE"]) cost one random() call plus one context lookup per query.
+"""
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    "SAMPLE_RATE": 1.0,
+    "HEADER": True,
+    "LOG": True,
+    "REPEAT_THRESHOLD": 3,
+    "MAX_SQL_CHARS": 200,
+}
+
+_current = ContextVar("request_stats", default=None)
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, "SERVER_TIMING", {})}
+
+
+class RequestStats:
+    __slots__ = ("started", "phases", "queries", "sql_seconds", "slowest", "statements")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.slowest = (0.0, "")
+        self.statements = Counter()
+
+    def add_phase(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def record_query(self, sql, seconds):
+        self.queries += 1
+        self.sql_seconds += seconds
+        self.statements[sql] += 1
+        if seconds > self.slowest[0]:
+            self.slowest = (seconds, sql)
+
+    def repeated(self, threshold):
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+def current():
+    return _current.get()
+
+
+def _record(execute, sql, params, many, context):
+    # django.db execute wrapper, on every connection
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record_query(sql, time.perf_counter() - started)
+
+
+def install(conn):
+    if _record not in conn.execute_wrappers:
+        conn.execute_wrappers.append(_record)
+
+
+@receiver(connection_created)
+def _install_on_connect(sender, connection, **kwargs):
+    install(connection)
+
+
+@contextmanager
+def phase(name):
+    """Time a block into the current request's `name` phase (no-op when not sampled)."""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add_phase(name, time.perf_counter() - started)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def server_timing(stats, total, cfg):
+    parts = [f"{name};dur={_ms(sec)}" for name, sec in stats.phases.items()]
+    parts.append(f'sql;dur={_ms(stats.sql_seconds)};desc="{stats.queries} queries"')
+    repeated = stats.repeated(cfg["REPEAT_THRESHOLD"])
+    if repeated:
+        parts.append(f'sql-repeated;desc="{sum(n for _, n in repeated)} in {len(repeated)} statements"')
+    parts.append(f"total;dur={_ms(total)}")
+    return ", ".join(parts)
+
+
+def log_record(request, response, stats, total, cfg):
+    cut = cfg["MAX_SQL_CHARS"]
+    return {
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "total_ms": _ms(total),
+        "phases_ms": {name: _ms(sec) for name, sec in stats.phases.items()},
+        "queries": stats.queries,
+        "sql_ms": _ms(stats.sql_seconds),
+        "slowest_sql": {"ms": _ms(stats.slowest[0]), "sql": stats.slowest[1][:cut]},
+        "repeated_sql": [{"count": n, "sql": sql[:cut]} for sql, n in stats.repeated(cfg["REPEAT_THRESHOLD"])],
+    }
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # connections opened before this module was imported
+        for conn in connections.all(initialized_only=True):
+            install(conn)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        cfg = config()
+        if not cfg["ENABLED"] or random.random() >= cfg["SAMPLE_RATE"]:
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, cfg)
+
+    async def __acall__(self, request):
+        cfg = config()
+        if not cfg["ENABLED"] or random.random() >= cfg["SAMPLE_RATE"]:
+            return await self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, stats, cfg)
+
+    def _finish(self, request, response, stats, cfg):
+        total = time.perf_counter() - stats.started
+        if cfg["HEADER"]:
+            response["Server-Timing"] = server_timing(stats, total, cfg)
+        if cfg["LOG"]:
+            logger.info(json.dumps(log_record(request, response, stats, total, cfg)))
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook; do it here to time it
+        if _current.get() is not None and not response.is_rendered:
+            with phase("render"):
+                response.render()
+        return response
+
+
+# -------- DRF hooks --------
+class TimedViewMixin:
+    """Splits a DRF view into auth / queryset phases."""
+
+    def initial(self, request, *args, **kwargs):
+        with phase("auth"):
+            return super().initial(request, *args, **kwargs)
+
+    def get_queryset(self):
+        with phase("queryset"):
+            return super().get_queryset()
+
+    def filter_queryset(self, queryset):
+        with phase("queryset"):
+            return super().filter_queryset(queryset)
+
+    def paginate_queryset(self, queryset):
+        with phase("queryset"):
+            return super().paginate_queryset(queryset)
+
+
+class TimedSerializerMixin:
+    """Times `.data` (the actual serialization) into the serialize phase."""
+
+    @property
+    def data(self):
+        with phase("serialize"):
+            return super().data
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
@@ -0,0 +1,274 @@
+# posts/likebuffer.py
+"""
+Optional write-behind buffer for likes (settings.LIKE_WRITE_BEHIND["ENABLED"]).
+
+Like/unlike intents are recorded in memory, deduplicated per (user, post), and
+written by a background thread in batched transactions when MAX_BATCH intents are
+pending or every FLUSH_INTERVAL seconds. Until then, reads go through
+`post_delta()` / `pending_for_user()` so counts and the viewer's liked state
+already include the pending intents. The buffer drains at interpreter exit.
+
+Likes whose post or user was deleted before the flush are dropped (logged and
+counted in `metrics()["dropped"]`) rather than retried, so they can't stall the
+intents queued behind them.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from itertools import islice
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Now
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": False,
+    "MAX_BATCH": 500,        # flush as soon as this many intents are pending
+    "FLUSH_INTERVAL": 0.25,  # seconds; None disables the background thread
+    "MAX_PENDING": 50_000,   # above this, writers flush inline (backpressure)
+}
+DELETE_CHUNK = 200
+
+
+class LikeBuffer:
+    def __init__(self, config=None, start=True):
+        self.config = {**DEFAULTS, **(config or {})}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        # (user_id, post_id) -> (liked in DB when first buffered, liked now)
+        self._pending = {}
+        self._post_delta = defaultdict(int)
+        self._by_user = defaultdict(dict)
+        # metrics
+        self.flushes = 0
+        self.flushed_intents = 0
+        self.errors = 0
+        self.dropped = 0
+        self.batch_sizes = deque(maxlen=1000)
+        self.flush_seconds = deque(maxlen=1000)
+        self._thread = None
+        if start and self.config["FLUSH_INTERVAL"]:
+            self._thread = threading.Thread(target=self._run, name="like-write-behind", daemon=True)
+            self._thread.start()
+
+    # -------- writes --------
+    def submit(self, user_id, post_id, liked):
+        """
+        Record a like (liked=True) or unlike intent.
+        Returns True if it changes the viewer's state (-> 201/204), False if it
+        was already in that state (-> 200/404).
+        """
+        key = (user_id, post_id)
+        with self._lock:
+            entry = self._pending.get(key)
+        if entry is None:
+            from .models import Like
+
+            base = Like.objects.filter(user_id=user_id, post_id=post_id).exists()
+            entry = (base, base)
+
+        with self._lock:
+            base, current = self._pending.get(key, entry)
+            if current == liked:
+                return False
+            self._set(key, base, liked)
+            depth = len(self._pending)
+
+        if depth >= self.config["MAX_PENDING"]:
+            self.flush()
+        elif depth >= self.config["MAX_BATCH"]:
+            self._wakeup.set()
+        return True
+
+    def _set(self, key, base, liked):
+        user_id, post_id = key
+        old = self._pending.pop(key, None)
+        if old is not None:
+            self._post_delta[post_id] -= int(old[1]) - int(old[0])
+        if base == liked:
+            # back to the stored state: nothing to write
+            self._by_user[user_id].pop(post_id, None)
+            if not self._by_user[user_id]:
+                del self._by_user[user_id]
+        else:
+            self._pending[key] = (base, liked)
+            self._post_delta[post_id] += int(liked) - int(base)
+            self._by_user[user_id][post_id] = liked
+        if not self._post_delta[post_id]:
+            del self._post_delta[post_id]
+
+    # -------- reads --------
+    def post_delta(self, post_id):
+        """Pending change to Post.likes_count."""
+        return self._post_delta.get(post_id, 0)
+
+    def pending_for_user(self, user_id):
+        """{post_id: liked} for the user's not-yet-written intents."""
+        with self._lock:
+            return dict(self._by_user.get(user_id, {}))
+
+    def depth(self):
+        return len(self._pending)
+
+    # -------- flushing --------
+    def _run(self):
+        interval = self.config["FLUSH_INTERVAL"]
+        while not self._closed:
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+    def _take(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                items = self._pending.items()
+            else:
+                items = (((user_id, post_id), self._pending[(user_id, post_id)])
+                         for post_id in self._by_user.get(user_id, ()))
+            return list(islice(items, self.config["MAX_BATCH"]))
+
+    def flush(self, user_id=None):
+        """
+        Write everything pending (only `user_id`'s intents if given), MAX_BATCH
+        intents per transaction. Returns intents written.
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._take(user_id)
+                if not batch:
+                    return written
+                started = time.perf_counter()
+                try:
+                    dropped = self._write(batch)
+                except Exception:
+                    self.errors += 1
+                    logger.exception("like write-behind flush failed; %d intents kept", len(batch))
+                    return written
+                with self._lock:
+                    for key, entry in batch:
+                        # only clear intents that weren't changed while we were writing
+                        if self._pending.get(key) == entry:
+                            self._set(key, entry[1], entry[1])
+                elapsed = time.perf_counter() - started
+                self.flushes += 1
+                self.flushed_intents += len(batch) - dropped
+                self.dropped += dropped
+                self.batch_sizes.append(len(batch))
+                self.flush_seconds.append(elapsed)
+                written += len(batch) - dropped
+
+    @staticmethod
+    def _write(batch):
+        """Write one batch in a transaction; returns the number of intents dropped."""
+        from django.contrib.auth.models import User
+
+        from . import counters, ranking, responsecache, trending
+        from .models import Post, Like
+
+        adds = [key for key, (_, liked) in batch if liked]
+        removes = [key for key, (_, liked) in batch if not liked]
+        dropped = []
+        with transaction.atomic():
+            if adds:
+                # the post or user may have been deleted since the like was buffered
+                post_ids = set(Post.objects.filter(pk__in={p for _, p in adds}).values_list("pk", flat=True))
+                user_ids = set(User.objects.filter(pk__in={u for u, _ in adds}).values_list("pk", flat=True))
+                dropped = [key for key in adds if key[0] not in user_ids or key[1] not in post_ids]
+                if dropped:
+                    logger.warning("like write-behind dropped %d likes of deleted posts/users: %s",
+                                   len(dropped), dropped[:20])
+                    adds = [key for key in adds if key[0] in user_ids and key[1] in post_ids]
+            if adds:
+                # only the likes this flush inserted move the counters
+                new = counters.insert_new(Like, adds)
+                per_post = defaultdict(int)
+                for _, post_id in new:
+                    per_post[post_id] += 1
+                # one UPDATE per distinct increment (a hot post is a single statement)
+                by_delta = defaultdict(list)
+                for post_id, n in per_post.items():
+                    by_delta[n].append(post_id)
+                for n, ids in by_delta.items():
+                    Post.objects.filter(pk__in=ids).update(likes_count=F("likes_count") + n, activity_at=Now())
+                    ranking.record("like", ids, n=n)
+                    trending.record("like", ids, n=n)
+                responsecache.invalidate_posts(per_post)
+            for i in range(0, len(removes), DELETE_CHUNK):
+                cond = Q()
+                for user_id, post_id in removes[i:i + DELETE_CHUNK]:
+                    cond |= Q(user_id=user_id, post_id=post_id)
+                # post_delete signals decrement the counters
+                Like.objects.filter(cond).delete()
+        return len(dropped)
+
+    def close(self):
+        """Stop the background thread and drain what's left."""
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def metrics(self):
+        def pct(values, q):
+            ordered = sorted(values)
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0
+
+        return {
+            "queue_depth": self.depth(),
+            "flushes": self.flushes,
+            "flushed_intents": self.flushed_intents,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "batch_size_avg": sum(self.batch_sizes) / len(self.batch_sizes) if self.batch_sizes else 0,
+            "batch_size_max": max(self.batch_sizes, default=0),
+            "flush_ms_p50": pct(self.flush_seconds, 0.5) * 1000,
+            "flush_ms_p95": pct(self.flush_seconds, 0.95) * 1000,
+            "flush_ms_max": max(self.flush_seconds, default=0) * 1000,
+        }
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """The process-wide buffer, or None when write-behind is disabled."""
+    global _buffer
+    config = {**DEFAULTS, **getattr(settings, "LIKE_WRITE_BEHIND", {})}
+    if not config["ENABLED"]:
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = LikeBuffer(config)
+    return _buffer
+
+
+def shutdown():
+    global _buffer
+    if _buffer is not None:
+        _buffer.close()
+        _buffer = None
+
+
+atexit.register(shutdown)
+
+
+@receiver(setting_changed)
+def _reset_buffer(setting, **kwargs):
+    if setting == "LIKE_WRITE_BEHIND":
+        shutdown()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = "Fill the fan-out home timeline table from the existing follow graph and posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="users",
+                            help="Only backfill the timeline of the given user id (repeatable).")
+        parser.add_argument("--per-author", type=int, default=None,
+                            help="Copy at most N newest posts per author (default: all).")
+
+    def handle(self, *args, **options):
+        done = 0
+        for _ in timeline.backfill(options["users"], options["per_author"]):
+            done += 1
+            if done % 1000 == 0:
+                self.stdout.write(f"{done} authors fanned out...")
+        self.stdout.write(self.style.SUCCESS(f"Backfilled timelines from {done} author(s)."))
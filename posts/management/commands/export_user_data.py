@@ -0,0 +1,42 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = ("Stream a user's posts, comments, likes, bookmarks and follows as NDJSON "
+            "(same format as GET /api/export/).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("user", help="User id or username.")
+        parser.add_argument("--output", help="File to write (default: stdout). Appended to with --cursor.")
+        parser.add_argument("--gzip", action="store_true", help="gzip-compress the output.")
+        parser.add_argument("--cursor", help="Resume after this cursor (the last line's \"cursor\").")
+        parser.add_argument("--chunk-size", type=int, default=export.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        lookup = {"pk": options["user"]} if options["user"].isdigit() else {"username": options["user"]}
+        try:
+            user = User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['user']!r}.")
+        try:
+            export.parse_cursor(options["cursor"])
+        except export.InvalidCursor as e:
+            raise CommandError(str(e))
+
+        chunks = export.stream(user.pk, options["cursor"], options["gzip"], options["chunk_size"])
+        if not options["output"]:
+            out = sys.stdout.buffer
+            for chunk in chunks:
+                out.write(chunk)
+            out.flush()
+            return
+        # a resumed export continues the same file (for gzip: as a further member)
+        with open(options["output"], "ab" if options["cursor"] else "wb") as out:
+            for chunk in chunks:
+                out.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f"Exported user {user.pk} to {options['output']}."))
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import imaging, media
+from posts.models import MediaAsset, Post
+from users.models import Profile
+
+
+class Command(BaseCommand):
+    help = ("Render the variants of uploaded images that are pending or failed (every image with "
+            "--rerender, e.g. after changing MEDIA_PIPELINE['VARIANTS']), using a process pool. "
+            "--import-existing first links posts and profiles whose media_url / avatar_url "
+            "points at a file under MEDIA_ROOT.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rerender", action="store_true", help="Render every asset, not just pending/failed.")
+        parser.add_argument("--import-existing", action="store_true",
+                            help="Ingest local images referenced by media_url / avatar_url first.")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="Worker processes (default MEDIA_PIPELINE['WORKERS']; 0 renders inline).")
+
+    def handle(self, *args, **options):
+        if not media.available():
+            raise CommandError("The media pipeline is disabled or Pillow is not installed.")
+        if options["import_existing"]:
+            for model, url_field, fk_field in ((Post, "media_url", "media"), (Profile, "avatar_url", "avatar")):
+                linked = media.import_existing(model, url_field, fk_field, log=self.stderr.write)
+                self.stdout.write(f"Linked {linked} {model._meta.verbose_name_plural}.")
+
+        assets = MediaAsset.objects.order_by("pk")
+        if not options["rerender"]:
+            assets = assets.exclude(status=MediaAsset.READY)
+        # ids up front: the rows change status as they're rendered
+        ids = list(assets.values_list("pk", flat=True))
+        fmt = imaging.output_format(media.config()["FORMAT"])
+        self.stderr.write(f"Rendering {len(ids)} asset(s) as {fmt}...")
+        done, failed = media.render_all(self._assets(ids), options["workers"],
+                                        log=lambda msg: self.stderr.write(f"  {msg}"))
+        self.stdout.write(self.style.SUCCESS(f"Rendered {done} asset(s); {failed} failed."))
+
+    def _assets(self, ids, chunk=200):
+        for i in range(0, len(ids), chunk):
+            yield from MediaAsset.objects.filter(pk__in=ids[i:i + chunk]).order_by("pk")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import ranking
+
+
+class Command(BaseCommand):
+    help = ("Recompute feed ranking: post scores from likes/comments/bookmarks, reader/author "
+            "affinities and timeline scores. Run periodically (e.g. hourly) to refresh affinities.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="Posts scored per batch (default FEED_RANKING['BATCH_SIZE']).")
+
+    def handle(self, *args, **options):
+        posts = ranking.recompute_posts(batch_size=options["batch_size"])
+        affinities = ranking.recompute_affinities()
+        ranking.recompute_timelines()
+        self.stdout.write(self.style.SUCCESS(
+            f"Scored {posts} post(s); {affinities} reader/author affinit{'y' if affinities == 1 else 'ies'}."
+        ))
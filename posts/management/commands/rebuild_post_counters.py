@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+from posts.models import Post, Like, Comment, Bookmark
+
+
+class Command(BaseCommand):
+    help = "Recompute Post.likes_count / comments_count / bookmarks_count from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--post", type=int, action="append", dest="posts",
+                            help="Only rebuild the given post id (repeatable).")
+
+    def handle(self, *args, **options):
+        qs = Post.objects.all()
+        if options["posts"]:
+            qs = qs.filter(pk__in=options["posts"])
+        updated = counters.rebuild(
+            Post,
+            {"Like": Like, "Comment": Comment, "Bookmark": Bookmark},
+            queryset=qs,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt counters for {updated} post(s)."))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = "Recreate the FTS5 search index (and its sync triggers) for posts and comments."
+
+    def handle(self, *args, **options):
+        if not search.rebuild():
+            raise CommandError("Full-text search needs SQLite with FTS5; nothing to rebuild.")
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from posts import tags
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the hashtag index (Tag / PostTag) from post content and recount posts per tag. "
+            "Posts are indexed as they are saved; run this after bulk imports or raw SQL writes.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=tags.BATCH_SIZE, help="Posts per batch.")
+        parser.add_argument("--since-id", type=int, default=0, help="Only reindex posts with a larger id.")
+
+    def handle(self, *args, **options):
+        queryset = Post.objects.filter(pk__gt=options["since_id"])
+        done = 0
+        for n in tags.written(tags.parsed(tags.post_batches(queryset, options["batch_size"]))):
+            done += n
+            self.stderr.write(f"  {done} post(s)...")
+        tags.recount()
+        self.stdout.write(self.style.SUCCESS(f"Indexed hashtags of {done} post(s)."))
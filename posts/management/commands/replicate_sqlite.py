@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import dbrouting
+
+
+class Command(BaseCommand):
+    help = ("Replication stand-in for local SQLite setups: copy the primary database file "
+            "over each read replica's file, once or every --interval seconds.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=1.0, help="Seconds between copies (the replica lag).")
+        parser.add_argument("--once", action="store_true", help="Copy once and exit.")
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[dbrouting.config()["PRIMARY"]]
+        targets = [settings.DATABASES[alias] for alias in dbrouting.replicas()]
+        engines = {db["ENGINE"] for db in [primary, *targets]}
+        if not targets:
+            raise CommandError("No read replicas configured (set DJANGO_READ_REPLICA).")
+        if engines != {"django.db.backends.sqlite3"}:
+            raise CommandError("replicate_sqlite only copies between SQLite files.")
+
+        while True:
+            started = time.perf_counter()
+            for target in targets:
+                dbrouting.copy_database(str(primary["NAME"]), str(target["NAME"]))
+            took = time.perf_counter() - started
+            self.stdout.write(f"copied to {len(targets)} replica(s) in {took * 1000:.1f}ms")
+            if options["once"]:
+                return
+            time.sleep(max(0.0, options["interval"] - took))
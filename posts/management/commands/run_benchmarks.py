@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = "Benchmark API endpoints (latency percentiles + SQL query counts) against budgets and a baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=30)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument("--only", action="append", help="Endpoint name to run (repeatable).")
+        parser.add_argument("--output", help="Write results as JSON to this path.")
+        parser.add_argument("--baseline", help="Compare p95 latency with this earlier results file.")
+        parser.add_argument("--threshold", type=float, default=0.25,
+                            help="Allowed p95 slowdown vs. baseline (0.25 = 25%%).")
+
+    def handle(self, *args, **options):
+        endpoints = benchmarks.ENDPOINTS
+        if options["only"]:
+            endpoints = [ep for ep in endpoints if ep.name in options["only"]]
+        try:
+            report = benchmarks.run(options["iterations"], options["warmup"], endpoints)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for name, row in report["endpoints"].items():
+            self.stdout.write(
+                f"{name:<18} p50 {row['p50_ms']:>8.2f}ms  p95 {row['p95_ms']:>8.2f}ms  "
+                f"p99 {row['p99_ms']:>8.2f}ms  queries {row['queries']}/{row['budget']}"
+            )
+        if options["output"]:
+            benchmarks.dump(report, options["output"])
+
+        baseline = benchmarks.load(options["baseline"]) if options["baseline"] else None
+        failures = benchmarks.check(report, baseline, options["threshold"])
+        if failures:
+            raise CommandError("Benchmark failed:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("All endpoints within budget."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = ("Cost of one write rate-limit decision (posts/ratelimit.py) per store, "
+            "single-threaded and under concurrent threads.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backend", action="append", choices=["process", "django"],
+                            help="Store to measure (repeatable; default both).")
+        parser.add_argument("--threads", type=int, action="append", help="Concurrent threads (repeatable; default 1, 8).")
+        parser.add_argument("--decisions", type=int, default=100_000)
+        parser.add_argument("--clients", type=int, default=1_000, help="Distinct users in the stream.")
+        parser.add_argument("--output", help="Write results as JSON to this path.")
+
+    def handle(self, *args, **options):
+        rows = [
+            benchmarks.ratelimit_overhead(backend, options["decisions"], options["clients"], threads)
+            for backend in options["backend"] or ["process", "django"]
+            for threads in options["threads"] or [1, 8]
+        ]
+        for row in rows:
+            self.stdout.write(
+                f"{row['backend']:>8} x{row['threads']:<3} {row['us_per_decision']:>8.2f} us/decision  "
+                f"{row['decisions_per_s']:>9} decisions/s  {row['allowed']:.2%} allowed"
+            )
+        if options["output"]:
+            benchmarks.dump({"ratelimit": rows}, options["output"])
@@ -0,0 +1,60 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = ("Compare the WSGI and ASGI deployments on the read endpoints under concurrent "
+            "clients (throughput, latency percentiles, peak worker threads).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--server", choices=["wsgi", "asgi", "both"], default="both")
+        parser.add_argument("--concurrency", type=int, action="append",
+                            help="Concurrent clients (repeatable; default 50).")
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--output", help="Write results as JSON to this path.")
+        parser.add_argument("--json", action="store_true", help="Print raw JSON rows (used for --server both).")
+
+    def handle(self, *args, **options):
+        levels = options["concurrency"] or [50]
+        if options["server"] == "both":
+            # each server in a fresh process: ASYNC_READS is read when URLs are built
+            rows = self._run_in_subprocess("wsgi", levels, options) + self._run_in_subprocess("asgi", levels, options)
+        else:
+            try:
+                rows = [benchmarks.serve(options["server"], level, options["requests"]) for level in levels]
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        if options["json"]:
+            self.stdout.write(json.dumps(rows))
+            return
+        for row in rows:
+            self.stdout.write(
+                f"{row['server']:<5} c={row['concurrency']:<4} {row['rps']:>8.1f} req/s  "
+                f"p50 {row['p50_ms']:>8.2f}ms  p95 {row['p95_ms']:>8.2f}ms  p99 {row['p99_ms']:>8.2f}ms  "
+                f"threads {row['peak_threads']:<4} statuses {row['statuses']}"
+            )
+        if options["output"]:
+            benchmarks.dump({"servers": rows}, options["output"])
+        errors = [row for row in rows if any(int(code) >= 400 for code in row["statuses"])]
+        if errors:
+            raise CommandError("Error responses during the run: " + ", ".join(
+                f"{row['server']} c={row['concurrency']} {row['statuses']}" for row in errors))
+
+    def _run_in_subprocess(self, server, levels, options):
+        env = {**os.environ, "DJANGO_ASYNC_READS": "1" if server == "asgi" else "0"}
+        command = [sys.executable, str(settings.BASE_DIR / "manage.py"), "run_server_benchmark",
+                   "--server", server, "--requests", str(options["requests"]), "--json"]
+        for level in levels:
+            command += ["--concurrency", str(level)]
+        result = subprocess.run(command, env=env, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(f"{server} run failed:\n{result.stderr}")
+        return json.loads(result.stdout.strip().splitlines()[-1])
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = ("Accuracy / memory / ingest rate of the trending count-min sketches for different "
+            "sizes, on a synthetic Zipf-distributed event stream.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--width", type=int, action="append",
+                            help="Sketch width (repeatable; default 256, 1024, 2048, 8192).")
+        parser.add_argument("--depth", type=int, action="append", help="Sketch depth (repeatable; default 4).")
+        parser.add_argument("--events", type=int, default=200_000)
+        parser.add_argument("--keys", type=int, default=20_000, help="Distinct keys in the stream.")
+        parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of key popularity.")
+        parser.add_argument("--output", help="Write results as JSON to this path.")
+
+    def handle(self, *args, **options):
+        rows = [
+            benchmarks.sketch_accuracy(width, depth, options["events"], options["keys"], options["skew"])
+            for depth in options["depth"] or [4]
+            for width in options["width"] or [256, 1024, 2048, 8192]
+        ]
+        for row in rows:
+            self.stdout.write(
+                f"width {row['width']:>6} depth {row['depth']:>2}  memory {row['memory_kb']:>9.1f}KB  "
+                f"mean err {row['mean_error']:>8.2f}  max err {row['max_error']:>6} (bound {row['error_bound']:>7.1f}, "
+                f"{row['within_bound']:.2%} within)  top-k recall {row['top_k_recall']:.2f}  "
+                f"{row['events_per_s']:>8} events/s"
+            )
+        if options["output"]:
+            benchmarks.dump({"trending": rows}, options["output"])
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from posts import seeding
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic social graph (power-law follows, posts, likes, comments, bookmarks)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--posts-per-user", type=float, default=5)
+        parser.add_argument("--follows-per-user", type=float, default=20)
+        parser.add_argument("--likes-per-post", type=float, default=5)
+        parser.add_argument("--comments-per-post", type=float, default=1)
+        parser.add_argument("--bookmarks-per-post", type=float, default=1)
+        parser.add_argument("--alpha", type=float, default=1.2, help="Zipf exponent for popularity.")
+        parser.add_argument("--seed", type=int, default=42, help="Random seed (runs are reproducible).")
+        parser.add_argument("--clear", action="store_true", help="Delete previously seeded users first.")
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            self.stdout.write(f"Deleted {seeding.clear()} seeded row(s).")
+        seeding.seed(
+            users=options["users"],
+            posts_per_user=options["posts_per_user"],
+            follows_per_user=options["follows_per_user"],
+            likes_per_post=options["likes_per_post"],
+            comments_per_post=options["comments_per_post"],
+            bookmarks_per_post=options["bookmarks_per_post"],
+            alpha=options["alpha"],
+            random_seed=options["seed"],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS("Seeded."))
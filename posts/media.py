@@ -0,0 +1,325 @@
+# posts/media.py
+"""
+Uploaded images and their resized variants (settings.MEDIA_PIPELINE).
+
+POST /api/media/ stores the original under its sha256: uploading the same bytes
+again returns the existing MediaAsset, without storing or processing anything.
+New assets are rendered after the transaction commits, off the request path, by a
+process pool (WORKERS processes; 0 renders inline). A worker decodes the original
+once and encodes every VARIANT -- thumb / feed / full by default -- as WebP (JPEG
+where Pillow lacks WebP) to
+
+    variants/<sha[:2]>/<sha>/<name>-<width>x<height>.<ext>
+
+The path depends only on the content and the spec, so a changed spec renders new
+files rather than overwriting ones clients and CDNs have cached.
+
+Posts and profiles point at uploads with media_url / avatar_url; saving one that
+points at an original links Post.media / Profile.avatar, which the serializers
+expose as variant URLs. `manage.py process_media` renders pending and failed
+assets (all with --rerender) and imports images already under MEDIA_ROOT.
+"""
+import atexit
+import hashlib
+import logging
+import multiprocessing
+import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.db.models.functions import Now
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import imaging, responsecache
+from .models import MediaAsset, Post
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    "WORKERS": 2,                      # pool processes; 0 renders inline
+    "FORMAT": "WEBP",                  # or "JPEG"
+    "QUALITY": 80,
+    "MAX_UPLOAD_BYTES": 10 * 1024 * 1024,
+    "MAX_PIXELS": 40_000_000,          # decompression-bomb guard
+    # name -> (width, height, crop): crop = exact center crop, else fit inside the box
+    "VARIANTS": {
+        "thumb": (160, 160, True),
+        "feed": (1080, 1350, False),
+        "full": (2048, 2048, False),
+    },
+}
+SHA256 = re.compile(r"^[0-9a-f]{64}$")
+BATCH_SIZE = 2000  # rows per import_existing batch
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, "MEDIA_PIPELINE", {})}
+
+
+def available():
+    return config()["ENABLED"] and imaging.available()
+
+
+# -------- paths --------
+def original_path(sha, fmt):
+    return f"originals/{sha[:2]}/{sha}.{imaging.EXTENSIONS[fmt]}"
+
+
+def variant_path(sha, name, width, height, fmt):
+    return f"variants/{sha[:2]}/{sha}/{name}-{width}x{height}.{imaging.EXTENSIONS[fmt]}"
+
+
+def asset_for_url(url):
+    """Id of the asset whose original `url` points at (a media_url / avatar_url), or None."""
+    if not url:
+        return None
+    prefix = urlsplit(default_storage.url("originals/")).path
+    path = urlsplit(url).path
+    if not path.startswith(prefix):
+        return None
+    sha = path.rsplit("/", 1)[-1].partition(".")[0]
+    if not SHA256.match(sha):
+        return None
+    return MediaAsset.objects.filter(sha256=sha).values_list("pk", flat=True).first()
+
+
+def variant_urls(asset):
+    """{"status", "width", "height", <variant>: url, ...} for serializers (None without an asset)."""
+    if asset is None:
+        return None
+    data = {"status": asset.status, "width": asset.width, "height": asset.height,
+            "original": default_storage.url(asset.original)}
+    for name, variant in asset.variants.items():
+        data[name] = default_storage.url(variant["path"])
+    return data
+
+
+# -------- ingest --------
+def ingest(data, render=True):
+    """
+    Store `data` (an image's bytes) content-addressed; returns (asset, created).
+    New assets are scheduled for rendering on commit unless `render` is false.
+    Raises imaging.InvalidImage for anything that isn't an acceptable image.
+    """
+    cfg = config()
+    sha = hashlib.sha256(data).hexdigest()
+    asset = MediaAsset.objects.filter(sha256=sha).first()
+    if asset is not None:
+        return asset, False
+
+    fmt, width, height = imaging.probe(data, cfg["MAX_PIXELS"])
+    path = original_path(sha, fmt)
+    name = path if default_storage.exists(path) else default_storage.save(path, ContentFile(data))
+    asset, created = MediaAsset.objects.get_or_create(sha256=sha, defaults={
+        "original": name, "content_type": f"image/{imaging.EXTENSIONS[fmt]}",
+        "width": width, "height": height, "size": len(data),
+    })
+    if not created and name != asset.original:
+        default_storage.delete(name)  # lost a race with the same upload
+    if created and render:
+        transaction.on_commit(lambda: schedule([asset.pk]))
+    return asset, created
+
+
+# -------- rendering --------
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn: workers start clean instead of inheriting threads and DB connections
+                _pool = ProcessPoolExecutor(config()["WORKERS"], mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+
+atexit.register(shutdown)
+
+
+def _job(asset, cfg):
+    with default_storage.open(asset.original, "rb") as fh:
+        data = fh.read()
+    fmt = imaging.output_format(cfg["FORMAT"])
+    return fmt, (data, cfg["VARIANTS"], fmt, cfg["QUALITY"], cfg["MAX_PIXELS"])
+
+
+def _store(asset, fmt, rendered):
+    variants = {}
+    for name, (encoded, width, height) in rendered.items():
+        path = variant_path(asset.sha256, name, width, height, fmt)
+        if not default_storage.exists(path):
+            path = default_storage.save(path, ContentFile(encoded))
+        variants[name] = {"path": path, "width": width, "height": height}
+    MediaAsset.objects.filter(pk=asset.pk).update(
+        status=MediaAsset.READY, variants=variants, error="", processed_at=timezone.now()
+    )
+    # the posts' representation changed: move their validators and cached responses
+    post_ids = list(Post.objects.filter(media_id=asset.pk).values_list("pk", flat=True))
+    if post_ids:
+        Post.objects.filter(pk__in=post_ids).update(activity_at=Now())
+        responsecache.invalidate_posts(post_ids)
+
+
+def _fail(asset, exc):
+    logger.warning("media asset %s failed to render: %r", asset.pk, exc)
+    MediaAsset.objects.filter(pk=asset.pk).update(
+        status=MediaAsset.FAILED, error=repr(exc)[:255], processed_at=timezone.now()
+    )
+
+
+def _finish(asset, fmt, future):
+    # runs on the pool's result thread
+    try:
+        try:
+            rendered = future.result()
+        except Exception as exc:
+            _fail(asset, exc)
+        else:
+            _store(asset, fmt, rendered)
+    except Exception:
+        logger.exception("storing variants of media asset %s failed", asset.pk)
+    finally:
+        close_old_connections()
+
+
+def process(asset, cfg=None):
+    """Render and store `asset`'s variants in this process. Returns True on success."""
+    cfg = cfg or config()
+    try:
+        fmt, args = _job(asset, cfg)
+        rendered = imaging.render(*args)
+    except Exception as exc:
+        _fail(asset, exc)
+        return False
+    _store(asset, fmt, rendered)
+    return True
+
+
+def schedule(asset_ids):
+    """Render assets in the background (inline with WORKERS = 0)."""
+    cfg = config()
+    if not available():
+        return
+    for asset in MediaAsset.objects.filter(pk__in=asset_ids):
+        if not cfg["WORKERS"]:
+            process(asset, cfg)
+            continue
+        try:
+            fmt, args = _job(asset, cfg)
+        except Exception as exc:
+            _fail(asset, exc)
+            continue
+        future = get_pool().submit(imaging.render, *args)
+        future.add_done_callback(lambda f, asset=asset, fmt=fmt: _finish(asset, fmt, f))
+
+
+def render_all(assets, workers=None, log=None):
+    """
+    Render `assets` (an iterable, e.g. a queryset iterator) and wait for them, with
+    at most 2 x workers originals in memory. Returns (rendered, failed).
+    """
+    cfg = config()
+    workers = cfg["WORKERS"] if workers is None else workers
+    log = log or (lambda msg: None)
+    done = failed = 0
+    if not workers:
+        for asset in assets:
+            if process(asset, cfg):
+                done += 1
+            else:
+                failed += 1
+        return done, failed
+
+    def collect(asset, fmt, future):
+        try:
+            _store(asset, fmt, future.result())
+            return True
+        except Exception as exc:
+            _fail(asset, exc)
+            return False
+
+    in_flight = deque()
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for asset in assets:
+            try:
+                fmt, args = _job(asset, cfg)
+            except Exception as exc:
+                _fail(asset, exc)
+                failed += 1
+                continue
+            in_flight.append((asset, fmt, pool.submit(imaging.render, *args)))
+            while len(in_flight) >= 2 * workers or (in_flight and in_flight[0][2].done()):
+                ok = collect(*in_flight.popleft())
+                done, failed = done + ok, failed + (not ok)
+                if (done + failed) % 100 == 0:
+                    log(f"{done + failed} asset(s)...")
+        while in_flight:
+            ok = collect(*in_flight.popleft())
+            done, failed = done + ok, failed + (not ok)
+    return done, failed
+
+
+# -------- existing media --------
+def local_path(url):
+    """Storage path of a MEDIA_URL url (None for anything else)."""
+    prefix = urlsplit(default_storage.url("")).path
+    path = urlsplit(url or "").path
+    if not path.startswith(prefix) or len(path) == len(prefix):
+        return None
+    return path[len(prefix):]
+
+
+def import_existing(model, url_field, fk_field, log=None):
+    """
+    Link rows whose `url_field` points into MEDIA_ROOT: originals by hash, other
+    files by ingesting them (deduplicated like uploads), left pending for
+    render_all. Returns rows linked.
+    """
+    log = log or (lambda msg: None)
+    linked, last_pk = [], 0
+    rows = model.objects.filter(**{f"{fk_field}__isnull": True}).exclude(**{url_field: ""}).order_by("pk")
+    while batch := list(rows.filter(pk__gt=last_pk).values_list("pk", url_field)[:BATCH_SIZE]):
+        last_pk = batch[-1][0]
+        for pk, url in batch:
+            asset_id = asset_for_url(url)
+            path = local_path(url)
+            if asset_id is None and path is not None and default_storage.exists(path):
+                with default_storage.open(path, "rb") as fh:
+                    data = fh.read()
+                try:
+                    asset, _ = ingest(data, render=False)  # the caller renders pending assets
+                except imaging.InvalidImage as exc:
+                    log(f"skipped {model._meta.model_name} {pk}: {exc}")
+                    continue
+                asset_id = asset.pk
+            if asset_id is not None:
+                model.objects.filter(pk=pk).update(**{f"{fk_field}_id": asset_id})
+                linked.append(pk)
+    if model is Post and linked:
+        responsecache.invalidate_posts(linked)
+    return len(linked)
+
+
+@receiver(setting_changed)
+def _reset_pool(setting, **kwargs):
+    if setting == "MEDIA_PIPELINE":
+        shutdown()
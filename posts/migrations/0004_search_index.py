@@ -0,0 +1,51 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:31
+
+import django.db.models.deletion
+import posts.search
+from django.db import migrations, models
+
+
+def create_index(apps, schema_editor):
+    posts.search.rebuild(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    if not posts.search.is_available(schema_editor.connection):
+        return
+    for fts in posts.search.INDEXES:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {fts}")
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CommentSearch',
+            fields=[
+                ('comment', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='posts.comment')),
+                ('content', posts.search.FTSField()),
+            ],
+            options={
+                'db_table': 'posts_comment_fts',
+                'managed': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PostSearch',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='posts.post')),
+                ('content', posts.search.FTSField()),
+            ],
+            options={
+                'db_table': 'posts_post_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_scores(apps, schema_editor):
+    from posts import ranking
+
+    ranking.recompute(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_post_activity_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorAffinity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=1.0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='rank_score',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='affinity',
+            field=models.FloatField(default=1.0),
+        ),
+        migrations.AddField(
+            model_name='timelineentry',
+            name='rank_score',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-rank_score', '-post'], name='posts_timel_user_id_a49118_idx'),
+        ),
+        migrations.AddField(
+            model_name='authoraffinity',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='authoraffinity',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='authoraffinity',
+            constraint=models.UniqueConstraint(fields=('author', 'user'), name='uniq_author_affinity'),
+        ),
+        migrations.RunPython(backfill_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def index_existing_posts(apps, schema_editor):
+    from posts import tags
+
+    tags.reindex(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_follow_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32, unique=True)),
+                ('posts_count', models.PositiveIntegerField(default=0, editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['posts_count'], name='posts_tag_posts_c_3817ac_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.post')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_tags', to='posts.tag')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', '-created_at', '-post'], name='posts_postt_tag_id_fbd77f_idx')],
+                'constraints': [models.UniqueConstraint(fields=('post', 'tag'), name='uniq_post_tag')],
+            },
+        ),
+        migrations.RunPython(index_existing_posts, migrations.RunPython.noop),
+    ]
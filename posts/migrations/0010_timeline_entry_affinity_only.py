@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:34
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_media_assets'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='timelineentry',
+            name='posts_timel_user_id_a49118_idx',
+        ),
+        migrations.RemoveField(
+            model_name='timelineentry',
+            name='rank_score',
+        ),
+    ]
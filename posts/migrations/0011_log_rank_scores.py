@@ -0,0 +1,30 @@
+# Post.rank_score now stores log2 of the epoch-relative score (posts/ranking.py).
+
+from django.db import migrations
+from django.db.models import F, Value
+from django.db.models.functions import Log, Power
+
+LOG_ZERO = -1e9  # posts.ranking.LOG_ZERO
+
+
+def to_log(apps, schema_editor):
+    Post = apps.get_model("posts", "Post")
+    Post.objects.filter(rank_score__gt=0).update(rank_score=Log(Value(2.0), F("rank_score")))
+    Post.objects.filter(rank_score__lte=0).update(rank_score=LOG_ZERO)
+
+
+def to_linear(apps, schema_editor):
+    Post = apps.get_model("posts", "Post")
+    Post.objects.filter(rank_score__lte=LOG_ZERO).update(rank_score=0.0)
+    Post.objects.exclude(rank_score=0.0).update(rank_score=Power(Value(2.0), F("rank_score")))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_timeline_entry_affinity_only'),
+    ]
+
+    operations = [
+        migrations.RunPython(to_log, to_linear),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from .search import FTSField
+
 
 class Post(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="posts")
@@ -9,6 +11,19 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     # NEW: track edits
     updated_at = models.DateTimeField(auto_now=True)  # ← added
+    # Denormalized engagement counters (kept in sync by posts/signals.py,
+    # rebuilt by `manage.py rebuild_post_counters`)
+    likes_count = models.PositiveIntegerField(default=0, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    bookmarks_count = models.PositiveIntegerField(default=0, editable=False)
+    # last time any counter moved; feeds detail Last-Modified together with updated_at
+    activity_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # log2 of the time-decayed engagement score for ?rank=top (posts/ranking.py)
+    rank_score = models.FloatField(default=0.0, editable=False)
+    # the uploaded image media_url points at, with its resized variants (posts/media.py)
+    media = models.ForeignKey(
+        "MediaAsset", null=True, blank=True, on_delete=models.SET_NULL, related_name="+", editable=False
+    )
 
     class Meta:
         ordering = ["-created_at"]
@@ -21,15 +36,6 @@ class Post(models.Model):
     def __str__(self):
         return f"Post({self.id}) by {self.author.username}"
 
-    # Convenience properties (no DB change)
-    @property
-    def likes_count(self) -> int:
-        return self.likes.count()
-
-    @property
-    def comments_count(self) -> int:
-        return self.comments.count()
-
 
 class Follow(models.Model):
     follower = models.ForeignKey(User, on_delete=models.CASCADE, related_name="following")
@@ -43,7 +49,10 @@ class Follow(models.Model):
         ]
         indexes = [
             models.Index(fields=["follower", "following"]),
-            models.Index(fields=["following"]),
+            # follower / following directories: scanned backwards, newest first, with the
+            # rowid as tie-breaker -- no sort step (also serve following_id = ?)
+            models.Index(fields=["following", "created_at"]),
+            models.Index(fields=["follower", "created_at"]),
         ]
 
     def __str__(self):
@@ -86,7 +95,10 @@ class Comment(models.Model):
 
     def __str__(self):
         return f"Comment({self.id}) by {self.user.username} on Post({self.post_id})"
-        class Bookmark(models.Model):
+
+
+# NEW: Bookmark model
+class Bookmark(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="bookmarks")
     post = models.ForeignKey("Post", on_delete=models.CASCADE, related_name="bookmarks")
     created_at = models.DateTimeField(auto_now_add=True)
@@ -102,3 +114,140 @@ class Comment(models.Model):
 
     def __str__(self):
         return f"Bookmark(user={self.user.username}, post={self.post_id})"
+
+
+# Home timeline (fan-out on write): one row per (reader, post) for followed
+# authors and the reader's own posts. Filled by posts/timeline.py.
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="timeline_entries")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="timeline_entries")
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    created_at = models.DateTimeField()  # copy of post.created_at, for index-ordered reads
+    # the reader's affinity for the author; ?rank=top combines it with the post's
+    # score at read time, so engagement never rewrites entries (posts/ranking.py)
+    affinity = models.FloatField(default=1.0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"], name="uniq_timeline_entry"),
+        ]
+        indexes = [
+            # covering index for "my feed, newest first"
+            models.Index(fields=["user", "-created_at", "-post"]),
+            models.Index(fields=["user", "author"]),
+        ]
+
+    def __str__(self):
+        return f"TimelineEntry(user={self.user_id}, post={self.post_id})"
+
+
+# How much a reader engages with an author's posts, as a score multiplier
+# (recomputed by `manage.py rank_feed`; absent = 1.0)
+class AuthorAffinity(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField(default=1.0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["author", "user"], name="uniq_author_affinity"),
+        ]
+
+    def __str__(self):
+        return f"AuthorAffinity(user={self.user_id}, author={self.author_id}, score={self.score:.2f})"
+
+
+# Authors whose follower count crossed FEED_FANOUT_MAX_FOLLOWERS: their posts are
+# not fanned out and are merged into followers' feeds at read time instead.
+class HighFanoutAuthor(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="high_fanout")
+    marked_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"HighFanoutAuthor({self.user_id})"
+
+
+# Hashtags used in posts (posts/tags.py). `name` is the lowercased tag without
+# the "#" and doubles as the URL slug; posts_count is kept incrementally.
+class Tag(models.Model):
+    name = models.CharField(max_length=32, unique=True)
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["posts_count"]),  # most used tags, scanned backwards
+        ]
+
+    def __str__(self):
+        return f"#{self.name}"
+
+
+# Inverted index tag -> posts, one row per (post, tag). created_at is a copy of
+# post.created_at, so a tag's posts come off the index already newest first.
+class PostTag(models.Model):
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name="post_tags")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name="post_tags")
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["post", "tag"], name="uniq_post_tag"),
+        ]
+        indexes = [
+            models.Index(fields=["tag", "-created_at", "-post"]),
+        ]
+
+    def __str__(self):
+        return f"PostTag(post={self.post_id}, tag={self.tag_id})"
+
+
+# An uploaded image, stored once per distinct content (sha256) with its resized,
+# re-encoded variants. Rendered off the request path by posts/media.py.
+class MediaAsset(models.Model):
+    PENDING, READY, FAILED = "pending", "ready", "failed"
+    STATUSES = [(PENDING, "pending"), (READY, "ready"), (FAILED, "failed")]
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    original = models.CharField(max_length=255)  # storage path
+    content_type = models.CharField(max_length=32)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()  # bytes
+    status = models.CharField(max_length=8, choices=STATUSES, default=PENDING)
+    # {name: {"path", "width", "height"}} once rendered
+    variants = models.JSONField(default=dict, blank=True)
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status"]),
+        ]
+
+    def __str__(self):
+        return f"MediaAsset({self.sha256[:12]}, {self.status})"
+
+
+# Read-only views of the FTS5 indexes created by posts/search.py (rowid = base row id).
+class PostSearch(models.Model):
+    post = models.OneToOneField(
+        Post, primary_key=True, db_column="rowid", on_delete=models.DO_NOTHING, related_name="search"
+    )
+    content = FTSField()
+
+    class Meta:
+        managed = False
+        db_table = "posts_post_fts"
+
+
+class CommentSearch(models.Model):
+    comment = models.OneToOneField(
+        Comment, primary_key=True, db_column="rowid", on_delete=models.DO_NOTHING, related_name="search"
+    )
+    content = FTSField()
+
+    class Meta:
+        managed = False
+        db_table = "posts_comment_fts"
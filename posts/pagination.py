@@ -0,0 +1,216 @@
+# posts/pagination.py
+"""
+Keyset (cursor) pagination over (created_at, id), newest first.
+
+- ?cursor=<opaque>   -> next/previous page, no COUNT(*) and no OFFSET scan
+- ?page_size=<n>     -> page size (capped at max_page_size)
+- ?page=<n>          -> classic page-number mode (with count) for admin-style clients
+
+Views can page over other columns by setting `cursor_ordering`, e.g. the bookmarks
+action pages by ("bookmarked_at", "bookmark_id").
+
+`apaginate_queryset` is the same for async views (posts/asyncviews.py).
+"""
+import base64
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, FieldError
+from django.core.paginator import InvalidPage
+from django.db import models
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    page_size = api_settings.PAGE_SIZE or 10
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    page_query_param = "page"
+    ordering = ("created_at", "id")  # always descending, last field must be unique
+    invalid_cursor_message = "Invalid cursor"
+
+    # -------- cursor encoding --------
+    @staticmethod
+    def _dump(value):
+        return value.isoformat() if isinstance(value, datetime) else value
+
+    @staticmethod
+    def _load(value, field):
+        """A cursor position value as `field`'s Python type; ValueError if it isn't one."""
+        if value is None or isinstance(value, (bool, list, dict)):
+            raise ValueError(value)
+        if getattr(field, "is_relation", False):
+            field = field.target_field
+        if isinstance(field, models.DateTimeField):
+            parsed = parse_datetime(value) if isinstance(value, str) else None
+            if parsed is None:
+                raise ValueError(value)
+            return parsed
+        if isinstance(field, models.IntegerField):
+            return int(value)
+        if isinstance(field, models.FloatField):
+            return float(value)
+        if field is None and isinstance(value, str):
+            return parse_datetime(value) or value
+        return value
+
+    @staticmethod
+    def _output_field(queryset, name):
+        """The model field or annotation `name` is ordered by (None if unknown)."""
+        try:
+            if name in queryset.query.annotations:
+                return queryset.query.annotations[name].output_field
+            return queryset.model._meta.get_field(name)
+        except (FieldDoesNotExist, FieldError):
+            return None
+
+    def encode_cursor(self, position, reverse):
+        payload = {"p": [self._dump(v) for v in position], "r": int(reverse)}
+        token = base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token.rstrip("="))
+
+    def decode_cursor(self, request, queryset=None):
+        """(position, reverse) from ?cursor=; NotFound unless every value fits its ordering field."""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        if queryset is None:
+            fields = [None] * len(self.fields)
+        else:
+            fields = [self._output_field(queryset, name) for name in self.fields]
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            values = payload["p"]
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError(values)
+            position = [self._load(v, field) for v, field in zip(values, fields)]
+            reverse = bool(payload.get("r"))
+        except (TypeError, ValueError, KeyError, OverflowError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    # -------- pagination --------
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _after(self, position, older):
+        """Rows strictly after `position` in (created_at, id) order (older or newer)."""
+        lookup = "lt" if older else "gt"
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            equal = {f: position[j] for j, f in enumerate(self.fields[:i])}
+            condition |= Q(**equal, **{f"{field}__{lookup}": position[i]})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.page_query_param in request.query_params:
+            self.fallback = PageNumberPagination()
+            self.fallback.page_size = self.get_page_size(request)
+            return self.fallback.paginate_queryset(queryset, request, view)
+        self.fallback = None
+
+        qs, page_size, position, reverse = self._window(queryset, request, view)
+        return self._finish(list(qs[:page_size + 1]), page_size, position, reverse)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        if self.page_query_param in request.query_params:
+            self.fallback = PageNumberPagination()
+            self.fallback.page_size = self.get_page_size(request)
+            return await self._apage_numbers(queryset, request)
+        self.fallback = None
+
+        qs, page_size, position, reverse = self._window(queryset, request, view)
+        rows = [row async for row in qs[:page_size + 1].aiterator()]
+        return self._finish(rows, page_size, position, reverse)
+
+    async def _apage_numbers(self, queryset, request):
+        # PageNumberPagination.paginate_queryset with the COUNT and the page fetched async
+        fallback = self.fallback
+        fallback.request = request
+        paginator = fallback.django_paginator_class(queryset, fallback.page_size)
+        paginator.count = await queryset.acount()  # cached_property: skips the sync count()
+        page_number = fallback.get_page_number(request, paginator)
+        try:
+            fallback.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(fallback.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        fallback.page.object_list = [row async for row in fallback.page.object_list.aiterator()]
+        return list(fallback.page)
+
+    def _window(self, queryset, request, view):
+        """The ordered/filtered queryset for the requested page (not yet fetched)."""
+        self.request = request
+        self.fields = tuple(getattr(view, "cursor_ordering", self.ordering))
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset)
+
+        desc = [f"-{f}" for f in self.fields]
+        if reverse:
+            qs = queryset.filter(self._after(position, older=False)).order_by(*self.fields)
+        else:
+            qs = queryset.order_by(*desc)
+            if position is not None:
+                qs = qs.filter(self._after(position, older=True))
+        return qs, page_size, position, reverse
+
+    def _finish(self, rows, page_size, position, reverse):
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        # older pages exist if we came back from one or there are extra rows
+        self.has_next = has_more if not reverse else True
+        self.has_previous = position is not None and (not reverse or has_more)
+        self.page = rows
+        return rows
+
+    def _position(self, obj):
+        if isinstance(obj, dict):  # values() rows
+            return [obj[f] for f in self.fields]
+        return [getattr(obj, f) for f in self.fields]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self._position(self.page[0]), reverse=True)
+
+    def get_paginated_response(self, data):
+        if self.fallback is not None:
+            return self.fallback.get_paginated_response(data)
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
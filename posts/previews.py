@@ -0,0 +1,95 @@
+# posts/previews.py
+"""
+?comments_preview=N: each post in a list / feed / detail response carries its N
+newest comments, fetched for the whole page in one query:
+
+    SELECT ... FROM (
+        SELECT ..., ROW_NUMBER() OVER (PARTITION BY post_id
+                                       ORDER BY created_at DESC, id DESC) AS rank
+        FROM posts_comment JOIN auth_user ... WHERE post_id IN (<page>)
+    ) WHERE rank <= N
+
+Rows are values() dicts with the commenter's username joined in and the post
+left out (the client already has it), serialized by CommentPreviewSerializer.
+"""
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from rest_framework.exceptions import ValidationError
+
+from .models import Comment
+
+MAX_PREVIEW = 10
+QUERY_PARAM = "comments_preview"
+FIELDS = ("id", "post_id", "user_id", "content", "created_at", "updated_at")
+
+
+def _queryset(post_ids, n):
+    return (
+        Comment.objects.filter(post_id__in=post_ids)
+        .annotate(rank=Window(RowNumber(), partition_by=[F("post_id")],
+                              order_by=[F("created_at").desc(), F("id").desc()]))
+        .filter(rank__lte=n)
+        .order_by("post_id", "rank")
+        .values(*FIELDS, username=F("user__username"))
+    )
+
+
+class CommentPreviews:
+    """{post id: newest comment rows} for one page of posts."""
+
+    __slots__ = ("post_ids", "by_post")
+
+    def __init__(self, post_ids=(), rows=()):
+        self.post_ids = frozenset(post_ids)
+        self.by_post = {}
+        for row in rows:
+            self.by_post.setdefault(row["post_id"], []).append(row)
+
+    def covers(self, post):
+        return post.pk in self.post_ids
+
+    def get(self, post):
+        return self.by_post.get(post.pk, [])
+
+    @classmethod
+    def for_posts(cls, posts, n):
+        post_ids = [p.pk for p in posts]
+        if not post_ids or not n:
+            return cls(post_ids)
+        return cls(post_ids, _queryset(post_ids, n))
+
+    @classmethod
+    async def afor_posts(cls, posts, n):
+        post_ids = [p.pk for p in posts]
+        if not post_ids or not n:
+            return cls(post_ids)
+        return cls(post_ids, [row async for row in _queryset(post_ids, n)])
+
+
+def requested(request):
+    """N from ?comments_preview=N (0 when absent); 400 unless 0 <= N <= MAX_PREVIEW."""
+    raw = request.query_params.get(QUERY_PARAM) if request is not None else None
+    if not raw:
+        return 0
+    try:
+        n = int(raw)
+    except ValueError:
+        n = -1
+    if not 0 <= n <= MAX_PREVIEW:
+        raise ValidationError({QUERY_PARAM: f"Must be an integer from 0 to {MAX_PREVIEW}."})
+    return n
+
+
+class CommentsPreviewViewMixin:
+    """Passes ?comments_preview=N to the post serializers and into the ETag."""
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context[QUERY_PARAM] = requested(self.request)
+        return context
+
+    def get_etag_extra(self, rows):
+        return [*super().get_etag_extra(rows), requested(self.request)]
+
+    async def aget_etag_extra(self, rows):
+        return [*(await super().aget_etag_extra(rows)), requested(self.request)]
@@ -0,0 +1,250 @@
+# posts/ranking.py
+"""
+Time-decayed scores for the ranked home feed (?rank=top).
+
+    score(post)         = w_post + sum over events of w_kind * 2^-(age / HALF_LIFE)
+    score(reader, post) = score(post) * affinity(reader, author)
+
+Every term is taken relative to a fixed epoch instead of "now", i.e. multiplied by
+2^((t - EPOCH) / HALF_LIFE). Decay is then the same factor for every post, so the
+epoch-relative sums sort exactly like the decayed ones and an event only ever
+*adds* a term: a like, comment or bookmark is one single-row UPDATE of
+Post.rank_score. Timeline entries only store the reader's affinity and the ranked
+feed combines the two at read time, so engagement on a widely followed post
+doesn't rewrite one entry per follower inside the request.
+
+Those sums double every half-life and would overflow a float after ~1000 of them,
+so Post.rank_score stores their base-2 logarithm: a term is
+log2(w_kind) + (t - EPOCH) / HALF_LIFE, a few thousand after centuries, and terms
+are added (removed) with log2(2^a + 2^b) (log2(2^a - 2^b)) in SQL. The feed orders
+by rank_score + log2(affinity). LOG_ZERO stands for an empty sum.
+
+`recompute()` (manage.py rank_feed) rebuilds everything from the engagement tables:
+post scores -- vectorized with NumPy when it's installed -- then reader/author
+affinities from recent interactions, then the affinities copied onto timeline entries.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, Value, When
+from django.db.models.functions import Abs, Greatest, Log, Power
+from django.utils import timezone
+
+try:
+    import numpy as np
+except ImportError:  # optional: pure-Python scoring
+    np = None
+
+DEFAULTS = {
+    "HALF_LIFE_HOURS": 24,
+    "EPOCH": datetime(2026, 1, 1, tzinfo=dt_timezone.utc),
+    "WEIGHTS": {"post": 1.0, "like": 1.0, "comment": 3.0, "bookmark": 2.0},
+    "AFFINITY_WEIGHT": 0.5,   # affinity = 1 + weight * ln(1 + interactions)
+    "AFFINITY_DAYS": 30,      # interactions counted for affinity
+    "BATCH_SIZE": 2000,
+}
+# event kind -> model name
+EVENTS = {"like": "Like", "comment": "Comment", "bookmark": "Bookmark"}
+# log2 of an empty score (no terms left); also what a zero weight contributes
+LOG_ZERO = -1e9
+
+
+def config():
+    cfg = {**DEFAULTS, **getattr(settings, "FEED_RANKING", {})}
+    cfg["WEIGHTS"] = {**DEFAULTS["WEIGHTS"], **cfg["WEIGHTS"]}
+    return cfg
+
+
+def _models(apps=None):
+    apps = apps or global_apps
+    return {name: apps.get_model("posts", name)
+            for name in ("Post", "TimelineEntry", "AuthorAffinity", *EVENTS.values())}
+
+
+def _log2(weight):
+    return math.log2(weight) if weight > 0 else LOG_ZERO
+
+
+def log_term(kind, when, cfg=None):
+    """log2 of the epoch-relative weight of one `kind` event at `when`."""
+    cfg = cfg or config()
+    return _log2(cfg["WEIGHTS"][kind]) + (when - cfg["EPOCH"]).total_seconds() / (cfg["HALF_LIFE_HOURS"] * 3600)
+
+
+def log_add(a, b):
+    """log2(2^a + 2^b) without leaving log space."""
+    hi, lo = max(a, b), min(a, b)
+    return hi + math.log2(1.0 + 2.0 ** (lo - hi))
+
+
+def base_score(created_at=None):
+    """A new post's (log) score before any engagement."""
+    return log_term("post", created_at or timezone.now())
+
+
+def affinity(interactions, cfg=None):
+    cfg = cfg or config()
+    return 1.0 + cfg["AFFINITY_WEIGHT"] * math.log1p(interactions)
+
+
+# -------- incremental --------
+def record(kind, post_ids, when=None, n=1, sign=1):
+    """
+    Add (sign=-1: remove) `n` `kind` events at `when` to each post in `post_ids`.
+    Removals must pass the original event time so they cancel what was added.
+    """
+    from .models import Post
+
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+    term = math.log2(n) + log_term(kind, when or timezone.now())
+    if term <= LOG_ZERO:
+        return
+    score, term, two = F("rank_score"), Value(term), Value(2.0)
+    if sign > 0:
+        # log2(2^score + 2^term)
+        new = Greatest(score, term) + Log(two, 1.0 + Power(two, -Abs(score - term)))
+    else:
+        # log2(2^score - 2^term); nothing (or only rounding error) left -> LOG_ZERO
+        new = Case(
+            When(rank_score__gt=term.value + 1e-9, then=score + Log(two, 1.0 - Power(two, term - score))),
+            default=Value(LOG_ZERO),
+        )
+    Post.objects.filter(pk__in=post_ids).update(rank_score=new)
+
+
+def affinities_for(author_id, user_ids=None):
+    """{reader id: affinity} for `author_id` (readers without a row are 1.0)."""
+    from .models import AuthorAffinity
+
+    rows = AuthorAffinity.objects.filter(author_id=author_id)
+    if user_ids is not None:
+        rows = rows.filter(user_id__in=user_ids)
+    return dict(rows.values_list("user_id", "score"))
+
+
+# -------- batch --------
+def _timestamp(value):
+    return value.timestamp()
+
+
+def score_posts(post_ids, created, events, cfg=None):
+    """
+    (Log) scores for `post_ids` (sorted) with creation timestamps `created`, given
+    `events` = {kind: (post ids, timestamps)}. Returns a list aligned with post_ids.
+    """
+    cfg = cfg or config()
+    epoch = cfg["EPOCH"].timestamp()
+    half_life = cfg["HALF_LIFE_HOURS"] * 3600
+    weights = cfg["WEIGHTS"]
+
+    if np is not None:
+        ids = np.asarray(post_ids, dtype=np.int64)
+        scores = _log2(weights["post"]) + (np.asarray(created, dtype=np.float64) - epoch) / half_life
+        for kind, (event_posts, stamps) in events.items():
+            if not len(event_posts) or weights[kind] <= 0:
+                continue
+            index = np.searchsorted(ids, np.asarray(event_posts, dtype=np.int64))
+            terms = math.log2(weights[kind]) + (np.asarray(stamps, dtype=np.float64) - epoch) / half_life
+            np.logaddexp2.at(scores, index, terms)
+        return scores.tolist()
+
+    position = {pid: i for i, pid in enumerate(post_ids)}
+    scores = [_log2(weights["post"]) + (ts - epoch) / half_life for ts in created]
+    for kind, (event_posts, stamps) in events.items():
+        if weights[kind] <= 0:
+            continue
+        w = math.log2(weights[kind])
+        for pid, ts in zip(event_posts, stamps):
+            i = position[pid]
+            scores[i] = log_add(scores[i], w + (ts - epoch) / half_life)
+    return scores
+
+
+def recompute_posts(apps=None, batch_size=None):
+    """Rebuild Post.rank_score from the engagement tables, one id range at a time."""
+    models = _models(apps)
+    Post = models["Post"]
+    cfg = config()
+    batch_size = batch_size or cfg["BATCH_SIZE"]
+    done = 0
+    last_id = 0
+    while True:
+        rows = list(Post.objects.filter(pk__gt=last_id).order_by("pk").values_list("pk", "created_at")[:batch_size])
+        if not rows:
+            return done
+        post_ids = [pk for pk, _ in rows]
+        created = [_timestamp(ts) for _, ts in rows]
+        lo, hi = post_ids[0], post_ids[-1]
+        events = {}
+        for kind, name in EVENTS.items():
+            pairs = models[name].objects.filter(post_id__gte=lo, post_id__lte=hi).values_list("post_id", "created_at")
+            events[kind] = ([], [])
+            for pid, ts in pairs.iterator(chunk_size=batch_size):
+                events[kind][0].append(pid)
+                events[kind][1].append(_timestamp(ts))
+        scores = score_posts(post_ids, created, events, cfg)
+        # executemany of a primary-key UPDATE: bulk_update's CASE WHEN grows with the batch
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                f"UPDATE {Post._meta.db_table} SET rank_score = %s WHERE id = %s", list(zip(scores, post_ids))
+            )
+        done += len(rows)
+        last_id = hi
+
+
+def recompute_affinities(apps=None):
+    """Rebuild AuthorAffinity from each reader's recent interactions with each author."""
+    models = _models(apps)
+    cfg = config()
+    since = timezone.now() - timedelta(days=cfg["AFFINITY_DAYS"])
+    counts = defaultdict(int)
+    for name in EVENTS.values():
+        rows = (
+            models[name].objects.filter(created_at__gte=since)
+            .values_list("user_id", "post__author_id").annotate(n=Count("pk")).order_by()
+        )
+        for user_id, author_id, n in rows.iterator():
+            if user_id != author_id:
+                counts[(user_id, author_id)] += n
+
+    table = models["AuthorAffinity"]._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        # plain executemany: one row per pair, without a model instance each
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.executemany(
+            f"INSERT INTO {table} (user_id, author_id, score) VALUES (%s, %s, %s)",
+            [(u, a, affinity(n, cfg)) for (u, a), n in counts.items()],
+        )
+    return len(counts)
+
+
+def recompute_timelines(apps=None):
+    """Copy AuthorAffinity onto timeline entries (one set-based statement + one per affinity pair)."""
+    models = _models(apps)
+    TimelineEntry, AuthorAffinity = models["TimelineEntry"], models["AuthorAffinity"]
+    pairs = list(AuthorAffinity.objects.values_list("score", "user_id", "author_id"))
+    table = TimelineEntry._meta.db_table
+    with transaction.atomic():
+        TimelineEntry.objects.exclude(affinity=1.0).update(affinity=1.0)
+        with connection.cursor() as cursor:
+            # entries were just reset to affinity 1: set them per (reader, author)
+            cursor.executemany(
+                f"UPDATE {table} SET affinity = %s WHERE user_id = %s AND author_id = %s",
+                [(score, user_id, author_id) for score, user_id, author_id in pairs],
+            )
+    return len(pairs)
+
+
+def recompute(apps=None):
+    """Full batch recompute; returns counts per stage."""
+    return {
+        "posts": recompute_posts(apps),
+        "affinities": recompute_affinities(apps),
+        "timeline_pairs": recompute_timelines(apps),
+    }
@@ -0,0 +1,215 @@
+# posts/ratelimit.py
+"""
+Token-bucket rate limits for write endpoints (settings.RATE_LIMITS).
+
+Every (scope, client) pair has a bucket of `n` tokens refilled at `n` per period:
+"30/min" allows bursts of 30 requests, then one every 2 seconds. The client is the
+user for authenticated requests and the IP address otherwise: REMOTE_ADDR, or the
+X-Forwarded-For entry added by the nearest of REST_FRAMEWORK["NUM_PROXIES"]
+trusted proxies. Without NUM_PROXIES the header, which the client controls, is
+ignored.
+
+A bucket is stored as one number, the time at which it will be full again (GCRA's
+"theoretical arrival time", an exact token-bucket equivalent), so a decision is a
+read and a write of that number in the store and never touches the database:
+
+    full_at = max(full_at, now) + period / n    # spend a token
+    allowed while full_at - now <= period       # ... if the bucket still had one
+    Retry-After = full_at - now - period        # otherwise, when it will
+
+Rejected requests spend nothing. Stores (RATE_LIMITS["BACKEND"]):
+- "process": a per-worker LRU dict
+- "django":  a Django cache alias shared by the workers (file-based, local
+             memcached/redis, ...). The read-modify-write isn't atomic, so two
+             concurrent requests from one client can both take the last token;
+             and a bucket the cache evicts starts over full (LocMemCache keeps
+             300 entries unless OPTIONS["MAX_ENTRIES"] says otherwise).
+
+Views opt in with `throttle_classes = [TokenBucketThrottle]` plus `throttle_scope`,
+or `throttle_scopes` ({action: scope}) for viewsets; DRF answers a rejection with
+429 and Retry-After.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DEFAULTS = {
+    "ENABLED": True,
+    "BACKEND": "process",
+    "ALIAS": "default",
+    "KEY_PREFIX": "ratelimit",
+    "MAX_ENTRIES": 100_000,  # process backend: buckets kept per worker (LRU)
+    "RATES": {
+        "engagement": "120/min",  # like / unlike / bookmark / unbookmark
+        "batch": "20/min",        # POST /api/posts/batch/ (up to 500 operations each)
+        "comment": "20/min",
+        "auth": "10/min",         # credential checks, per IP
+        "upload": "30/h",         # image uploads (posts/media.py)
+    },
+}
+PERIODS = {"s": 1, "sec": 1, "second": 1, "m": 60, "min": 60, "minute": 60,
+           "h": 3600, "hour": 3600, "d": 86400, "day": 86400}
+
+
+def config():
+    cfg = {**DEFAULTS, **getattr(settings, "RATE_LIMITS", {})}
+    cfg["RATES"] = {**DEFAULTS["RATES"], **cfg["RATES"]}
+    return cfg
+
+
+def parse_rate(rate):
+    """"30/min" -> (30, 60.0); None -> None (unlimited)."""
+    if rate is None:
+        return None
+    n, _, period = rate.partition("/")
+    try:
+        return int(n), float(PERIODS[period])
+    except (KeyError, ValueError):
+        raise ValueError(f"Invalid rate {rate!r}; expected <n>/<{'|'.join(PERIODS)}>.")
+
+
+# -------- stores --------
+class ProcessStore:
+    """full_at per bucket key in a thread-safe LRU dict."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, interval, period, now):
+        """Spend a token; returns 0 if allowed, else the seconds until one is available."""
+        with self._lock:
+            full_at = max(self._data.get(key, now), now) + interval
+            if full_at - now > period:
+                return full_at - now - period
+            self._data[key] = full_at
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_entries:
+                self._data.popitem(last=False)  # least recently used: refilled long ago
+            return 0
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class CacheStore:
+    """full_at per bucket key in a Django cache; entries expire once the bucket is full."""
+
+    def __init__(self, alias, prefix):
+        self.cache = caches[alias]
+        self.prefix = prefix
+
+    def take(self, key, interval, period, now):
+        cache_key = f"{self.prefix}:{key}"
+        full_at = max(self.cache.get(cache_key, now), now) + interval
+        if full_at - now > period:
+            return full_at - now - period
+        self.cache.set(cache_key, full_at, timeout=int(full_at - now) + 1)
+        return 0
+
+    def delete(self, keys):
+        self.cache.delete_many([f"{self.prefix}:{key}" for key in keys])
+
+    def clear(self):
+        pass  # entries expire on their own; other keys share the cache
+
+
+class Limiter:
+    def __init__(self, cfg=None):
+        cfg = cfg or config()
+        self.rates = {scope: parse_rate(rate) for scope, rate in cfg["RATES"].items()}
+        if cfg["BACKEND"] == "django":
+            self.store = CacheStore(cfg["ALIAS"], cfg["KEY_PREFIX"])
+        else:
+            self.store = ProcessStore(cfg["MAX_ENTRIES"])
+
+    def take(self, scope, client, now=None):
+        """0 if `client` may make a `scope` request now, else the seconds to wait."""
+        rate = self.rates.get(scope)
+        if rate is None:
+            return 0
+        n, period = rate
+        return self.store.take(f"{scope}:{client}", period / n, period, time.time() if now is None else now)
+
+    def refill(self, client, scopes=None):
+        """Forget `client`'s buckets (all scopes by default), i.e. fill them up."""
+        self.store.delete([f"{scope}:{client}" for scope in scopes or self.rates])
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """The process-wide limiter, or None when RATE_LIMITS["ENABLED"] is off."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                cfg = config()
+                _limiter = Limiter(cfg) if cfg["ENABLED"] else False
+    return _limiter or None
+
+
+def reset():
+    global _limiter
+    if _limiter:
+        _limiter.store.clear()
+    _limiter = None
+
+
+@receiver(setting_changed)
+def _reset_limiter(setting, **kwargs):
+    if setting in ("RATE_LIMITS", "CACHES"):
+        reset()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """DRF throttle over the process-wide Limiter; views without a scope aren't limited."""
+
+    def get_scope(self, view):
+        scopes = getattr(view, "throttle_scopes", None)
+        if scopes is not None:
+            return scopes.get(getattr(view, "action", None))
+        return getattr(view, "throttle_scope", None)
+
+    def get_client(self, request):
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return f"user:{user.pk}"
+        return f"ip:{self.get_ident(request)}"
+
+    def get_ident(self, request):
+        # DRF trusts X-Forwarded-For when NUM_PROXIES is unset; only do so behind known proxies
+        if not api_settings.NUM_PROXIES:
+            return request.META.get("REMOTE_ADDR")
+        return super().get_ident(request)
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope = self.get_scope(view)
+        limiter = get_limiter() if scope else None
+        if limiter is None:
+            return True
+        wait = limiter.take(scope, self.get_client(request))
+        if wait:
+            self.wait_seconds = wait
+            return False
+        return True
+
+    def wait(self):
+        return self.wait_seconds
@@ -0,0 +1,355 @@
+# posts/responsecache.py
+"""
+Shared response cache for public reads (anonymous GETs on posts and comments).
+
+- Key: path + normalized query params + viewer class + the current version of each
+  tag the response depends on ("post:12", "posts", "comments:post:12", ...).
+  Writes bump tag versions (signals, batch endpoint, like buffer), so stale entries
+  are never read again and simply age out.
+- List entries also record the versions of their rows' tags (get_row_cache_tags)
+  and are recomputed when one has moved since. "posts" only tracks which posts
+  exist, so a like on one post refreshes the pages showing it, not every list.
+- Stampede protection: on a miss, one request takes a short lock (cache.add) and
+  computes; concurrent misses for the same key wait for its result.
+- Backend: any Django cache alias (RESPONSE_CACHE["ALIAS"]), e.g. locmem for one
+  worker, FileBasedCache or a local memcached/redis shared by several workers.
+- Async views (posts/asyncviews.py) use the a-prefixed twins, which go through the
+  cache's async API and wait on the event loop instead of sleeping a thread.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from .dbrouting import on_primary
+
+DEFAULTS = {
+    "ENABLED": True,
+    "ALIAS": "default",
+    "TIMEOUT": 60,              # seconds a response may live
+    "LOCK_TIMEOUT": 5,          # seconds a recompute lock is held at most
+    "WAIT": 2.0,                # seconds a concurrent miss waits for the winner
+    "VIEWER_CLASSES": ("anon",),
+    "KEY_PREFIX": "rc",
+}
+POLL_INTERVAL = 0.01
+
+_stats = {"hits": 0, "misses": 0, "waits": 0, "stores": 0}
+_stats_lock = threading.Lock()
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, "RESPONSE_CACHE", {})}
+
+
+def _cache():
+    return caches[config()["ALIAS"]]
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats():
+    with _stats_lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {**_stats, "hit_ratio": _stats["hits"] / lookups if lookups else 0.0}
+
+
+def reset_stats():
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def viewer_class(request):
+    return "user" if request.user.is_authenticated else "anon"
+
+
+# -------- versions --------
+def _version_key(tag):
+    return f"{config()['KEY_PREFIX']}:v:{tag}"
+
+
+def _token(bumped_at=0.0):
+    # "<bump time>:<random>": settled() compares the time with a compute's start
+    return f"{bumped_at:.6f}:{uuid.uuid4().hex[:12]}"
+
+
+def _bumped_at(token):
+    try:
+        return float(token.partition(":")[0])
+    except ValueError:
+        return 0.0
+
+
+def versions(tags):
+    """Current version token per tag; unknown tags get a fresh random one."""
+    cache = _cache()
+    keys = {_version_key(t): t for t in tags}
+    found = cache.get_many(list(keys))
+    for key in keys:
+        if key not in found:
+            token = _token()
+            # another process may have set it first; use whatever won
+            cache.add(key, token, None)
+            found[key] = cache.get(key, token)
+    return [found[key] for key in keys]
+
+
+async def aversions(tags):
+    cache = _cache()
+    keys = {_version_key(t): t for t in tags}
+    found = await cache.aget_many(list(keys))
+    for key in keys:
+        if key not in found:
+            token = _token()
+            await cache.aadd(key, token, None)
+            found[key] = await cache.aget(key, token)
+    return [found[key] for key in keys]
+
+
+def _bump(tags):
+    token = _token(time.time())
+    _cache().set_many({_version_key(t): token for t in tags}, None)
+
+
+def current(depends):
+    """Whether the {tag: version} an entry recorded are still the current versions."""
+    return not depends or versions(depends) == list(depends.values())
+
+
+async def acurrent(depends):
+    return not depends or await aversions(depends) == list(depends.values())
+
+
+def settled(depends, since):
+    """False if a tag was bumped after `since`: rows read since then may predate that write."""
+    return all(_bumped_at(version) < since for version in depends.values())
+
+
+def invalidate(*tags):
+    """Bump tag versions now and again on commit (a reader may refill in between)."""
+    tags = [t for t in tags if t]
+    if not tags:
+        return
+    _bump(tags)
+    transaction.on_commit(lambda: _bump(tags))
+
+
+def invalidate_posts(post_ids, membership=False):
+    """
+    Posts whose representation changed. `membership`: posts were created or deleted
+    (or edited, which can move them in searches), so every post list is stale.
+    """
+    invalidate("posts" if membership else None, *(f"post:{pid}" for pid in post_ids))
+
+
+def invalidate_comments(post_id):
+    invalidate("comments", f"comments:post:{post_id}")
+
+
+# -------- lookup --------
+def _key(request, tag_versions):
+    params = sorted(
+        (k, tuple(sorted(v for v in request.query_params.getlist(k) if v)))
+        for k in request.query_params
+    )
+    raw = repr((request.path, [p for p in params if p[1]], viewer_class(request), tag_versions))
+    return f"{config()['KEY_PREFIX']}:r:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+def make_key(request, tags):
+    return _key(request, versions(tags))
+
+
+async def amake_key(request, tags):
+    return _key(request, await aversions(tags))
+
+
+def get_or_compute(key, compute, is_current=None):
+    """
+    Return (value, hit). `compute()` returns a value to store or None (don't store).
+    A stored value `is_current(value)` rejects counts as a miss.
+    Concurrent misses on `key` compute only once.
+    """
+    cfg = config()
+    cache = _cache()
+    is_current = is_current or (lambda value: True)
+    value = cache.get(key)
+    if value is not None and is_current(value):
+        _count("hits")
+        return value, True
+
+    _count("misses")
+    lock_key = f"{key}:lock"
+    if not cache.add(lock_key, 1, cfg["LOCK_TIMEOUT"]):
+        _count("waits")
+        deadline = time.monotonic() + cfg["WAIT"]
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            value = cache.get(key)
+            if value is not None and is_current(value):
+                return value, True
+        # winner is slow or failed: compute without storing twice
+        return compute(), False
+    try:
+        value = compute()
+        if value is not None:
+            cache.set(key, value, cfg["TIMEOUT"])
+            _count("stores")
+        return value, False
+    finally:
+        cache.delete(lock_key)
+
+
+async def aget_or_compute(key, compute, is_current=None):
+    """get_or_compute with async `compute()` / `is_current()`; shares entries and locks with it."""
+    cfg = config()
+    cache = _cache()
+
+    async def usable(value):
+        return value is not None and (is_current is None or await is_current(value))
+
+    value = await cache.aget(key)
+    if await usable(value):
+        _count("hits")
+        return value, True
+
+    _count("misses")
+    lock_key = f"{key}:lock"
+    if not await cache.aadd(lock_key, 1, cfg["LOCK_TIMEOUT"]):
+        _count("waits")
+        deadline = time.monotonic() + cfg["WAIT"]
+        while time.monotonic() < deadline:
+            await asyncio.sleep(POLL_INTERVAL)
+            value = await cache.aget(key)
+            if await usable(value):
+                return value, True
+        return await compute(), False
+    try:
+        value = await compute()
+        if value is not None:
+            await cache.aset(key, value, cfg["TIMEOUT"])
+            _count("stores")
+        return value, False
+    finally:
+        await cache.adelete(lock_key)
+
+
+# -------- view integration --------
+class ResponseCacheMixin:
+    """
+    Serve list/retrieve from the response cache for cacheable viewers.
+    Views declare what a response depends on via get_cache_tags() (part of the key)
+    and get_row_cache_tags() (checked on every hit).
+    """
+    cached_headers = ("ETag", "Last-Modified")
+
+    def get_cache_tags(self):
+        return []
+
+    def get_row_cache_tags(self, rows):
+        """Tags of the rows a response shows (override, e.g. "post:<id>" per row)."""
+        return []
+
+    def conditional_response(self, rows, *args, **kwargs):
+        # ConditionalGetMixin's hook sees the rows behind every list/retrieve response
+        self._cache_rows = rows
+        return super().conditional_response(rows, *args, **kwargs)
+
+    def _row_tags(self, response):
+        if response.status_code != 200:
+            return []
+        return self.get_row_cache_tags(getattr(self, "_cache_rows", ()))
+
+    def _is_cacheable(self, request):
+        cfg = config()
+        return cfg["ENABLED"] and request.method == "GET" and viewer_class(request) in cfg["VIEWER_CLASSES"]
+
+    def _entry(self, response, depends, started):
+        if response.status_code != 200 or not settled(depends, started):
+            return None
+        headers = {h: response[h] for h in self.cached_headers if response.has_header(h)}
+        return {"data": response.data, "headers": headers, "depends": depends}
+
+    def _cached(self, handler, request, *args, **kwargs):
+        if not self._is_cacheable(request):
+            return handler(request, *args, **kwargs)
+
+        fresh = {}
+        started = time.time()
+
+        def compute():
+            # stored entries are shared until the next write: don't fill them from a lagging replica
+            with on_primary():
+                fresh["response"] = handler(request, *args, **kwargs)
+            tags = self._row_tags(fresh["response"])
+            return self._entry(fresh["response"], dict(zip(tags, versions(tags))), started)
+
+        key = make_key(request, self.get_cache_tags())
+        entry, _ = get_or_compute(key, compute, lambda entry: current(entry.get("depends")))
+        return self._respond(request, entry, fresh)
+
+    async def _acached(self, handler, request, *args, **kwargs):
+        if not self._is_cacheable(request):
+            return await handler(request, *args, **kwargs)
+
+        fresh = {}
+        started = time.time()
+
+        async def compute():
+            with on_primary():
+                fresh["response"] = await handler(request, *args, **kwargs)
+            tags = self._row_tags(fresh["response"])
+            return self._entry(fresh["response"], dict(zip(tags, await aversions(tags))), started)
+
+        async def is_current(entry):
+            return await acurrent(entry.get("depends"))
+
+        key = await amake_key(request, self.get_cache_tags())
+        entry, _ = await aget_or_compute(key, compute, is_current)
+        return self._respond(request, entry, fresh)
+
+    def _respond(self, request, entry, fresh):
+        if "response" in fresh:
+            fresh["response"]["X-Cache"] = "MISS"
+            return fresh["response"]
+
+        headers = entry["headers"]
+        conditional = get_conditional_response(
+            request._request,
+            etag=headers.get("ETag"),
+            last_modified=parse_http_date_safe(headers.get("Last-Modified", "")),
+        )
+        if conditional is not None and conditional.status_code == status.HTTP_304_NOT_MODIFIED:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(entry["data"])
+        for name, value in headers.items():
+            response[name] = value
+        patch_vary_headers(response, ("Authorization",))
+        response["X-Cache"] = "HIT"
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(super().retrieve, request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self._acached(super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self._acached(super().aretrieve, request, *args, **kwargs)
@@ -0,0 +1,138 @@
+# posts/search.py
+"""
+Full-text search over Post.content and Comment.content with SQLite FTS5.
+
+The FTS tables are external-content indexes (no second copy of the text) kept in
+sync by triggers on the base tables, so every write path -- serializers, admin,
+bulk updates, cascades -- updates the index. `install()` is idempotent and also
+runs after every migrate, because SQLite drops a table's triggers whenever a
+migration rebuilds that table.
+
+Query syntax accepted in ?q=:
+- words            -> all must match (any order)
+- word*            -> prefix match
+- "a phrase"       -> exact phrase
+Results are ranked by bm25 relevance plus a recency boost of SEARCH_RECENCY_WEIGHT
+per day (relative to a fixed epoch, so scores are stable across pages).
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db import models
+from django.db.models import ExpressionWrapper, F, FloatField, Func, Value
+from django.db.models.expressions import RawSQL
+
+# FTS table name -> (base table, indexed column)
+INDEXES = {
+    "posts_post_fts": ("posts_post", "content"),
+    "posts_comment_fts": ("posts_comment", "content"),
+}
+CURSOR_ORDERING = ("search_score", "id")
+UNIX_EPOCH_JULIAN = 2440587.5
+
+
+class FTSField(models.TextField):
+    """A column of an FTS5 table; supports the `__match` lookup."""
+
+
+@FTSField.register_lookup
+class Match(models.Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
+_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _install_sql(fts, table, column):
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column}); "
+        f"INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column}); END",
+    ]
+
+
+def is_available(conn=None):
+    return (conn or connection).vendor == "sqlite"
+
+
+def install(conn=None):
+    """Create the FTS tables and sync triggers if missing (no-op off SQLite)."""
+    conn = conn or connection
+    if not is_available(conn):
+        return False
+    with conn.cursor() as cursor:
+        for fts, (table, column) in INDEXES.items():
+            for sql in _install_sql(fts, table, column):
+                cursor.execute(sql)
+    return True
+
+
+def rebuild(conn=None):
+    """Re-index every row from the base tables."""
+    conn = conn or connection
+    if not install(conn):
+        return False
+    with conn.cursor() as cursor:
+        for fts in INDEXES:
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('optimize')")
+    return True
+
+
+def to_match_expression(q):
+    """
+    Turn user input into a safe FTS5 MATCH expression: every token is quoted so
+    FTS operators in user text can't cause syntax errors; `*` and "..." are kept.
+    """
+    terms = []
+    for phrase, word in _TOKEN.findall(q or ""):
+        if phrase:
+            words = _WORD.findall(phrase)
+            if words:
+                terms.append('"%s"' % " ".join(words))
+            continue
+        words = _WORD.findall(word)
+        terms.extend(f'"{w}"' for w in words)
+        if words and word.endswith("*"):
+            terms[-1] += "*"
+    return " ".join(terms)
+
+
+def apply(queryset, q):
+    """
+    Filter `queryset` (Post or Comment) to rows matching `q`, annotated with
+    `search_score` (higher is better) and ordered by it.
+    Falls back to icontains where FTS5 isn't available.
+    """
+    if not is_available():
+        return queryset.filter(content__icontains=q)
+    expression = to_match_expression(q)
+    if not expression:
+        # still annotated: the caller already pages on CURSOR_ORDERING
+        return queryset.none().annotate(search_score=Value(0.0, output_field=FloatField()))
+    fts = queryset.model._meta.db_table + "_fts"
+    weight = getattr(settings, "SEARCH_RECENCY_WEIGHT", 0.05)
+    days = Func(F("created_at"), function="julianday", output_field=FloatField()) - Value(UNIX_EPOCH_JULIAN)
+    score = ExpressionWrapper(
+        RawSQL(f"-bm25({fts})", (), output_field=FloatField()) + Value(weight) * days,
+        output_field=FloatField(),
+    )
+    return (
+        queryset.filter(search__content__match=expression)
+        .annotate(search_score=score)
+        .order_by("-search_score", "-id")
+    )
@@ -0,0 +1,107 @@
+# posts/seeding.py
+"""
+Synthetic social graph for benchmarks: users, power-law follows, posts, likes,
+comments and bookmarks. Popularity follows a Zipf-like distribution, so a few
+accounts get most followers and engagement (which is what stresses the feed).
+Rows are bulk-inserted; counters and timelines are rebuilt at the end.
+"""
+import random
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from users import counters as users_counters
+from users.models import Profile
+
+from . import counters, ranking, tags, timeline
+from .models import Post, Follow, Like, Comment, Bookmark
+
+USERNAME_PREFIX = "seed_user_"
+BATCH_SIZE = 2000
+TOPICS = 50  # distinct #topicN hashtags, Zipf-distributed like everything else
+
+
+def _pareto_count(rng, mean, upper):
+    # paretovariate(2) has mean 2 -> scale to the requested mean, heavy-tailed
+    return max(1, min(upper, int(rng.paretovariate(2.0) * mean / 2)))
+
+
+def clear():
+    """Delete previously seeded users (everything else cascades)."""
+    return User.objects.filter(username__startswith=USERNAME_PREFIX).delete()[0]
+
+
+def seed(users=1000, posts_per_user=5, follows_per_user=20, likes_per_post=5,
+         comments_per_post=1, bookmarks_per_post=1, alpha=1.2, random_seed=42, log=None):
+    rng = random.Random(random_seed)
+    log = log or (lambda msg: None)
+
+    with transaction.atomic():
+        start = User.objects.filter(username__startswith=USERNAME_PREFIX).count()
+        User.objects.bulk_create(
+            [User(username=f"{USERNAME_PREFIX}{start + i}") for i in range(users)], batch_size=BATCH_SIZE
+        )
+        user_ids = list(
+            User.objects.filter(username__startswith=USERNAME_PREFIX).order_by("id").values_list("id", flat=True)
+        )[start:]
+        log(f"{len(user_ids)} users")
+
+        # popularity rank -> Zipf weight
+        ranked = user_ids[:]
+        rng.shuffle(ranked)
+        weight = {uid: 1.0 / (rank + 1) ** alpha for rank, uid in enumerate(ranked)}
+        weights = [weight[uid] for uid in user_ids]
+
+        follows = set()
+        for uid in user_ids:
+            k = _pareto_count(rng, follows_per_user, len(user_ids) - 1)
+            for target in rng.choices(user_ids, weights=weights, k=k):
+                if target != uid:
+                    follows.add((uid, target))
+        Follow.objects.bulk_create(
+            [Follow(follower_id=a, following_id=b) for a, b in follows], batch_size=BATCH_SIZE, ignore_conflicts=True
+        )
+        log(f"{len(follows)} follows")
+        users_counters.create_missing(Profile, User.objects.filter(pk__in=user_ids))
+        users_counters.rebuild(Profile, Follow, queryset=Profile.objects.filter(user_id__in=user_ids))
+
+        posts = []
+        topic_weights = [1 / (k + 1) for k in range(TOPICS)]
+        for uid in user_ids:
+            for n in range(_pareto_count(rng, posts_per_user, posts_per_user * 20)):
+                topic = rng.choices(range(TOPICS), weights=topic_weights)[0]
+                posts.append(Post(author_id=uid, content=f"seed post {n} by {uid} #bench #topic{topic}"))
+        Post.objects.bulk_create(posts, batch_size=BATCH_SIZE)
+        seeded = Post.objects.filter(author_id__gte=user_ids[0], author__username__startswith=USERNAME_PREFIX)
+        post_rows = list(seeded.values_list("id", "author_id"))
+        post_ids = [pid for pid, _ in post_rows]
+        post_weights = [weight[author] for _, author in post_rows]
+        log(f"{len(post_ids)} posts")
+
+        def pairs(per_post):
+            total = int(len(post_ids) * per_post)
+            chosen = rng.choices(post_ids, weights=post_weights, k=total)
+            return {(rng.choice(user_ids), pid) for pid in chosen}
+
+        for model, per_post in ((Like, likes_per_post), (Bookmark, bookmarks_per_post)):
+            rows = pairs(per_post)
+            model.objects.bulk_create(
+                [model(user_id=u, post_id=p) for u, p in rows], batch_size=BATCH_SIZE, ignore_conflicts=True
+            )
+            log(f"{len(rows)} {model._meta.verbose_name_plural}")
+
+        comments = [
+            Comment(user_id=rng.choice(user_ids), post_id=pid, content="seed comment")
+            for pid in rng.choices(post_ids, weights=post_weights, k=int(len(post_ids) * comments_per_post))
+        ]
+        Comment.objects.bulk_create(comments, batch_size=BATCH_SIZE)
+        log(f"{len(comments)} comments")
+
+        counters.rebuild(Post, {"Like": Like, "Comment": Comment, "Bookmark": Bookmark},
+                         queryset=seeded)
+        tags.reindex(queryset=seeded)
+    for _ in timeline.backfill(user_ids):
+        pass
+    ranking.recompute()
+    log("counters, hashtags, timelines and feed ranking rebuilt")
+    return user_ids
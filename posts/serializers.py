@@ -1,13 +1,52 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
-from .models import Post, Follow, Like, Comment, Bookmark  # ⬅️ added Bookmark
+from .models import Post, Follow, Like, Comment, Bookmark, Tag, MediaAsset  # ⬅️ added Bookmark
+from . import likebuffer, media
+from .instrumentation import TimedListSerializer, TimedSerializerMixin
+from .previews import QUERY_PARAM as COMMENTS_PREVIEW, CommentPreviews
+from .sparse import SparseFieldsSerializerMixin
+from .viewer import ViewerState
 
-class PostSerializer(serializers.ModelSerializer):
+
+class PostListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """
+    Resolves per-viewer flags for the whole page before serializing each post,
+    so the child serializer only does set lookups.
+    """
+
+    def to_representation(self, data):
+        posts = list(data.all() if hasattr(data, "all") else data)
+        request = self.context.get("request")
+        user = getattr(request, "user", None)
+        state = self.context.get("viewer_state")
+        # async views resolve the state up front (ViewerState.afor_posts)
+        if state is None or not all(state.covers(post) for post in posts):
+            self.context["viewer_state"] = ViewerState.for_posts(user, posts, flags=self.child.fields)
+        n = self.context.get(COMMENTS_PREVIEW)
+        previews = self.context.get("comment_previews")
+        if n and (previews is None or not all(previews.covers(post) for post in posts)):
+            self.context["comment_previews"] = CommentPreviews.for_posts(posts, n)
+        return [self.child.to_representation(post) for post in posts]
+
+
+class PostSerializer(SparseFieldsSerializerMixin, TimedSerializerMixin, serializers.ModelSerializer):
     author_username = serializers.ReadOnlyField(source="author.username")
-    likes_count = serializers.IntegerField(source="likes.count", read_only=True)
-    comments_count = serializers.IntegerField(source="comments.count", read_only=True)
-    # NEW 👇
-    bookmarks_count = serializers.IntegerField(source="bookmarks.count", read_only=True)
+    # likes_count / comments_count / bookmarks_count are stored columns on Post
     is_bookmarked = serializers.SerializerMethodField()
+    is_liked = serializers.SerializerMethodField()
+    is_following_author = serializers.SerializerMethodField()
+    # resized variants of the uploaded image media_url points at (posts/media.py)
+    media = serializers.SerializerMethodField()
+
+    # what each non-column field needs loaded (see posts/sparse.py)
+    sparse_sources = {
+        "author_username": (["author__username"], ["author"]),
+        "is_bookmarked": ([], []),
+        "is_liked": ([], []),
+        "is_following_author": (["author_id"], []),
+        "media": (["media", "media__status", "media__width", "media__height", "media__original", "media__variants"],
+                  ["media"]),
+    }
 
     class Meta:
         model = Post
@@ -17,12 +56,15 @@ class PostSerializer(serializers.ModelSerializer):
             "author_username",
             "content",
             "media_url",
+            "media",
             "created_at",
             "updated_at",
             "likes_count",
             "comments_count",
             "bookmarks_count",  # NEW
             "is_bookmarked",    # NEW
+            "is_liked",
+            "is_following_author",
         ]
         read_only_fields = [
             "author",
@@ -33,13 +75,50 @@ class PostSerializer(serializers.ModelSerializer):
             "comments_count",
             "bookmarks_count",
             "is_bookmarked",
+            "is_liked",
+            "is_following_author",
+            "media",
         ]
+        list_serializer_class = PostListSerializer
+
+    def _viewer_state(self, obj):
+        # Lists get a page-wide state from PostListSerializer; a single post
+        # (retrieve/create/update) resolves its own.
+        state = self.context.get("viewer_state")
+        if state is None or not state.covers(obj):
+            request = self.context.get("request")
+            state = ViewerState.for_posts(getattr(request, "user", None), [obj], flags=self.fields)
+            self.context["viewer_state"] = state
+        return state
+
+    def _comment_previews(self, obj):
+        previews = self.context.get("comment_previews")
+        if previews is None or not previews.covers(obj):
+            previews = CommentPreviews.for_posts([obj], self.context[COMMENTS_PREVIEW])
+            self.context["comment_previews"] = previews
+        return previews
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        buffer = likebuffer.get_buffer()
+        if buffer is not None and "likes_count" in data:
+            data["likes_count"] += buffer.post_delta(instance.pk)
+        if self.context.get(COMMENTS_PREVIEW):
+            rows = self._comment_previews(instance).get(instance)
+            data["comments_preview"] = CommentPreviewSerializer(rows, many=True).data
+        return data
 
     def get_is_bookmarked(self, obj):
-        request = self.context.get("request")
-        if not request or not request.user.is_authenticated:
-            return False
-        return obj.bookmarks.filter(user=request.user).exists()
+        return obj.pk in self._viewer_state(obj).bookmarked
+
+    def get_is_liked(self, obj):
+        return obj.pk in self._viewer_state(obj).liked
+
+    def get_is_following_author(self, obj):
+        return obj.author_id in self._viewer_state(obj).following
+
+    def get_media(self, obj):
+        return media.variant_urls(obj.media)
 
     def validate_content(self, value):
         if not value or not value.strip():
@@ -47,12 +126,13 @@ class PostSerializer(serializers.ModelSerializer):
         return value
 
 
-class FollowSerializer(serializers.ModelSerializer):
+class FollowSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     follower_username = serializers.ReadOnlyField(source="follower.username")
     following_username = serializers.ReadOnlyField(source="following.username")
 
     class Meta:
         model = Follow
+        list_serializer_class = TimedListSerializer
         fields = [
             "id",
             "follower",
@@ -64,20 +144,26 @@ class FollowSerializer(serializers.ModelSerializer):
         read_only_fields = ["follower", "created_at"]
 
 
-class LikeSerializer(serializers.ModelSerializer):
+class LikeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user_username = serializers.ReadOnlyField(source="user.username")
 
     class Meta:
         model = Like
+        list_serializer_class = TimedListSerializer
         fields = ["id", "user", "user_username", "post", "created_at"]
         read_only_fields = ["user", "created_at"]
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsSerializerMixin, TimedSerializerMixin, serializers.ModelSerializer):
     user_username = serializers.ReadOnlyField(source="user.username")
 
+    sparse_sources = {
+        "user_username": (["user__username"], ["user"]),
+    }
+
     class Meta:
         model = Comment
+        list_serializer_class = TimedListSerializer
         fields = [
             "id",
             "user",
@@ -93,3 +179,55 @@ class CommentSerializer(serializers.ModelSerializer):
         if not value or not value.strip():
             raise serializers.ValidationError("Comment content cannot be empty.")
         return value
+
+
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Tag
+        list_serializer_class = TimedListSerializer
+        fields = ["name", "posts_count", "created_at"]
+        read_only_fields = fields
+
+
+class MediaAssetSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """An upload: `url` is what to put in media_url / avatar_url, `variants` its renders."""
+    url = serializers.SerializerMethodField()
+    variants = serializers.SerializerMethodField()
+
+    class Meta:
+        model = MediaAsset
+        fields = ["id", "sha256", "url", "content_type", "width", "height", "size",
+                  "status", "variants", "created_at", "processed_at"]
+        read_only_fields = fields
+
+    def _absolute(self, url):
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def get_url(self, obj):
+        return self._absolute(default_storage.url(obj.original))
+
+    def get_variants(self, obj):
+        return {
+            name: {"url": self._absolute(default_storage.url(v["path"])), "width": v["width"], "height": v["height"]}
+            for name, v in obj.variants.items()
+        }
+
+
+class CommentPreviewSerializer(serializers.Serializer):
+    """A comment embedded in its post (?comments_preview=N): values() rows, no post join."""
+    id = serializers.IntegerField()
+    user = serializers.IntegerField(source="user_id")
+    user_username = serializers.CharField(source="username")
+    content = serializers.CharField()
+    created_at = serializers.DateTimeField()
+    updated_at = serializers.DateTimeField()
+
+
+class EngagementOperationSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=["like", "unlike", "bookmark", "unbookmark"])
+    post_id = serializers.IntegerField(min_value=1)
+
+
+class EngagementBatchSerializer(serializers.Serializer):
+    operations = EngagementOperationSerializer(many=True, allow_empty=False, max_length=500)
@@ -0,0 +1,211 @@
+# posts/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import media, ranking, responsecache, search, tags, timeline, trending
+from .counters import bump
+from .followgraph import get_graph
+from .models import Post, Follow, Like, Comment, Bookmark, HighFanoutAuthor
+
+
+# -------- Engagement counters --------
+# post_delete also fires for cascaded rows (deleting a user removes their likes,
+# comments and bookmarks one signal at a time), so counters stay correct there too.
+# When the Post itself is being deleted the UPDATE simply matches nothing.
+
+@receiver(post_save, sender=Like)
+def like_created(sender, instance, created, **kwargs):
+    if created:
+        bump(Post, instance.post_id, "likes_count", 1)
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, **kwargs):
+    bump(Post, instance.post_id, "likes_count", -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        bump(Post, instance.post_id, "comments_count", 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    bump(Post, instance.post_id, "comments_count", -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_edited(sender, instance, created, **kwargs):
+    # no counter moves, but ?comments_preview= representations of the post change:
+    # move activity_at so ETag / Last-Modified do too
+    if not created:
+        Post.objects.filter(pk=instance.post_id).update(activity_at=instance.updated_at)
+
+
+@receiver(post_save, sender=Bookmark)
+def bookmark_created(sender, instance, created, **kwargs):
+    if created:
+        bump(Post, instance.post_id, "bookmarks_count", 1)
+
+
+@receiver(post_delete, sender=Bookmark)
+def bookmark_deleted(sender, instance, **kwargs):
+    bump(Post, instance.post_id, "bookmarks_count", -1)
+
+
+# -------- Feed ranking --------
+# Each event adds its decayed weight to the post's score and timeline entries;
+# a delete subtracts the same term (same created_at), see posts/ranking.py.
+
+@receiver(pre_save, sender=Post)
+def post_base_score(sender, instance, **kwargs):
+    # before the fan-out below copies the score into timeline entries
+    if instance._state.adding and not instance.rank_score:
+        instance.rank_score = ranking.base_score(instance.created_at)
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Bookmark)
+def engagement_created_rank(sender, instance, created, **kwargs):
+    if created:
+        ranking.record(sender._meta.model_name, [instance.post_id], instance.created_at)
+
+
+@receiver(post_delete, sender=Like)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=Bookmark)
+def engagement_deleted_rank(sender, instance, **kwargs):
+    ranking.record(sender._meta.model_name, [instance.post_id], instance.created_at, sign=-1)
+
+
+# -------- Trending (posts/trending.py) --------
+
+@receiver(post_save, sender=Post)
+def post_saved_trending(sender, instance, created, **kwargs):
+    engine = trending.get_engine()
+    if engine is None:
+        return
+    engine.note_post(instance.pk, instance.content)  # hashtags may have changed
+    if created:
+        engine.record("post", [instance.pk], when=instance.created_at)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted_trending(sender, instance, **kwargs):
+    engine = trending.get_engine()
+    if engine is not None:
+        engine.forget_post(instance.pk)
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=Bookmark)
+def engagement_created_trending(sender, instance, created, **kwargs):
+    if created:
+        trending.record(sender._meta.model_name, [instance.post_id], when=instance.created_at)
+
+
+# -------- Hashtag index (posts/tags.py) --------
+
+@receiver(post_save, sender=Post)
+def post_saved_tags(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or "content" in update_fields:
+        tags.index_post(instance, created)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting_tags(sender, instance, **kwargs):
+    # while the PostTag rows still exist; they cascade with the post
+    tags.unindex_post(instance.pk)
+
+
+# -------- Media (posts/media.py) --------
+
+@receiver(pre_save, sender=Post)
+def post_link_media(sender, instance, update_fields=None, **kwargs):
+    # media is only written by full saves; update_fields callers don't touch media_url
+    if update_fields is None:
+        instance.media_id = media.asset_for_url(instance.media_url)
+
+
+# -------- Home timelines (fan-out on write) --------
+# Post deletes need no handler: TimelineEntry rows cascade with the post.
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        timeline.on_follow(instance.follower_id, instance.following_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    timeline.on_unfollow(instance.follower_id, instance.following_id)
+
+
+# -------- Follow-graph cache --------
+# Drop the cached sets now and again on commit, so a concurrent reader that
+# refilled them from pre-commit data doesn't keep a stale copy.
+
+def _invalidate_follow(follower_id, following_id):
+    graph = get_graph()
+    graph.invalidate(follower_id=follower_id, following_id=following_id)
+    transaction.on_commit(lambda: graph.invalidate(follower_id=follower_id, following_id=following_id))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved_invalidate(sender, instance, **kwargs):
+    _invalidate_follow(instance.follower_id, instance.following_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted_invalidate(sender, instance, **kwargs):
+    _invalidate_follow(instance.follower_id, instance.following_id)
+
+
+@receiver(post_save, sender=HighFanoutAuthor)
+@receiver(post_delete, sender=HighFanoutAuthor)
+def high_fanout_changed(sender, **kwargs):
+    get_graph().invalidate(high_fanout=True)
+
+
+# -------- Response cache --------
+# Counter bumps in posts/engagement.py and posts/likebuffer.py bypass these
+# signals and invalidate explicitly.
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed_invalidate(sender, instance, **kwargs):
+    responsecache.invalidate_posts([instance.pk], membership=True)
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+@receiver(post_save, sender=Bookmark)
+@receiver(post_delete, sender=Bookmark)
+def engagement_changed_invalidate(sender, instance, **kwargs):
+    responsecache.invalidate_posts([instance.post_id])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed_invalidate(sender, instance, **kwargs):
+    responsecache.invalidate_posts([instance.post_id])
+    responsecache.invalidate_comments(instance.post_id)
+
+
+# -------- Full-text search --------
+# SQLite drops a table's triggers when a migration rebuilds it; put them back.
+
+def ensure_search_index(sender, using, **kwargs):
+    from django.db import connections
+
+    search.install(connections[using])
@@ -0,0 +1,85 @@
+# posts/sparse.py
+"""
+Sparse fieldsets: ?fields=a,b,c keeps only those fields, ?exclude=a,b drops them.
+
+The serializer drops the fields (so their methods / per-viewer lookups never run)
+and the view narrows the queryset to the columns and joins the remaining fields
+need (`.only()` + `select_related()`).
+"""
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _names(raw):
+    return [name.strip() for name in (raw or "").split(",") if name.strip()]
+
+
+def requested_fields(request, available):
+    """
+    Field names to keep, in serializer order, or None when the request asks for all.
+    Unknown names are a 400.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    only = _names(request.query_params.get("fields"))
+    exclude = _names(request.query_params.get("exclude"))
+    if not only and not exclude:
+        return None
+    unknown = sorted(set(only + exclude) - set(available))
+    if unknown:
+        raise ValidationError({"fields": f"Unknown field(s): {', '.join(unknown)}. "
+                                         f"Available: {', '.join(available)}."})
+    keep = [name for name in available if (not only or name in only) and name not in exclude]
+    return keep
+
+
+def plan(model, fields, sources, always=()):
+    """
+    Columns and joins needed to serialize `fields`.
+    `sources` maps a serializer field to (columns, select_related); fields not in
+    it are assumed to be model fields of the same name.
+    """
+    columns, related = set(), set()
+    for name in list(fields) + list(always):
+        cols, rel = sources.get(name, ([name], []))
+        columns.update(cols)
+        related.update(rel)
+    model_fields = {f.attname: f.name for f in model._meta.concrete_fields}
+    # accept attnames (author_id) as well as field names
+    columns = {model_fields.get(c, c) for c in columns}
+    return sorted(columns), sorted(related)
+
+
+class SparseFieldsSerializerMixin:
+    """Drop fields not requested via ?fields= / ?exclude=."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        keep = requested_fields(self.context.get("request"), list(self.fields))
+        if keep is not None:
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
+
+
+class SparseFieldsViewMixin:
+    """
+    Narrow list/retrieve querysets to what the requested fields need.
+    Serializers declare `sparse_sources`; views list extra columns they always
+    read in `sparse_always` (cursor position, ETag inputs, ...).
+    """
+    sparse_always = ("id", "created_at")
+
+    def sparse_queryset(self, qs):
+        serializer_class = self.get_serializer_class()
+        available = list(serializer_class(context={}).fields)
+        fields = requested_fields(self.request, available)
+        if fields is None:
+            return qs
+        always = (set(self.sparse_always) | set(getattr(self, "etag_fields", ()))
+                  | set(getattr(self, "last_modified_fields", ())))
+        columns, related = plan(qs.model, fields, getattr(serializer_class, "sparse_sources", {}), always)
+        qs = qs.select_related(None)
+        if related:  # a bare select_related() would follow every FK
+            qs = qs.select_related(*related)
+        return qs.only(*columns)
@@ -0,0 +1,147 @@
+# posts/tags.py
+"""
+Hashtag index: the #words in Post.content, stored as Tag rows plus one PostTag
+row per (post, tag), read through the (tag, -created_at, -post) index.
+
+- `index_post()` runs on every post save. It diffs the post's indexed tags against
+  its content and writes only the difference; Tag.posts_count moves with one
+  UPDATE ... SET posts_count = posts_count +/- 1 per batch of changed tags.
+- `unindex_post()` runs before a post is deleted and decrements its tags' counts
+  (the PostTag rows cascade with the post).
+- `reindex()` (manage.py reindex_tags) rebuilds the index as a pipeline of
+  generators -- post batches in primary-key order -> parsed hashtags -> bulk
+  writes -- so only one batch is in memory, then recounts every tag in one UPDATE.
+"""
+import re
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+HASHTAG = re.compile(r"#(\w{1,32})")
+BATCH_SIZE = 2000
+
+# cursor ordering for a tag's posts (annotated by posts_for)
+TAG_ORDERING = ("tagged_at", "tagged_id")
+
+
+def hashtags(text):
+    """Distinct lowercased #tags in `text`, in order of appearance."""
+    return tuple(dict.fromkeys(tag.lower() for tag in HASHTAG.findall(text or "")))
+
+
+def _models(apps=None):
+    apps = apps or global_apps
+    return apps.get_model("posts", "Tag"), apps.get_model("posts", "PostTag")
+
+
+def tag_ids(names, tag_model=None, known=None):
+    """{name: Tag id} for `names`, creating the missing tags. `known` is a cache to reuse."""
+    Tag = tag_model or _models()[0]
+    known = {} if known is None else known
+    missing = [name for name in names if name not in known]
+    if missing:
+        Tag.objects.bulk_create([Tag(name=name) for name in missing], ignore_conflicts=True)
+        known.update(Tag.objects.filter(name__in=missing).values_list("name", "pk"))
+    return {name: known[name] for name in names}
+
+
+def _bump(Tag, ids, delta):
+    qs = Tag.objects.filter(pk__in=ids)
+    if delta < 0:
+        qs = qs.filter(posts_count__gte=-delta)
+    qs.update(posts_count=F("posts_count") + delta)
+
+
+# -------- incremental --------
+def index_post(post, created=False):
+    """Bring `post`'s PostTag rows and its tags' counts in line with its content."""
+    Tag, PostTag = _models()
+    names = set(hashtags(post.content))
+    current = {} if created else dict(PostTag.objects.filter(post=post).values_list("tag__name", "tag_id"))
+    added = names - current.keys()
+    removed = [current[name] for name in current.keys() - names]
+    if not added and not removed:
+        return
+    with transaction.atomic():
+        if removed:
+            PostTag.objects.filter(post=post, tag_id__in=removed).delete()
+            _bump(Tag, removed, -1)
+        if added:
+            ids = list(tag_ids(added, Tag).values())
+            PostTag.objects.bulk_create(
+                [PostTag(post_id=post.pk, tag_id=tag_id, created_at=post.created_at) for tag_id in ids]
+            )
+            _bump(Tag, ids, 1)
+
+
+def unindex_post(post_id):
+    Tag, _ = _models()
+    Tag.objects.filter(post_tags__post_id=post_id, posts_count__gt=0).update(posts_count=F("posts_count") - 1)
+
+
+def posts_for(tag):
+    """`tag`'s posts, annotated with the PostTag columns to page by (TAG_ORDERING)."""
+    from .models import Post
+
+    return Post.objects.filter(post_tags__tag=tag).annotate(
+        tagged_at=F("post_tags__created_at"), tagged_id=F("post_tags__post_id")
+    )
+
+
+# -------- batch --------
+def post_batches(queryset, batch_size=BATCH_SIZE):
+    """Stage 1: [(id, content, created_at)] in primary-key order, `batch_size` rows at a time."""
+    last_id = 0
+    while True:
+        rows = list(
+            queryset.filter(pk__gt=last_id).order_by("pk").values_list("pk", "content", "created_at")[:batch_size]
+        )
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+
+
+def parsed(batches):
+    """Stage 2: [(id, created_at, hashtags)] per batch."""
+    for rows in batches:
+        yield [(pk, created_at, hashtags(content)) for pk, content, created_at in rows]
+
+
+def written(batches, apps=None):
+    """Stage 3: replace each batch's PostTag rows; yields the number of posts written."""
+    Tag, PostTag = _models(apps)
+    known = {}
+    for rows in batches:
+        ids = tag_ids({name for _, _, names in rows for name in names}, Tag, known)
+        with transaction.atomic():
+            PostTag.objects.filter(post_id__in=[pk for pk, _, _ in rows]).delete()
+            PostTag.objects.bulk_create(
+                [PostTag(post_id=pk, tag_id=ids[name], created_at=created_at)
+                 for pk, created_at, names in rows for name in names],
+                batch_size=1000,
+            )
+        yield len(rows)
+
+
+def recount(apps=None):
+    """Recompute every Tag.posts_count from PostTag in a single UPDATE."""
+    Tag, PostTag = _models(apps)
+    return Tag.objects.update(posts_count=Coalesce(
+        Subquery(
+            PostTag.objects.filter(tag=OuterRef("pk")).order_by().values("tag").annotate(n=Count("pk")).values("n"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    ))
+
+
+def reindex(apps=None, queryset=None, batch_size=None):
+    """Rebuild the index for `queryset` (default: every post). Returns the number of posts read."""
+    if queryset is None:
+        queryset = (apps or global_apps).get_model("posts", "Post").objects.all()
+    done = sum(written(parsed(post_batches(queryset, batch_size or BATCH_SIZE)), apps))
+    recount(apps)
+    return done
@@ -1,3 +1,1507 @@
-from django.test import TestCase
+import base64
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from io import BytesIO, StringIO
+from types import ModuleType
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, resolve
+from rest_framework.routers import DefaultRouter
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from unittest import mock, skipUnless
+
+from . import (
+    benchmarks, dbrouting, export, imaging, instrumentation, likebuffer, media, ranking, ratelimit, responsecache,
+    tags, timeline, trending,
+)
+from .followgraph import FollowGraph, IdSet, get_graph
+from .models import (
+    Post, Follow, Like, Comment, Bookmark, TimelineEntry, AuthorAffinity, Tag, PostTag, MediaAsset,
+)
+from .views import CommentViewSet, FeedViewSet, PostViewSet
+
+
+class BaseTestCase(TestCase):
+    def setUp(self):
+        # process-level caches outlive the per-test transaction rollback
+        get_graph().clear()
+        cache.clear()
+        trending.reset()
+        ratelimit.reset()
+
+
+class PostCounterTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice", password="pass12345")
+        self.bob = User.objects.create_user("bob", password="pass12345")
+        self.post = Post.objects.create(author=self.alice, content="hello")
+
+    def counts(self):
+        self.post.refresh_from_db()
+        return self.post.likes_count, self.post.comments_count, self.post.bookmarks_count
+
+    def test_counters_follow_create_and_delete(self):
+        like = Like.objects.create(user=self.bob, post=self.post)
+        Comment.objects.create(user=self.bob, post=self.post, content="hi")
+        Bookmark.objects.create(user=self.bob, post=self.post)
+        self.assertEqual(self.counts(), (1, 1, 1))
+
+        like.delete()
+        Bookmark.objects.filter(user=self.bob).delete()
+        self.assertEqual(self.counts(), (0, 1, 0))
+
+    def test_cascade_from_user_delete(self):
+        Like.objects.create(user=self.bob, post=self.post)
+        Comment.objects.create(user=self.bob, post=self.post, content="hi")
+        Bookmark.objects.create(user=self.bob, post=self.post)
+        self.bob.delete()
+        self.assertEqual(self.counts(), (0, 0, 0))
+
+    def test_rebuild_command(self):
+        Like.objects.create(user=self.bob, post=self.post)
+        Comment.objects.create(user=self.bob, post=self.post, content="hi")
+        Post.objects.update(likes_count=7, comments_count=0, bookmarks_count=3)
+        call_command("rebuild_post_counters", stdout=StringIO())
+        self.assertEqual(self.counts(), (1, 1, 0))
+
+    def test_list_does_not_count_per_post(self):
+        for i in range(5):
+            p = Post.objects.create(author=self.alice, content=f"post {i}")
+            Like.objects.create(user=self.bob, post=p)
+        client = APIClient()
+        # keyset pagination: just the page itself
+        with self.assertNumQueries(1):
+            res = client.get("/api/posts/")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["results"][0]["likes_count"], 1)
+
+
+class ViewerStateTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+
+    def test_flags_cost_constant_queries(self):
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        posts = [Post.objects.create(author=self.alice, content=f"post {i}") for i in range(6)]
+        Like.objects.create(user=self.bob, post=posts[0])
+        Bookmark.objects.create(user=self.bob, post=posts[1])
+        # page + likes + bookmarks + follows
+        with self.assertNumQueries(4):
+            res = self.client.get("/api/posts/")
+        by_id = {row["id"]: row for row in res.data["results"]}
+        self.assertTrue(by_id[posts[0].id]["is_liked"])
+        self.assertFalse(by_id[posts[0].id]["is_bookmarked"])
+        self.assertTrue(by_id[posts[1].id]["is_bookmarked"])
+        self.assertTrue(all(row["is_following_author"] for row in by_id.values()))
+
+    def test_detail_resolves_its_own_state(self):
+        post = Post.objects.create(author=self.alice, content="solo")
+        Like.objects.create(user=self.bob, post=post)
+        res = self.client.get(f"/api/posts/{post.id}/")
+        self.assertTrue(res.data["is_liked"])
+        self.assertFalse(res.data["is_following_author"])
+
+
+class TimelineTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+        self.carol = User.objects.create_user("carol")
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+
+    def feed_ids(self):
+        return [row["id"] for row in self.client.get("/api/feed/").data["results"]]
+
+    def test_fan_out_and_unfollow(self):
+        follow = Follow.objects.create(follower=self.bob, following=self.alice)
+        mine = Post.objects.create(author=self.bob, content="mine")
+        theirs = Post.objects.create(author=self.alice, content="theirs")
+        Post.objects.create(author=self.carol, content="not followed")
+        self.assertEqual(self.feed_ids(), [theirs.id, mine.id])
+
+        follow.delete()
+        self.assertEqual(self.feed_ids(), [mine.id])
+
+    def test_follow_backfills_recent_posts(self):
+        old = Post.objects.create(author=self.alice, content="old")
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        self.assertEqual(self.feed_ids(), [old.id])
+
+    def test_high_fanout_author_merged_at_read_time(self):
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        Follow.objects.create(follower=self.carol, following=self.alice)
+        with self.settings(FEED_FANOUT_MAX_FOLLOWERS=1):
+            post = Post.objects.create(author=self.alice, content="viral")
+        self.assertFalse(TimelineEntry.objects.filter(user=self.bob, post=post).exists())
+        self.assertEqual(self.feed_ids(), [post.id])
+
+    def test_backfill_command(self):
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        post = Post.objects.create(author=self.alice, content="hi")
+        TimelineEntry.objects.all().delete()
+        call_command("backfill_timelines", stdout=StringIO())
+        self.assertEqual(self.feed_ids(), [post.id])
+
+    def test_backfill_one_user_walks_their_follow_set(self):
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        post = Post.objects.create(author=self.alice, content="hi")
+        Post.objects.create(author=self.carol, content="not followed")
+        TimelineEntry.objects.all().delete()
+        out = StringIO()
+        call_command("backfill_timelines", "--user", str(self.bob.id), stdout=out)
+        self.assertIn("from 2 author(s)", out.getvalue())  # bob and alice, not carol
+        self.assertEqual(self.feed_ids(), [post.id])
+        self.assertEqual(list(TimelineEntry.objects.values_list("user_id", flat=True).distinct()), [self.bob.id])
+
+    def test_feed_reads_in_timeline_index_order(self):
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        posts = [Post.objects.create(author=self.alice, content=f"p{i}") for i in range(3)]
+        qs = timeline.feed_queryset(self.bob).select_related("author", "media").order_by("-entry_at", "-entry_id")
+        plan = qs.explain()
+        self.assertIn("posts_timel_user_id", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+        self.assertEqual(list(qs), posts[::-1])
+
+        url, seen = "/api/feed/?page_size=2", []
+        while url:
+            data = self.client.get(url).data
+            seen += [row["id"] for row in data["results"]]
+            url = data["next"]
+        self.assertEqual(seen, [post.id for post in reversed(posts)])
+
+
+class FeedRankingTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+        self.carol = User.objects.create_user("carol")
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        Follow.objects.create(follower=self.bob, following=self.carol)
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+
+    def feed_ids(self, rank="top", **params):
+        res = self.client.get("/api/feed/", {"rank": rank, **params})
+        self.assertEqual(res.status_code, 200)
+        return [row["id"] for row in res.data["results"]]
+
+    def test_engagement_lifts_post_until_undone(self):
+        old = Post.objects.create(author=self.alice, content="old")
+        new = Post.objects.create(author=self.carol, content="new")
+        self.assertEqual(self.feed_ids(), [new.id, old.id])
+
+        like = Like.objects.create(user=self.carol, post=old)
+        comment = Comment.objects.create(user=self.carol, post=old, content="nice")
+        self.assertEqual(self.feed_ids(), [old.id, new.id])
+        self.assertEqual(self.feed_ids(rank="latest"), [new.id, old.id])
+
+        like.delete()
+        comment.delete()
+        old.refresh_from_db()
+        self.assertAlmostEqual(old.rank_score, ranking.base_score(old.created_at), places=3)
+        self.assertEqual(self.feed_ids(), [new.id, old.id])
+
+    def test_engagement_does_not_rewrite_timeline_entries(self):
+        post = Post.objects.create(author=self.alice, content="popular")
+        with CaptureQueriesContext(connection) as ctx:
+            Like.objects.create(user=self.carol, post=post)
+        self.assertFalse([q for q in ctx.captured_queries if "posts_timelineentry" in q["sql"]])
+        self.assertEqual(self.feed_ids(), [post.id])
+
+    def test_scores_do_not_overflow_centuries_after_the_epoch(self):
+        early = Post.objects.create(author=self.alice, content="early")
+        late = Post.objects.create(author=self.carol, content="late")
+        far = datetime(2400, 1, 1, tzinfo=dt_timezone.utc)
+        base = ranking.base_score(far)  # ~136,000 half-lives: 2^base would overflow a float
+        Post.objects.filter(pk=late.pk).update(created_at=far, rank_score=base)
+
+        ranking.record("like", [late.id], when=far)
+        late.refresh_from_db()
+        self.assertAlmostEqual(late.rank_score, base + 1.0)  # two equal terms: log2(2x) = log2(x) + 1
+        ranking.record("like", [late.id], when=far, sign=-1)
+        late.refresh_from_db()
+        self.assertAlmostEqual(late.rank_score, base, places=6)
+        self.assertEqual(self.feed_ids(), [late.id, early.id])
+
+        like = Like.objects.create(user=self.bob, post=late)
+        Like.objects.filter(pk=like.pk).update(created_at=far)
+        ranking.recompute_posts()
+        late.refresh_from_db()
+        self.assertAlmostEqual(late.rank_score, base + 1.0, places=6)
+
+    def test_batch_endpoint_scores_too(self):
+        old = Post.objects.create(author=self.alice, content="old")
+        new = Post.objects.create(author=self.carol, content="new")
+        client = APIClient()
+        client.force_authenticate(self.carol)
+        res = client.post("/api/posts/batch/", {"operations": [{"action": "bookmark", "post_id": old.id}]},
+                          format="json")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.feed_ids(), [old.id, new.id])
+
+    def test_cursor_pages_follow_rank(self):
+        posts = [Post.objects.create(author=self.alice, content=str(n)) for n in range(5)]
+        for n, post in enumerate(posts):
+            for liker in [self.carol, self.alice][:n % 3]:
+                Like.objects.create(user=liker, post=post)
+        expected = self.feed_ids(page_size=10)
+        seen, url = [], "/api/feed/?rank=top&page_size=2"
+        while url:
+            data = self.client.get(url).data
+            seen += [row["id"] for row in data["results"]]
+            url = data["next"]
+        self.assertEqual(seen, expected)
+        self.assertEqual(sorted(seen), sorted(p.id for p in posts))
+
+        self.assertEqual(self.client.get("/api/feed/", {"rank": "hot"}).status_code, 400)
+
+    def test_high_fanout_authors_ranked_at_read_time(self):
+        with self.settings(FEED_FANOUT_MAX_FOLLOWERS=0):
+            viral = Post.objects.create(author=self.alice, content="viral")
+        quiet = Post.objects.create(author=self.carol, content="quiet")
+        self.assertFalse(TimelineEntry.objects.filter(user=self.bob, post=viral).exists())
+        Like.objects.create(user=self.carol, post=viral)
+        self.assertEqual(self.feed_ids(), [viral.id, quiet.id])
+
+    def test_recompute_matches_incremental_and_adds_affinity(self):
+        liked = Post.objects.create(author=self.alice, content="liked")
+        Like.objects.create(user=self.bob, post=liked)
+        Bookmark.objects.create(user=self.bob, post=liked)
+        from_alice = Post.objects.create(author=self.alice, content="from alice")
+        from_carol = Post.objects.create(author=self.carol, content="from carol")
+        incremental = dict(Post.objects.values_list("id", "rank_score"))
+
+        Post.objects.update(rank_score=0)
+        call_command("rank_feed", stdout=StringIO())
+        for pk, score in Post.objects.values_list("id", "rank_score"):
+            self.assertAlmostEqual(score, incremental[pk], places=6)
+
+        # bob engages with alice: her posts now outrank a slightly newer one from carol
+        boost = AuthorAffinity.objects.get(user=self.bob, author=self.alice).score
+        self.assertAlmostEqual(boost, ranking.affinity(2))
+        from_alice.refresh_from_db()
+        self.assertAlmostEqual(TimelineEntry.objects.get(user=self.bob, post=from_alice).affinity, boost)
+        self.assertLess(self.feed_ids().index(from_alice.id), self.feed_ids().index(from_carol.id))
+
+        # new posts are fanned out with the reader's affinity
+        fresh = Post.objects.create(author=self.alice, content="fresh")
+        self.assertAlmostEqual(TimelineEntry.objects.get(user=self.bob, post=fresh).affinity, boost)
+
+
+class TrendingTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+        self.client = APIClient()
+
+    def test_sliding_window_counts_and_expiry(self):
+        window = trending.SlidingWindow(3600, 12, width=256, depth=4, top_k=2)
+        for key, n in (("a", 5), ("b", 3), ("c", 1)):
+            window.add(key, n, 1000)
+        window.add("a", 1, 2000)
+        self.assertEqual(window.top(2, 2000), [("a", 6), ("b", 3)])
+        # 1h later only the second "a" is still in the window
+        self.assertEqual(window.top(2, 1000 + 3600), [("a", 1)])
+        self.assertEqual(window.estimate("b"), 0)
+
+    def test_trending_posts_and_tags(self):
+        quiet = Post.objects.create(author=self.alice, content="hello #Django")
+        hot = Post.objects.create(author=self.alice, content="#python #django")
+        Like.objects.create(user=self.bob, post=hot)
+        Comment.objects.create(user=self.bob, post=hot, content="nice")
+        Bookmark.objects.create(user=self.bob, post=quiet)
+
+        res = self.client.get("/api/trending/posts/", {"window": "24h"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([(row["id"], row["trending_score"]) for row in res.data["results"]],
+                         [(hot.id, 3), (quiet.id, 2)])
+
+        tags = self.client.get("/api/trending/tags/").data
+        self.assertEqual(tags["window"], "1h")
+        self.assertEqual([(row["tag"], row["score"]) for row in tags["results"]], [("django", 7), ("python", 4)])
+
+        self.assertEqual(self.client.get("/api/trending/posts/", {"window": "7d"}).status_code, 400)
+
+    def test_warms_from_database(self):
+        post = Post.objects.create(author=self.alice, content="#warm")
+        Like.objects.create(user=self.bob, post=post)
+        trending.reset()  # e.g. a freshly started worker
+        engine = trending.get_engine()
+        self.assertEqual(engine.top("posts", "1h", 10), [])  # reads don't replay anything
+        engine.sync()  # what warm() runs in the background at startup
+        self.assertEqual(engine.top("posts", "1h", 10), [(post.id, 1)])
+        self.assertEqual(engine.top("tags", "1h", 10), [("warm", 2)])
+
+    def test_events_during_a_sync_survive_the_swap(self):
+        post = Post.objects.create(author=self.alice, content="#live")
+        Like.objects.create(user=self.bob, post=post)
+        trending.reset()
+        engine = trending.get_engine()
+        tags_for = engine.tags_for
+        live = []
+
+        def tags_for_during_sync(post_ids):
+            if not live:  # a like served while the replay is still running
+                live.append(1)
+                engine.record("like", [post.id])
+            return tags_for(post_ids)
+
+        with mock.patch.object(engine, "tags_for", tags_for_during_sync):
+            engine.sync()
+        self.assertEqual(engine.top("posts", "1h", 10), [(post.id, 2)])
+
+    def test_sketch_benchmark(self):
+        row = benchmarks.sketch_accuracy(width=512, depth=4, events=5000, keys=500, top_k=10)
+        self.assertEqual(row["memory_kb"], 11 * 16)  # 10 five-minute buckets + the running total
+        self.assertGreaterEqual(row["mean_error"], 0)  # count-min never undercounts
+        self.assertLessEqual(row["max_error"], row["error_bound"])
+
+
+class TagIndexTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        self.client = APIClient()
+
+    def counts(self):
+        return dict(Tag.objects.filter(posts_count__gt=0).values_list("name", "posts_count"))
+
+    def test_index_follows_create_edit_delete(self):
+        post = Post.objects.create(author=self.alice, content="#Django and #python, again #django")
+        other = Post.objects.create(author=self.alice, content="#python")
+        self.assertEqual(self.counts(), {"django": 1, "python": 2})
+        self.assertEqual(PostTag.objects.get(post=post, tag__name="django").created_at, post.created_at)
+
+        post.content = "#python #rust"
+        with CaptureQueriesContext(connection) as queries:
+            post.save(update_fields=["content"])
+        self.assertEqual(self.counts(), {"python": 2, "rust": 1})
+        self.assertEqual(set(post.post_tags.values_list("tag__name", flat=True)), {"python", "rust"})
+        writes = [q for q in queries if "posttag" in q["sql"] or "posts_tag" in q["sql"]]
+        self.assertLessEqual(len(writes), 7)  # read, delete + decrement, create tag, insert + increment
+
+        post.delete()
+        self.assertEqual(self.counts(), {"python": 1})
+        self.assertEqual(PostTag.objects.filter(post=other).count(), 1)
+
+    def test_tag_posts_keyset_pages(self):
+        posts = [Post.objects.create(author=self.alice, content=f"{n} #News") for n in range(5)]
+        Post.objects.create(author=self.alice, content="#other")
+        tag = self.client.get("/api/tags/NEWS/").data
+        self.assertEqual((tag["name"], tag["posts_count"]), ("news", 5))
+
+        url, seen = "/api/tags/news/posts/?page_size=2", []
+        while url:
+            data = self.client.get(url).data
+            seen += [row["id"] for row in data["results"]]
+            url = data["next"]
+        self.assertEqual(seen, [post.id for post in reversed(posts)])
+        self.assertEqual(self.client.get("/api/tags/missing/posts/").status_code, 404)
+        self.assertEqual(self.client.get("/api/tags/").data["results"][0]["name"], "news")
+
+    def test_tag_posts_read_in_index_order(self):
+        post = Post.objects.create(author=self.alice, content="#plan")
+        qs = tags.posts_for(Tag.objects.get(name="plan")).order_by("-tagged_at", "-tagged_id")
+        plan = qs.explain()
+        self.assertIn("posts_postt_tag_id", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+        self.assertEqual(list(qs), [post])
+
+    def test_reindex_pipeline(self):
+        Post.objects.bulk_create([Post(author=self.alice, content=f"#bulk #n{n % 2}") for n in range(5)])
+        self.assertEqual(self.counts(), {})  # bulk_create skips the signals
+        batches = list(tags.parsed(tags.post_batches(Post.objects.all(), batch_size=2)))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(batches[0][0][2], ("bulk", "n0"))
+
+        self.assertEqual(tags.reindex(batch_size=2), 5)
+        self.assertEqual(self.counts(), {"bulk": 5, "n0": 3, "n1": 2})
+        call_command("reindex_tags", "--batch-size", "3", stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(self.counts(), {"bulk": 5, "n0": 3, "n1": 2})
+        self.assertEqual(PostTag.objects.count(), 10)
+
+
+class KeysetPaginationTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        self.posts = [Post.objects.create(author=self.alice, content=f"post {i}") for i in range(5)]
+        # force timestamp ties; id breaks them
+        Post.objects.update(created_at=self.posts[0].created_at)
+        self.client = APIClient()
+
+    def walk(self, url):
+        ids, pages = [], 0
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, 200)
+            ids += [row["id"] for row in res.data["results"]]
+            url, pages = res.data["next"], pages + 1
+        return ids, pages
+
+    def test_walks_every_post_once_with_ties(self):
+        ids, pages = self.walk("/api/posts/?page_size=2")
+        self.assertEqual(ids, sorted((p.id for p in self.posts), reverse=True))
+        self.assertEqual(pages, 3)
+
+    def test_previous_link_and_filters(self):
+        first = self.client.get("/api/posts/?page_size=2&q=post").data
+        second = self.client.get(first["next"]).data
+        self.assertIn("q=post", first["next"])
+        back = self.client.get(second["previous"]).data
+        self.assertEqual(back["results"], first["results"])
+
+    def test_page_number_mode(self):
+        res = self.client.get("/api/posts/?page=2&page_size=2")
+        self.assertEqual(res.data["count"], 5)
+        self.assertEqual(len(res.data["results"]), 2)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get("/api/posts/?cursor=garbage").status_code, 404)
+
+    def test_tampered_cursor_values(self):
+        def token(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+        for position in (["notadate", 1], [None, None], ["2025-01-01T00:00:00+00:00", "x"],
+                         ["2025-01-01T00:00:00+00:00", [1]], [1, 1], "p", ["2025-01-01T00:00:00+00:00"]):
+            res = self.client.get(f"/api/posts/?cursor={token({'p': position})}")
+            self.assertEqual(res.status_code, 404, position)
+        # search results page by score: a float, not a date
+        res = self.client.get(f"/api/posts/?q=post&cursor={token({'p': ['x', 1]})}")
+        self.assertEqual(res.status_code, 404)
+        newest = Post.objects.latest("created_at", "id")
+        res = self.client.get(f"/api/posts/?cursor={token({'p': [newest.created_at.isoformat(), newest.id]})}")
+        self.assertEqual(len(res.data["results"]), len(self.posts) - 1)
+
+    def test_bookmarks_keyset(self):
+        bob = User.objects.create_user("bob")
+        for post in self.posts:
+            Bookmark.objects.create(user=bob, post=post)
+        self.client.force_authenticate(bob)
+        ids, _ = self.walk("/api/posts/bookmarks/?page_size=2")
+        self.assertEqual(ids, [p.id for p in reversed(self.posts)])
+
+
+class SearchTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        self.client = APIClient()
+
+    def search_ids(self, url):
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        return [row["id"] for row in res.data["results"]]
+
+    def test_index_follows_create_update_delete(self):
+        post = Post.objects.create(author=self.alice, content="Django tips")
+        self.assertEqual(self.search_ids("/api/posts/?q=django"), [post.id])
+
+        post.content = "Flask tips"
+        post.save()
+        self.assertEqual(self.search_ids("/api/posts/?q=django"), [])
+        self.assertEqual(self.search_ids("/api/posts/?q=flask"), [post.id])
+
+        post.delete()
+        self.assertEqual(self.search_ids("/api/posts/?q=flask"), [])
+
+    def test_prefix_phrase_and_ranking(self):
+        loose = Post.objects.create(author=self.alice, content="world news and a hello somewhere")
+        exact = Post.objects.create(author=self.alice, content="hello world hello world")
+        self.assertEqual(self.search_ids('/api/posts/?q="hello world"'), [exact.id])
+        self.assertEqual(self.search_ids("/api/posts/?q=hel*"), [exact.id, loose.id])
+        # FTS operators in user input are treated as plain words
+        self.assertEqual(self.search_ids("/api/posts/?q=hello AND NEAR("), [])
+
+    def test_punctuation_only_query_is_empty(self):
+        Post.objects.create(author=self.alice, content="hello")
+        self.client.force_authenticate(self.alice)
+        for url in ("/api/posts/", "/api/feed/", "/api/comments/"):
+            for q in ("*", "%22", "!!!"):
+                self.assertEqual(self.search_ids(f"{url}?q={q}"), [])
+
+    def test_comment_search_with_post_filter(self):
+        post = Post.objects.create(author=self.alice, content="p")
+        other = Post.objects.create(author=self.alice, content="p2")
+        c = Comment.objects.create(user=self.alice, post=post, content="great shot")
+        Comment.objects.create(user=self.alice, post=other, content="great shot")
+        self.assertEqual(self.search_ids(f"/api/comments/?post={post.id}&q=great"), [c.id])
+
+    def test_search_pages_by_score(self):
+        for i in range(5):
+            Post.objects.create(author=self.alice, content=f"news item {i}")
+        seen, url = [], "/api/posts/?q=news&page_size=2"
+        while url:
+            data = self.client.get(url).data
+            seen += [row["id"] for row in data["results"]]
+            url = data["next"]
+        self.assertEqual(sorted(seen), sorted(Post.objects.values_list("id", flat=True)))
+
+    def test_rebuild_command(self):
+        post = Post.objects.create(author=self.alice, content="rebuilt")
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self.search_ids("/api/posts/?q=rebuilt"), [post.id])
+
+
+class FollowGraphTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+
+    def test_cached_and_invalidated_on_follow_changes(self):
+        graph = get_graph()
+        self.assertNotIn(self.alice.id, graph.following(self.bob.id))
+        with self.assertNumQueries(0):
+            graph.following(self.bob.id)
+
+        client = APIClient()
+        client.force_authenticate(self.bob)
+        res = client.post("/api/follow/", {"following": self.alice.id})
+        self.assertEqual(res.status_code, 201)
+        self.assertIn(self.alice.id, graph.following(self.bob.id))
+        self.assertIn(self.bob.id, graph.followers(self.alice.id))
+
+        client.delete(f"/api/follow/{res.data['id']}/")
+        self.assertNotIn(self.alice.id, graph.following(self.bob.id))
+        self.assertGreater(graph.stats()["hits"], 0)
+
+    def test_lru_respects_entry_and_byte_limits(self):
+        graph = FollowGraph({"MAX_ENTRIES": 2, "MAX_BYTES": 10_000})
+        for uid in (1, 2, 3):
+            graph.backend.set(f"k{uid}", IdSet(range(10)))
+        self.assertIsNone(graph.backend.get("k1"))
+        self.assertEqual(graph.backend.info()["evictions"], 1)
+
+        graph.backend.set("big", IdSet(range(2000)))  # 16kB > ceiling: not cached
+        self.assertIsNone(graph.backend.get("big"))
+
+    def test_ttl_expiry(self):
+        graph = FollowGraph({"TTL": -1})
+        graph.backend.set("k", IdSet([1]))
+        self.assertIsNone(graph.backend.get("k"))
+
+    def test_shared_django_cache_backend(self):
+        caches = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        with self.settings(CACHES=caches, FOLLOW_GRAPH_CACHE={"BACKEND": "django"}):
+            Follow.objects.create(follower=self.bob, following=self.alice)
+            self.assertEqual(list(get_graph().following(self.bob.id)), [self.alice.id])
+            self.assertEqual(list(FollowGraph({"BACKEND": "django"}).following(self.bob.id)), [self.alice.id])
+
+            # clear() drops only the graph's entries from the shared alias
+            cache.set("unrelated", 1)
+            get_graph().clear()
+            self.assertEqual(cache.get("unrelated"), 1)
+            self.assertIsNone(get_graph().backend.get(get_graph()._key("following", self.bob.id)))
+
+            # async lookups go through the cache's async API, not the blocking one
+            graph = FollowGraph({"BACKEND": "django"})
+            with mock.patch.object(graph.backend, "get", side_effect=AssertionError), \
+                    mock.patch.object(graph.backend, "set", side_effect=AssertionError):
+                self.assertEqual(list(async_to_sync(graph.afollowing)(self.bob.id)), [self.alice.id])
+                self.assertEqual(list(async_to_sync(graph.afollowing)(self.bob.id)), [self.alice.id])
+            self.assertEqual((graph.stats()["misses"], graph.stats()["hits"]), (1, 1))
+
+
+class LikersTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        self.post = Post.objects.create(author=self.alice, content="viral")
+        self.likers = [User.objects.create_user(f"fan{n}") for n in range(5)]
+        for user in self.likers:
+            Like.objects.create(user=user, post=self.post)
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_cursor_pages_of_projected_rows(self):
+        url = f"/api/posts/{self.post.id}/likes/?page_size=2"
+        seen = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                data = self.client.get(url).data
+            self.assertLessEqual(len(queries), 2)  # post + one page of likes joined to users
+            seen += data["results"]
+            url = data["next"]
+        self.assertEqual([row["username"] for row in seen], [f"fan{n}" for n in reversed(range(5))])
+        self.assertEqual(set(seen[0]), {"user_id", "username", "created_at"})
+
+    def test_summary_of_followed_likers(self):
+        for user in self.likers[:3]:
+            Follow.objects.create(follower=self.alice, following=user)
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(f"/api/posts/{self.post.id}/likes/", {"summary": "1"}).data
+        self.assertEqual(len(queries), 2)  # the post, then likers followed by the viewer
+        self.assertEqual((data["count"], data["followed_count"]), (5, 3))
+        self.assertEqual([row["username"] for row in data["followed_sample"]], ["fan2", "fan1", "fan0"])
+
+        stranger = APIClient()
+        stranger.force_authenticate(User.objects.create_user("stranger"))
+        data = stranger.get(f"/api/posts/{self.post.id}/likes/", {"summary": "1"}).data
+        self.assertEqual((data["count"], data["followed_count"], data["followed_sample"]), (5, 0, []))
+
+
+class ExportTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+        self.posts = [Post.objects.create(author=self.alice, content=f"post {n}") for n in range(3)]
+        other = Post.objects.create(author=self.bob, content="bob's")
+        Comment.objects.create(user=self.alice, post=other, content="nice")
+        Like.objects.create(user=self.alice, post=other)
+        Bookmark.objects.create(user=self.alice, post=other)
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        Like.objects.create(user=self.bob, post=self.posts[0])  # not alice's
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def _lines(self, res):
+        body = b"".join(res.streaming_content)
+        return [json.loads(line) for line in body.decode().splitlines()]
+
+    def test_streams_every_section_then_end(self):
+        res = self.client.get("/api/export/")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        self.assertIn('filename="export-alice.ndjson"', res["Content-Disposition"])
+        lines = self._lines(res)
+        self.assertEqual(
+            [line["type"] for line in lines],
+            ["post", "post", "post", "comment", "like", "bookmark", "follow", "end"],
+        )
+        self.assertEqual([line["data"]["content"] for line in lines[:3]], ["post 0", "post 1", "post 2"])
+        self.assertEqual(lines[6]["data"]["following_id"], self.bob.id)
+
+    def test_resume_after_cursor(self):
+        lines = self._lines(self.client.get("/api/export/"))
+        resumed = self._lines(self.client.get("/api/export/", {"cursor": lines[1]["cursor"]}))
+        self.assertEqual(resumed, lines[2:])
+        self.assertEqual(export.parse_cursor(lines[3]["cursor"])[0], "comments")
+
+    def test_small_chunks_and_gzip_round_trip(self):
+        plain = b"".join(export.stream(self.alice.id))
+        chunked = b"".join(export.stream(self.alice.id, chunk_size=1))
+        self.assertEqual(plain, chunked)
+        res = self.client.get("/api/export/", {"compression": "gzip"})
+        self.assertEqual(res["Content-Type"], "application/gzip")
+        self.assertEqual(gzip.decompress(b"".join(res.streaming_content)), plain)
+
+    def test_asgi_streams_an_async_iterator(self):
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(self.alice)}"}
+
+        async def fetch():
+            res = await AsyncClient().get("/api/export/", {"compression": "gzip"}, headers=headers)
+            return res, b"".join([chunk async for chunk in res.streaming_content])
+
+        res, body = async_to_sync(fetch)()
+        self.assertTrue(res.is_async)
+        self.assertEqual(gzip.decompress(body), b"".join(export.stream(self.alice.id)))
+
+    def test_invalid_parameters_and_anonymous(self):
+        self.assertEqual(self.client.get("/api/export/", {"cursor": "nope:1"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/export/", {"cursor": "posts:x"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/export/", {"compression": "br"}).status_code, 400)
+        self.assertEqual(APIClient().get("/api/export/").status_code, 401)
+
+    def test_management_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "alice.ndjson.gz")
+            call_command("export_user_data", "alice", "--output", path, "--gzip", stderr=StringIO())
+            with open(path, "rb") as f:
+                self.assertEqual(gzip.decompress(f.read()), b"".join(export.stream(self.alice.id)))
+
+
+class CommentPreviewTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        self.posts = [Post.objects.create(author=self.alice, content=f"post {n}") for n in range(3)]
+        self.comments = [
+            Comment.objects.create(user=self.bob, post=self.posts[0], content=f"c{n}") for n in range(4)
+        ]
+        Comment.objects.create(user=self.alice, post=self.posts[1], content="only one")
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+
+    def previews(self, data):
+        return {row["id"]: [c["content"] for c in row["comments_preview"]] for row in data["results"]}
+
+    def test_newest_comments_for_the_page_in_one_query(self):
+        self.client.get("/api/posts/")  # fills the follow-graph cache
+        with CaptureQueriesContext(connection) as plain:
+            self.client.get("/api/posts/")
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get("/api/posts/", {"comments_preview": 2}).data
+        self.assertEqual(len(queries), len(plain) + 1)
+        self.assertIn("ROW_NUMBER", queries[-1]["sql"])
+        self.assertNotIn("posts_post", queries[-1]["sql"])
+        self.assertEqual(self.previews(data), {
+            self.posts[0].id: ["c3", "c2"], self.posts[1].id: ["only one"], self.posts[2].id: [],
+        })
+        first = data["results"][-1]["comments_preview"][0]
+        self.assertEqual(set(first), {"id", "user", "user_username", "content", "created_at", "updated_at"})
+        self.assertEqual((first["user"], first["user_username"]), (self.bob.id, "bob"))
+
+        self.assertNotIn("comments_preview", self.client.get("/api/posts/").data["results"][0])
+
+    def test_feed_and_detail(self):
+        feed = self.client.get("/api/feed/", {"comments_preview": 1}).data
+        self.assertEqual(self.previews(feed)[self.posts[0].id], ["c3"])
+        detail = self.client.get(f"/api/posts/{self.posts[0].id}/", {"comments_preview": 3}).data
+        self.assertEqual([c["content"] for c in detail["comments_preview"]], ["c3", "c2", "c1"])
+
+    def test_invalid_values(self):
+        for value in ("11", "-1", "two"):
+            self.assertEqual(self.client.get("/api/posts/", {"comments_preview": value}).status_code, 400, value)
+
+    def test_comment_edit_changes_the_etag(self):
+        url = f"/api/posts/{self.posts[0].id}/?comments_preview=1"
+        etag = self.client.get(url)["ETag"]
+        self.assertNotEqual(etag, self.client.get(f"/api/posts/{self.posts[0].id}/")["ETag"])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        comment = self.comments[-1]
+        comment.content = "edited"
+        comment.save()
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["comments_preview"][0]["content"], "edited")
+
+    def test_comment_list_does_not_join_posts(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/comments/", {"post": self.posts[0].id})
+        self.assertFalse(any("posts_post" in q["sql"] for q in queries))
+
+
+class EngagementBatchTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+        self.p1 = Post.objects.create(author=self.alice, content="one")
+        self.p2 = Post.objects.create(author=self.alice, content="two")
+        Like.objects.create(user=self.bob, post=self.p2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+
+    def test_results_match_single_endpoints(self):
+        ops = [
+            {"action": "like", "post_id": self.p1.id},
+            {"action": "like", "post_id": self.p1.id},
+            {"action": "unlike", "post_id": self.p2.id},
+            {"action": "unlike", "post_id": self.p2.id},
+            {"action": "bookmark", "post_id": self.p2.id},
+            {"action": "unbookmark", "post_id": self.p1.id},
+            {"action": "like", "post_id": 999999},
+        ]
+        res = self.client.post("/api/posts/batch/", {"operations": ops}, format="json")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([r["status"] for r in res.data["results"]], [201, 200, 204, 404, 201, 404, 404])
+
+        self.p1.refresh_from_db()
+        self.p2.refresh_from_db()
+        self.assertEqual((self.p1.likes_count, self.p2.likes_count, self.p2.bookmarks_count), (1, 0, 1))
+        self.assertTrue(Like.objects.filter(user=self.bob, post=self.p1).exists())
+        self.assertFalse(Like.objects.filter(user=self.bob, post=self.p2).exists())
+
+    def test_rejects_unknown_actions(self):
+        res = self.client.post("/api/posts/batch/", {"operations": [{"action": "share", "post_id": 1}]}, format="json")
+        self.assertEqual(res.status_code, 400)
+
+    def test_counts_only_rows_it_inserted(self):
+        bulk_create = Like.objects.bulk_create
+
+        def racing_bulk_create(objs, **kwargs):
+            # the same like lands (and is counted) between the batch's read and its insert
+            Like.objects.create(user=self.bob, post=self.p1)
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(Like.objects, "bulk_create", racing_bulk_create):
+            self.client.post("/api/posts/batch/", {"operations": [{"action": "like", "post_id": self.p1.id}]},
+                             format="json")
+        self.p1.refresh_from_db()
+        self.assertEqual(self.p1.likes_count, 1)
+
+
+@override_settings(RATE_LIMITS={"RATES": {"engagement": "2/min", "comment": "1/min", "auth": "1/min"}})
+class RateLimitTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.bob = User.objects.create_user("bob")
+        self.posts = [Post.objects.create(author=self.alice, content=f"post {n}") for n in range(3)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+
+    def test_bucket_refills_at_the_rate(self):
+        limiter = ratelimit.Limiter({**ratelimit.config(), "RATES": {"x": "3/min"}})
+        self.assertEqual([limiter.take("x", "c", now=100) for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(limiter.take("x", "c", now=100), 20)  # one token per 20s
+        self.assertEqual(limiter.take("x", "c", now=120), 0)
+        self.assertEqual(limiter.take("x", "other", now=120), 0)
+        self.assertEqual(limiter.take("unlimited", "c", now=120), 0)
+        with self.assertRaises(ValueError):
+            ratelimit.parse_rate("3/fortnight")
+
+    def test_engagement_limited_per_user_without_queries(self):
+        for post in self.posts[:2]:
+            self.assertEqual(self.client.post(f"/api/posts/{post.id}/like/").status_code, 201)
+        with self.assertNumQueries(0):
+            res = self.client.post(f"/api/posts/{self.posts[2].id}/bookmark/")
+        self.assertEqual(res.status_code, 429)
+        self.assertEqual(res["Retry-After"], "30")
+
+        self.assertEqual(self.client.get("/api/posts/").status_code, 200)  # reads aren't limited
+        other = APIClient()
+        other.force_authenticate(self.alice)
+        self.assertEqual(other.post(f"/api/posts/{self.posts[2].id}/like/").status_code, 201)
+
+    def test_comment_create_and_token_endpoints(self):
+        url = "/api/comments/"
+        self.assertEqual(self.client.post(url, {"post": self.posts[0].id, "content": "a"}).status_code, 201)
+        self.assertEqual(self.client.post(url, {"post": self.posts[0].id, "content": "b"}).status_code, 429)
+
+        anon = APIClient()
+        credentials = {"username": "alice", "password": "wrong"}
+        self.assertEqual(anon.post("/api/token/", credentials, REMOTE_ADDR="10.0.0.1").status_code, 401)
+        self.assertEqual(anon.post("/api/token/", credentials, REMOTE_ADDR="10.0.0.1").status_code, 429)
+        self.assertEqual(anon.post("/api/token/", credentials, REMOTE_ADDR="10.0.0.2").status_code, 401)
+
+    def test_forwarded_for_is_ignored_without_trusted_proxies(self):
+        anon = APIClient()
+        credentials = {"username": "alice", "password": "wrong"}
+        statuses = [
+            anon.post("/api/token/", credentials, REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR=f"203.0.113.{n}").status_code
+            for n in range(2)
+        ]
+        self.assertEqual(statuses, [401, 429])
+
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, "NUM_PROXIES": 1}):
+            for n in range(2):
+                res = anon.post("/api/token/", credentials, REMOTE_ADDR="10.0.0.9",
+                                HTTP_X_FORWARDED_FOR=f"6.6.6.6, 198.51.100.{n}")  # spoofed, then the proxy's
+                self.assertEqual(res.status_code, 401)  # one bucket per client behind the proxy
+
+    def test_shared_cache_backend(self):
+        cfg = {**ratelimit.config(), "BACKEND": "django"}
+        worker_a, worker_b = ratelimit.Limiter(cfg), ratelimit.Limiter(cfg)
+        self.assertEqual(worker_a.take("engagement", "user:1", now=100), 0)
+        self.assertEqual(worker_b.take("engagement", "user:1", now=100), 0)
+        self.assertGreater(worker_a.take("engagement", "user:1", now=100), 0)
+        worker_b.refill("user:1")
+        self.assertEqual(worker_a.take("engagement", "user:1", now=100), 0)
+
+    @override_settings(RATE_LIMITS={"ENABLED": False})
+    def test_disabled(self):
+        self.assertIsNone(ratelimit.get_limiter())
+        for post in self.posts:
+            self.assertEqual(self.client.post(f"/api/posts/{post.id}/like/").status_code, 201)
+
+    def test_overhead_benchmark(self):
+        row = benchmarks.ratelimit_overhead(decisions=2000, clients=10, rate="100/min")
+        self.assertEqual(row["allowed"], 0.5)  # 200 requests per client, 100 tokens each
+        self.assertGreater(row["decisions_per_s"], 0)
+
+
+@skipUnless(imaging.available(), "Pillow is not installed")
+class MediaTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.media_root = tmp.name
+        override = override_settings(MEDIA_ROOT=tmp.name, MEDIA_PIPELINE={"WORKERS": 0, "FORMAT": "WEBP"})
+        override.enable()
+        self.addCleanup(override.disable)
+        self.alice = User.objects.create_user("alice")
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def _image(self, size=(600, 400), fmt="PNG", color=(200, 30, 30)):
+        from PIL import Image
+
+        out = BytesIO()
+        Image.new("RGB", size, color).save(out, fmt)
+        return out.getvalue()
+
+    def _upload(self, data, name="photo.png"):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/media/", {"file": SimpleUploadedFile(name, data)}, format="multipart")
+
+    def test_upload_renders_variants_and_dedupes(self):
+        data = self._image()
+        res = self._upload(data)
+        self.assertEqual(res.status_code, 201)
+        self.assertRegex(res.data["url"], r"/media/originals/[0-9a-f]{2}/[0-9a-f]{64}\.png$")
+
+        asset = MediaAsset.objects.get(pk=res.data["id"])
+        self.assertEqual((asset.status, asset.width, asset.height), (MediaAsset.READY, 600, 400))
+        sizes = {name: (v["width"], v["height"]) for name, v in asset.variants.items()}
+        self.assertEqual(sizes, {"thumb": (160, 160), "feed": (600, 400), "full": (600, 400)})  # never enlarged
+        self.assertTrue(asset.variants["thumb"]["path"].endswith(f"{asset.sha256}/thumb-160x160.webp"))
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, asset.variants["feed"]["path"])))
+
+        again = self._upload(data, name="copy.png")
+        self.assertEqual((again.status_code, again.data["id"]), (200, asset.pk))
+        self.assertEqual(MediaAsset.objects.count(), 1)
+        self.assertEqual(len(os.listdir(os.path.dirname(os.path.join(self.media_root, asset.original)))), 1)
+
+    def test_rejects_bad_uploads(self):
+        self.assertEqual(self._upload(b"not an image", name="x.png").status_code, 400)
+        self.assertEqual(self.client.post("/api/media/", {}, format="multipart").status_code, 400)
+        with override_settings(MEDIA_PIPELINE={"WORKERS": 0, "MAX_UPLOAD_BYTES": 100}):
+            self.assertEqual(self._upload(self._image()).status_code, 400)
+        self.assertEqual(APIClient().post("/api/media/", {}, format="multipart").status_code, 401)
+        self.assertFalse(MediaAsset.objects.exists())
+
+    def test_posts_and_profiles_link_uploads(self):
+        url = self._upload(self._image()).data["url"]
+        post = Post.objects.create(author=self.alice, content="look", media_url=url)
+        remote = Post.objects.create(author=self.alice, content="elsewhere", media_url="https://cdn.example.com/a.png")
+        self.assertIsNotNone(post.media_id)
+        self.assertIsNone(remote.media_id)
+
+        data = self.client.get(f"/api/posts/{post.id}/").data["media"]
+        self.assertEqual((data["status"], data["width"]), ("ready", 600))
+        self.assertTrue(data["thumb"].endswith("thumb-160x160.webp"))
+        self.assertIsNone(self.client.get(f"/api/posts/{remote.id}/").data["media"])
+        thin = self.client.get("/api/posts/", {"fields": "id,media"}).data["results"]
+        self.assertEqual({row["id"]: bool(row["media"]) for row in thin}, {post.id: True, remote.id: False})
+
+        from users.models import Profile
+
+        Profile.objects.create(user=self.alice, avatar_url=url)
+        avatar = self.client.get(f"/api/users/{self.alice.id}/").data["profile"]["avatar"]
+        self.assertTrue(avatar["feed"].endswith("feed-600x400.webp"))
+
+    def test_jpeg_output_flattens_alpha_and_crops(self):
+        from PIL import Image
+
+        out = BytesIO()
+        Image.new("RGBA", (300, 100), (0, 0, 255, 0)).save(out, "PNG")
+        rendered = imaging.render(out.getvalue(), {"sq": (50, 50, True), "box": (120, 120, False)}, "JPEG", 80, 10**6)
+        self.assertEqual({name: (w, h) for name, (_, w, h) in rendered.items()}, {"sq": (50, 50), "box": (120, 40)})
+        with Image.open(BytesIO(rendered["sq"][0])) as im:
+            self.assertEqual((im.format, im.mode, im.getpixel((25, 25))), ("JPEG", "RGB", (255, 255, 255)))
+        with self.assertRaises(imaging.InvalidImage):
+            imaging.probe(out.getvalue(), max_pixels=1000)
+
+    def test_variants_derive_only_from_covering_sources(self):
+        def sizes(rendered):
+            return {name: (w, h) for name, (_, w, h) in rendered.items()}
+
+        # boxes that don't nest: b must come from the original, not from a's 1500x750
+        specs = {"a": (1500, 1500, False), "b": (2000, 1000, False)}
+        self.assertEqual(sizes(imaging.render(self._image(size=(4000, 2000)), specs, "JPEG", 80, 10**8)),
+                         {"a": (1500, 750), "b": (2000, 1000)})
+
+        # a panorama's thumb is cut from a source covering 1280x160, not the 1080x135 feed image
+        fit = mock.Mock(wraps=imaging.ImageOps.fit)
+        with mock.patch.object(imaging.ImageOps, "fit", fit):
+            rendered = imaging.render(self._image(size=(8000, 1000)), media.DEFAULTS["VARIANTS"], "JPEG", 80, 10**8)
+        self.assertEqual(sizes(rendered), {"thumb": (160, 160), "feed": (1080, 135), "full": (2048, 256)})
+        self.assertEqual(fit.call_args.args[0].size, (2048, 256))
+
+    def test_process_media_command_imports_and_renders_in_a_pool(self):
+        pending, _ = media.ingest(self._image(color=(1, 2, 3)), render=False)
+        os.makedirs(os.path.join(self.media_root, "legacy"))
+        with open(os.path.join(self.media_root, "legacy", "old.jpg"), "wb") as f:
+            f.write(self._image(size=(2400, 1200), fmt="JPEG"))
+        post = Post.objects.create(author=self.alice, content="old", media_url="https://example.com/media/legacy/old.jpg")
+        self.assertIsNone(post.media_id)
+
+        out = StringIO()
+        call_command("process_media", "--import-existing", "--workers", "1", stdout=out, stderr=StringIO())
+        self.assertIn("Rendered 2 asset(s); 0 failed.", out.getvalue())
+        post.refresh_from_db()
+        self.assertEqual(post.media.variants["full"]["width"], 2048)
+        pending.refresh_from_db()
+        self.assertEqual(pending.status, MediaAsset.READY)
+
+        call_command("process_media", stdout=out, stderr=StringIO())
+        self.assertIn("Rendered 0 asset(s)", out.getvalue())
+
+
+class LikeWriteBehindTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+        self.post = Post.objects.create(author=self.alice, content="viral")
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+        # no background thread: tests flush explicitly
+        override = self.settings(LIKE_WRITE_BEHIND={"ENABLED": True, "FLUSH_INTERVAL": None})
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_pending_state_is_visible_then_flushed(self):
+        self.assertEqual(self.client.post(f"/api/posts/{self.post.id}/like/").status_code, 201)
+        self.assertEqual(self.client.post(f"/api/posts/{self.post.id}/like/").status_code, 200)
+        self.assertFalse(Like.objects.exists())
+
+        data = self.client.get(f"/api/posts/{self.post.id}/").data
+        self.assertEqual((data["likes_count"], data["is_liked"]), (1, True))
+
+        buffer = likebuffer.get_buffer()
+        self.assertEqual(buffer.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertTrue(Like.objects.filter(user=self.bob, post=self.post).exists())
+        self.assertEqual(buffer.metrics()["queue_depth"], 0)
+        self.assertEqual(buffer.metrics()["batch_size_max"], 1)
+
+    def test_like_then_unlike_cancels_out(self):
+        self.client.post(f"/api/posts/{self.post.id}/like/")
+        self.assertEqual(self.client.delete(f"/api/posts/{self.post.id}/unlike/").status_code, 204)
+        self.assertEqual(self.client.delete(f"/api/posts/{self.post.id}/unlike/").status_code, 404)
+        self.assertEqual(likebuffer.get_buffer().depth(), 0)
+
+    def test_unlike_of_stored_like(self):
+        Like.objects.create(user=self.bob, post=self.post)
+        self.client.delete(f"/api/posts/{self.post.id}/unlike/")
+        self.assertEqual(self.client.get(f"/api/posts/{self.post.id}/").data["likes_count"], 0)
+        likebuffer.get_buffer().flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+        self.assertFalse(Like.objects.exists())
+
+    def test_deleted_post_does_not_stall_the_queue(self):
+        doomed = Post.objects.create(author=self.alice, content="doomed")
+        self.client.post(f"/api/posts/{doomed.id}/like/")
+        self.client.post(f"/api/posts/{self.post.id}/like/")
+        doomed.delete()
+
+        buffer = likebuffer.get_buffer()
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(list(Like.objects.values_list("post_id", flat=True)), [self.post.id])
+        self.assertEqual((buffer.depth(), buffer.metrics()["dropped"], buffer.metrics()["errors"]), (0, 1, 0))
+
+    def test_flush_does_not_recount_a_like_written_meanwhile(self):
+        self.client.post(f"/api/posts/{self.post.id}/like/")
+        bulk_create = Like.objects.bulk_create
+
+        def racing_bulk_create(objs, **kwargs):
+            Like.objects.create(user=self.bob, post=self.post)
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(Like.objects, "bulk_create", racing_bulk_create):
+            likebuffer.get_buffer().flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+    def test_batch_sees_buffered_likes(self):
+        other = Post.objects.create(author=self.alice, content="other")
+        self.client.post(f"/api/posts/{self.post.id}/like/")
+        self.client.force_authenticate(self.alice)
+        self.client.post(f"/api/posts/{other.id}/like/")
+        self.client.force_authenticate(self.bob)
+
+        ops = [{"action": "unlike", "post_id": self.post.id}]
+        res = self.client.post("/api/posts/batch/", {"operations": ops}, format="json")
+        self.assertEqual(res.data["results"][0]["status"], 204)
+        buffer = likebuffer.get_buffer()
+        # only bob's intents were written; alice's is still buffered
+        self.assertEqual((buffer.depth(), buffer.pending_for_user(self.alice.id)), (1, {other.id: True}))
+        buffer.flush()
+        self.assertEqual(list(Like.objects.values_list("user_id", "post_id")), [(self.alice.id, other.id)])
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+
+class ConditionalGetTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+        self.post = Post.objects.create(author=self.alice, content="hello")
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+
+    def test_detail_304_without_serializing(self):
+        url = f"/api/posts/{self.post.id}/"
+        res = self.client.get(url)
+        etag = res["ETag"]
+        self.assertIn("Last-Modified", res)
+        # just the row; no per-viewer lookups
+        with self.assertNumQueries(1):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=res["Last-Modified"])
+        self.assertEqual(res.status_code, 304)
+
+    def test_likes_and_edits_change_the_etag(self):
+        url = f"/api/posts/{self.post.id}/"
+        etag = self.client.get(url)["ETag"]
+        Like.objects.create(user=self.bob, post=self.post)
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.data["is_liked"])
+
+    def test_list_and_comments(self):
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        for url in ("/api/posts/", "/api/feed/", f"/api/comments/?post={self.post.id}"):
+            res = self.client.get(url)
+            etag = res["ETag"]
+            # a page's newest timestamp doesn't move on deletes or unfollows
+            self.assertNotIn("Last-Modified", res, url)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304, url)
+
+        etag = self.client.get(f"/api/comments/?post={self.post.id}")["ETag"]
+        Comment.objects.create(user=self.bob, post=self.post, content="new")
+        res = self.client.get(f"/api/comments/?post={self.post.id}", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+
+    def test_etag_is_per_viewer(self):
+        url = f"/api/posts/{self.post.id}/"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(APIClient().get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ResponseCacheTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        self.post = Post.objects.create(author=self.alice, content="hello")
+        self.client = APIClient()
+        responsecache.reset_stats()
+
+    def test_anonymous_hits_and_precise_invalidation(self):
+        url = f"/api/posts/{self.post.id}/"
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            res = self.client.get(url)
+        self.assertEqual(res["X-Cache"], "HIT")
+
+        other = Post.objects.create(author=self.alice, content="other")
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")  # unrelated post
+        self.assertEqual(self.client.get("/api/posts/")["X-Cache"], "MISS")  # list depends on all
+
+        Like.objects.create(user=self.alice, post=self.post)
+        res = self.client.get(url)
+        self.assertEqual((res["X-Cache"], res.data["likes_count"]), ("MISS", 1))
+        self.assertGreater(responsecache.stats()["hit_ratio"], 0)
+        self.assertEqual(self.client.get(f"/api/posts/{other.id}/")["X-Cache"], "MISS")
+
+    def test_engagement_refreshes_only_lists_showing_the_post(self):
+        bob = User.objects.create_user("bob")
+        Post.objects.create(author=bob, content="bob's")
+        alices, bobs = f"/api/posts/?author={self.alice.id}", f"/api/posts/?author={bob.id}"
+        self.client.get(alices)
+        self.client.get(bobs)
+
+        Like.objects.create(user=bob, post=self.post)
+        self.assertEqual(self.client.get(bobs)["X-Cache"], "HIT")
+        res = self.client.get(alices)
+        self.assertEqual((res["X-Cache"], res.data["results"][0]["likes_count"]), ("MISS", 1))
+        self.assertEqual(self.client.get(alices)["X-Cache"], "HIT")
+
+    def test_query_params_are_normalized(self):
+        self.client.get("/api/posts/?author=1&q=")
+        self.assertEqual(self.client.get("/api/posts/?author=1")["X-Cache"], "HIT")
+
+    def test_comments_and_conditional_hits(self):
+        url = f"/api/comments/?post={self.post.id}"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Comment.objects.create(user=self.alice, post=self.post, content="hi")
+        self.assertEqual(len(self.client.get(url).data["results"]), 1)
+
+    def test_authenticated_viewers_bypass(self):
+        self.client.force_authenticate(self.alice)
+        self.client.get("/api/posts/")
+        self.assertNotIn("X-Cache", self.client.get("/api/posts/"))
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return "value"
+
+        threads = [threading.Thread(target=responsecache.get_or_compute, args=("k", slow)) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+
+
+class BenchmarkTests(BaseTestCase):
+    def test_seed_and_query_budgets(self):
+        call_command("seed_social_graph", users=30, posts_per_user=3, follows_per_user=5, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 30)
+        self.assertTrue(Follow.objects.exists())
+        post = Post.objects.order_by("-likes_count").first()
+        self.assertEqual(post.likes_count, post.likes.count())
+
+        report = benchmarks.run(iterations=2, warmup=1)
+        self.assertEqual(benchmarks.check(report), [], report)
+
+    def test_regression_against_baseline(self):
+        report = {"endpoints": {"feed": {"p95_ms": 20.0, "queries": 3, "budget": 5, "statuses": [200]}}}
+        baseline = {"endpoints": {"feed": {"p95_ms": 10.0}}}
+        self.assertEqual(len(benchmarks.check(report, baseline, threshold=0.5)), 1)
+        self.assertEqual(benchmarks.check(report, baseline, threshold=1.5), [])
+
+
+class InstrumentationTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        Post.objects.create(author=self.alice, content="hello")
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_server_timing_header_and_log(self):
+        with self.settings(SERVER_TIMING={"SAMPLE_RATE": 1.0}), \
+                self.assertLogs("posts.instrumentation", "INFO") as logs:
+            res = self.client.get("/api/posts/")
+        header = res["Server-Timing"]
+        for metric in ("auth;dur=", "queryset;dur=", "serialize;dur=", "render;dur=", "sql;dur=", "total;dur="):
+            self.assertIn(metric, header)
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["path"], "/api/posts/")
+        self.assertGreater(record["queries"], 0)
+        self.assertTrue(record["slowest_sql"]["sql"])
+
+    def test_not_sampled(self):
+        with self.settings(SERVER_TIMING={"SAMPLE_RATE": 0.0}):
+            self.assertNotIn("Server-Timing", self.client.get("/api/posts/"))
+
+    def test_repeated_statements_are_flagged(self):
+        stats = instrumentation.RequestStats()
+        for _ in range(4):
+            stats.record_query("SELECT COUNT(*) FROM posts_like WHERE post_id = %s", 0.001)
+        stats.record_query("SELECT 1", 0.01)
+        self.assertEqual(stats.repeated(3), [("SELECT COUNT(*) FROM posts_like WHERE post_id = %s", 4)])
+        self.assertEqual(stats.slowest[1], "SELECT 1")
+        self.assertIn("sql-repeated", instrumentation.server_timing(stats, 0.02, instrumentation.config()))
+
+
+class SparseFieldsTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+        self.post = Post.objects.create(author=self.alice, content="hello")
+        Comment.objects.create(user=self.bob, post=self.post, content="hi")
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+
+    def test_fields_skip_joins_and_viewer_lookups(self):
+        with CaptureQueriesContext(connection) as captured:
+            res = self.client.get("/api/posts/?fields=id,content,created_at")
+        self.assertEqual(set(res.data["results"][0]), {"id", "content", "created_at"})
+        # the post page plus the (cached) follow-graph load for the ETag; no like/bookmark lookups
+        self.assertEqual(len(captured.captured_queries), 2)
+        self.assertNotIn("posts_like", captured.captured_queries[1]["sql"])
+        sql = captured.captured_queries[0]["sql"]
+        self.assertNotIn("auth_user", sql)
+        self.assertNotIn("media_url", sql)
+
+    def test_exclude_and_single_flag(self):
+        res = self.client.get(f"/api/posts/{self.post.id}/?exclude=content,is_bookmarked,is_following_author")
+        self.assertNotIn("content", res.data)
+        self.assertIn("author_username", res.data)
+        self.assertFalse(res.data["is_liked"])
+
+    def test_feed_and_comments(self):
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        res = self.client.get("/api/feed/?fields=id,author_username")
+        self.assertEqual(res.data["results"], [{"id": self.post.id, "author_username": "alice"}])
+        with CaptureQueriesContext(connection) as captured:
+            res = self.client.get(f"/api/comments/?post={self.post.id}&fields=id,content")
+        self.assertEqual(list(res.data["results"][0]), ["id", "content"])
+        self.assertNotIn("JOIN", captured.captured_queries[0]["sql"])
+
+    def test_unknown_field(self):
+        self.assertEqual(self.client.get("/api/posts/?fields=id,nope").status_code, 400)
+
+
+class AsyncReadTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        self.posts = [Post.objects.create(author=self.alice, content=f"post {i}") for i in range(12)]
+        Like.objects.create(user=self.bob, post=self.posts[-1])
+        Comment.objects.create(user=self.bob, post=self.posts[0], content="hi")
+        token = str(AccessToken.for_user(self.bob))
+        self.auth = {"Authorization": f"Bearer {token}"}
+        self.sync_client = APIClient()
+        self.sync_client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        # the URLconf an ASGI worker builds (as_view() checks ASYNC_READS at import)
+        with override_settings(ASYNC_READS=True):
+            router = DefaultRouter()
+            router.register(r"posts", PostViewSet, basename="posts")
+            router.register(r"comments", CommentViewSet, basename="comments")
+            router.register(r"feed", FeedViewSet, basename="feed")
+            self.asgi_urls = ModuleType("asgi_urls")
+            self.asgi_urls.urlpatterns = [path("api/", include(router.urls))]
+
+    def aget(self, url, headers=None):
+        with override_settings(ROOT_URLCONF=self.asgi_urls):
+            return async_to_sync(AsyncClient().get)(url, headers=headers)
+
+    def test_read_routes_are_coroutines(self):
+        with override_settings(ROOT_URLCONF=self.asgi_urls):
+            self.assertTrue(iscoroutinefunction(resolve("/api/posts/").func))
+            self.assertTrue(iscoroutinefunction(resolve(f"/api/posts/{self.posts[0].id}/").func))
+        self.assertFalse(iscoroutinefunction(resolve("/api/posts/").func))
+
+    def test_matches_sync_responses(self):
+        post = self.posts[0]
+        for url in ["/api/feed/", "/api/posts/?page=2", f"/api/posts/{post.id}/",
+                    f"/api/comments/?post={post.id}", "/api/posts/?fields=id,is_liked",
+                    "/api/feed/?comments_preview=2", f"/api/posts/{post.id}/?comments_preview=1"]:
+            expected = self.sync_client.get(url)
+            res = self.aget(url, self.auth)
+            self.assertEqual(res.status_code, 200, url)
+            self.assertEqual(res.json(), json.loads(expected.content), url)
+            self.assertEqual(res["ETag"], expected["ETag"], url)
+            # queries from the async ORM's threads still reach Server-Timing
+            self.assertRegex(res["Server-Timing"], r'sql;dur=[\d.]+;desc="[1-9]\d* queries"')
+        feed = self.aget("/api/feed/", self.auth).json()
+        self.assertTrue(feed["results"][0]["is_liked"])
+        self.assertTrue(feed["results"][0]["is_following_author"])
+
+    def test_cursor_conditional_and_cache(self):
+        first = self.aget("/api/feed/", self.auth)
+        second = self.aget(first.json()["next"].replace("http://testserver", ""), self.auth)
+        self.assertEqual([p["id"] for p in second.json()["results"]], [p.id for p in self.posts[:2]][::-1])
+        self.assertEqual(self.aget("/api/feed/", {**self.auth, "If-None-Match": first["ETag"]}).status_code, 304)
+
+        self.assertEqual(self.aget("/api/posts/")["X-Cache"], "MISS")
+        self.assertEqual(self.aget("/api/posts/")["X-Cache"], "HIT")
+        # the sync path reads the same cache entries
+        self.assertEqual(APIClient().get("/api/posts/")["X-Cache"], "HIT")
+
+    def test_errors(self):
+        self.assertEqual(self.aget("/api/feed/").status_code, 401)
+        self.assertEqual(self.aget("/api/posts/999999/").status_code, 404)
+        self.assertEqual(self.aget("/api/posts/?fields=nope").status_code, 400)
+        self.assertEqual(self.aget("/api/posts/?comments_preview=99").status_code, 400)
+        self.assertEqual(self.aget("/api/posts/", {"Authorization": "Bearer junk"}).status_code, 401)
+
+
+@override_settings(
+    DB_ROUTING={"REPLICAS": ["replica"], "STICKY_SECONDS": 5, "ALIAS": "shared"},
+    CACHES={**settings.CACHES, "shared": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(tempfile.gettempdir(), "social-media-api-tests-shared"),
+    }},
+)
+class ReadReplicaRoutingTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        caches["shared"].clear()  # on disk: outlives the previous run
+        self.bob = User.objects.create_user("bob")
+        self.client = APIClient()
+        self.client.force_authenticate(self.bob)
+        self.routed = []
+
+        # record where reads would go, but run them on the test database
+        def db_for_read(router, model, **hints):
+            self.routed.append(dbrouting.current_replica())
+            return None
+
+        patcher = mock.patch.object(dbrouting.ReadReplicaRouter, "db_for_read", db_for_read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_router(self):
+        router = dbrouting.ReadReplicaRouter()
+        self.assertEqual(router.db_for_write(Post), "default")
+        self.assertTrue(router.allow_migrate("default", "posts"))
+        self.assertFalse(router.allow_migrate("replica", "posts"))
+
+    def test_reads_go_to_replica_until_the_viewer_writes(self):
+        self.client.get("/api/posts/")
+        self.assertIn("replica", self.routed)
+
+        res = self.client.post("/api/posts/", {"content": "mine"}, format="json")
+        self.assertEqual(res.status_code, 201)
+        self.assertTrue(dbrouting.is_sticky(self.bob.id))
+        self.routed.clear()
+        self.client.get("/api/feed/")
+        self.assertNotIn("replica", self.routed)
+
+        # other viewers keep reading from the replica
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user("carol"))
+        self.routed.clear()
+        other.get("/api/feed/")
+        self.assertIn("replica", self.routed)
+
+    def test_process_local_sticky_cache_fails_loudly(self):
+        self.assertEqual(dbrouting.check_sticky_cache(), [])
+        with self.settings(DB_ROUTING={"REPLICAS": ["replica"], "ALIAS": "default"}):
+            self.assertEqual([e.id for e in dbrouting.check_sticky_cache()], ["posts.E001"])
+            with self.assertRaises(ImproperlyConfigured):
+                dbrouting.ReadYourWritesMiddleware(lambda request: None)
+        with self.settings(DB_ROUTING={"REPLICAS": [], "ALIAS": "default"}):
+            self.assertEqual(dbrouting.check_sticky_cache(), [])
+
+    def test_shared_cache_fills_read_the_primary(self):
+        self.routed.clear()
+        res = APIClient().get("/api/posts/")
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertNotIn("replica", self.routed)
+
+
+class SQLiteSetupTests(TestCase):
+    def test_pragmas_applied_on_connect(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA cache_size")
+            self.assertEqual(cursor.fetchone()[0], -64 * 1024)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_copy_database(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            primary, replica = os.path.join(tmp, "primary.db"), os.path.join(tmp, "replica.db")
+            conn = sqlite3.connect(primary)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE t (x)")
+            conn.execute("INSERT INTO t VALUES (1)")
+            conn.commit()
+            dbrouting.copy_database(primary, replica)
+            conn.execute("INSERT INTO t VALUES (2)")
+            conn.commit()
+            conn.close()
+            copy = sqlite3.connect(replica)
+            self.assertEqual(copy.execute("SELECT count(*) FROM t").fetchone()[0], 1)  # lagging copy
+            copy.close()
@@ -0,0 +1,171 @@
+# posts/timeline.py
+"""
+Fan-out-on-write home timelines.
+
+- New post: one TimelineEntry per follower (+ the author), unless the author has more
+  than FEED_FANOUT_MAX_FOLLOWERS followers; those authors are marked HighFanoutAuthor
+  and merged into feeds at read time.
+- Post delete: entries go away through the FK cascade.
+- Follow: the followed author's most recent FEED_FOLLOW_BACKFILL posts are copied in.
+- Unfollow: the author's entries are removed from the follower's timeline.
+
+Entries also carry the reader's affinity for the post's author; ?rank=top orders the
+reader's entries by post score x affinity, i.e. rank_score + log2(affinity) since
+scores are stored as logarithms (see posts/ranking.py).
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Log
+
+from . import ranking
+from .followgraph import get_graph
+from .models import Post, Follow, TimelineEntry, HighFanoutAuthor, AuthorAffinity
+
+BATCH_SIZE = 1000
+# feed orderings accepted by feed_queryset(rank=...)
+RANKS = ("latest", "top")
+
+
+def fanout_max_followers():
+    return getattr(settings, "FEED_FANOUT_MAX_FOLLOWERS", 10_000)
+
+
+def follow_backfill_limit():
+    return getattr(settings, "FEED_FOLLOW_BACKFILL", 200)
+
+
+def _entry(user_id, post, affinity=1.0):
+    return TimelineEntry(
+        user_id=user_id, post_id=post.pk, author_id=post.author_id, created_at=post.created_at,
+        affinity=affinity,
+    )
+
+
+def is_high_fanout(author_id):
+    if HighFanoutAuthor.objects.filter(user_id=author_id).exists():
+        return True
+    limit = fanout_max_followers()
+    # only need to know whether there are more than `limit` followers
+    over = Follow.objects.filter(following_id=author_id).order_by()[limit:limit + 1].exists()
+    if over:
+        HighFanoutAuthor.objects.get_or_create(user_id=author_id)
+    return over
+
+
+def fan_out(post):
+    """Write `post` into its author's timeline and (if not high-fanout) every follower's."""
+    entries = [_entry(post.author_id, post)]
+    if not is_high_fanout(post.author_id):
+        follower_ids = Follow.objects.filter(following_id=post.author_id).values_list("follower_id", flat=True)
+        affinity = ranking.affinities_for(post.author_id)
+        entries.extend(
+            _entry(uid, post, affinity.get(uid, 1.0)) for uid in follower_ids.iterator(chunk_size=BATCH_SIZE)
+        )
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def _author_posts(author_id, limit=None):
+    posts = Post.objects.filter(author_id=author_id).only("id", "author_id", "created_at").order_by("-created_at")
+    return posts[:limit] if limit else posts.iterator(chunk_size=BATCH_SIZE)
+
+
+def on_follow(follower_id, author_id, limit=None):
+    """Copy the newly followed author's recent posts into the follower's timeline."""
+    if HighFanoutAuthor.objects.filter(user_id=author_id).exists():
+        return  # merged at read time
+    affinity = ranking.affinities_for(author_id, [follower_id]).get(follower_id, 1.0)
+    entries = [_entry(follower_id, p, affinity) for p in _author_posts(author_id, limit or follow_backfill_limit())]
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def on_unfollow(follower_id, author_id):
+    TimelineEntry.objects.filter(user_id=follower_id, author_id=author_id).delete()
+
+
+def feed_queryset(user, rank=None):
+    """
+    Posts for `user`'s home feed, newest first.
+    Reads the pre-sorted timeline and ORs in followed high-fanout authors, if any.
+    Rows are annotated with the columns to page by: `entry_at` / `entry_id`
+    (FEED_ORDERING), or `rank` / `rank_id` with rank="top" (RANK_ORDERING).
+    """
+    graph = get_graph()
+    return _feed_queryset(user, graph.following(user.pk), graph.high_fanout_authors(), rank)
+
+
+async def afeed_queryset(user, rank=None):
+    """feed_queryset for async views: the follow-graph lookups go through the async ORM."""
+    graph = get_graph()
+    return _feed_queryset(user, await graph.afollowing(user.pk), await graph.ahigh_fanout_authors(), rank)
+
+
+# cursor orderings for rank="latest" / rank="top" feeds
+FEED_ORDERING = ("entry_at", "entry_id")
+RANK_ORDERING = ("rank", "rank_id")
+
+
+def _feed_queryset(user, following, high_fanout, rank=None):
+    high_fanout_ids = [uid for uid in high_fanout if uid in following]
+    top = rank == "top"
+    if not high_fanout_ids:
+        qs = Post.objects.filter(timeline_entries__user=user)
+        if top:
+            # same join as the filter; the score is read from the post, so engagement
+            # only ever updates one row
+            return qs.annotate(rank=F("rank_score") + Log(Value(2.0), F("timeline_entries__affinity")),
+                               rank_id=F("timeline_entries__post_id"))
+        # page on the entry's columns so the (user, -created_at, -post) index serves the order
+        return qs.annotate(entry_at=F("timeline_entries__created_at"), entry_id=F("timeline_entries__post_id"))
+    timeline_post_ids = TimelineEntry.objects.filter(user=user).values("post_id")
+    qs = Post.objects.filter(Q(pk__in=timeline_post_ids) | Q(author_id__in=high_fanout_ids))
+    if top:
+        # high-fanout posts have no entry: take the affinity from AuthorAffinity
+        entry_affinity = TimelineEntry.objects.filter(user=user, post=OuterRef("pk")).values("affinity")[:1]
+        affinity = AuthorAffinity.objects.filter(user=user, author=OuterRef("author_id")).values("score")[:1]
+        qs = qs.annotate(
+            rank=F("rank_score") + Log(Value(2.0), Coalesce(Subquery(entry_affinity), Subquery(affinity), Value(1.0),
+                                                            output_field=FloatField())),
+            rank_id=F("id"),
+        )
+    else:
+        # high-fanout posts have no entry to page on
+        qs = qs.annotate(entry_at=F("created_at"), entry_id=F("id"))
+    return qs
+
+
+def backfill(user_ids=None, per_author=None):
+    """
+    Rebuild timeline entries from the current follow graph (idempotent).
+    Works author by author: each author's posts (all of them, or the newest
+    `per_author`) go to the author and, unless high-fanout, to every follower.
+    With `user_ids`, only those readers' timelines are filled, from the authors they
+    follow (and their own posts) rather than every author. One transaction per
+    author. Yields author ids as they are done.
+    """
+    wanted = set(user_ids) if user_ids else None
+    if wanted is None:
+        authors = Post.objects.order_by().values_list("author_id", flat=True).distinct().iterator()
+    else:
+        followed = Follow.objects.filter(follower_id__in=wanted).values_list("following_id", flat=True)
+        authors = sorted(wanted.union(followed))
+
+    for author_id in authors:
+        readers = [author_id]
+        if not is_high_fanout(author_id):
+            followers = Follow.objects.filter(following_id=author_id)
+            if wanted is not None:
+                followers = followers.filter(follower_id__in=wanted)
+            readers += followers.values_list("follower_id", flat=True)
+        if wanted is not None:
+            readers = [uid for uid in readers if uid in wanted]
+        if readers:
+            posts = list(_author_posts(author_id, per_author))
+            affinity = ranking.affinities_for(author_id)
+            entries = (_entry(uid, p, affinity.get(uid, 1.0)) for uid in readers for p in posts)
+            with transaction.atomic():
+                while chunk := list(islice(entries, BATCH_SIZE)):
+                    TimelineEntry.objects.bulk_create(chunk, ignore_conflicts=True)
+        yield author_id
@@ -0,0 +1,365 @@
+# posts/trending.py
+"""
+Trending posts and hashtags over sliding windows, in bounded memory.
+
+Likes, comments and bookmarks (and, for hashtags, new posts) are streamed into a
+per-process TrendingEngine as they are written. For each window (1h, 24h, ...):
+
+- a ring of count-min sketches, one per time bucket, plus their running sum, gives
+  the window count of any key in O(DEPTH) with a fixed WIDTH x DEPTH table per
+  bucket. The estimate never undercounts and overcounts by at most
+  e / WIDTH x (window total) with probability 1 - e^-DEPTH. When a bucket ages out
+  its sketch is subtracted from the sum and recycled.
+- a heavy-hitter table keeps the TOP_K x 2 keys with the highest estimates, so
+  /api/trending/... reads a small dict instead of aggregating anything.
+
+Removals (unlike, deleted comment) are not subtracted: trending is engagement
+activity in the window. Hashtags are the #words in the post's content (posts/tags.py).
+
+Each process warms itself from the database (the longest window of events) at
+startup -- wsgi.py / asgi.py call warm(), which replays in a background thread, so
+no request waits on it. A process only sees the writes it serves; with several
+workers set RESYNC_SECONDS so each rebuilds from the database periodically (also in
+the background). While a rebuild runs, new events are recorded into both the live
+windows and the ones being built, which replay the database only up to the
+rebuild's start: nothing recorded meanwhile is lost at the swap.
+"""
+import heapq
+import logging
+import random
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections
+from django.dispatch import receiver
+
+from .tags import hashtags
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "ENABLED": True,
+    "WIDTH": 2048,            # counters per sketch row
+    "DEPTH": 4,               # sketch rows (independent hashes)
+    "TOP_K": 50,              # largest ?limit=; 2x this many candidates are tracked
+    "WINDOWS": {"1h": (3600, 12), "24h": (86400, 24)},  # name -> (seconds, buckets)
+    "WEIGHTS": {"post": 1, "like": 1, "comment": 2, "bookmark": 2},
+    "WARM": True,             # replay the longest window from the database at startup (warm())
+    "RESYNC_SECONDS": None,   # rebuild from the database this often (multi-worker)
+    "TAG_CACHE_SIZE": 10_000, # post id -> hashtags, saves a query per engagement event
+}
+KINDS = ("posts", "tags")
+_PRIME = (1 << 61) - 1
+
+
+def config():
+    cfg = {**DEFAULTS, **getattr(settings, "TRENDING", {})}
+    cfg["WEIGHTS"] = {**DEFAULTS["WEIGHTS"], **cfg["WEIGHTS"]}
+    return cfg
+
+
+# -------- count-min sketch --------
+class Hashes:
+    """DEPTH independent hash functions onto [0, WIDTH), shared by all sketches of a window."""
+
+    def __init__(self, width, depth, seed=0):
+        rng = random.Random(seed)
+        self.width, self.depth = width, depth
+        self._ab = [(rng.randrange(1, _PRIME), rng.randrange(_PRIME), row * width) for row in range(depth)]
+
+    def cells(self, key):
+        h = hash(key)
+        return [offset + (a * h + b) % _PRIME % self.width for a, b, offset in self._ab]
+
+
+class CountMinSketch:
+    def __init__(self, width, depth):
+        self.table = array("q", bytes(8 * width * depth))
+
+    def add(self, cells, n=1):
+        table = self.table
+        for cell in cells:
+            table[cell] += n
+
+    def estimate(self, cells):
+        table = self.table
+        return min(table[cell] for cell in cells)
+
+    def subtract(self, other):
+        table = self.table
+        for i, value in enumerate(other.table):
+            if value:
+                table[i] -= value
+
+    def clear(self):
+        self.table = array("q", bytes(len(self.table) * 8))
+
+    @property
+    def nbytes(self):
+        return self.table.itemsize * len(self.table)
+
+
+class SlidingWindow:
+    """Approximate per-key counts over the last `seconds`, in `buckets` steps, plus the top keys."""
+
+    def __init__(self, seconds, buckets, width, depth, top_k, hashes=None):
+        self.span = seconds / buckets
+        self.buckets = buckets
+        self.width, self.depth = width, depth
+        self.capacity = 2 * top_k
+        self.hashes = hashes or Hashes(width, depth)
+        self.total = CountMinSketch(width, depth)
+        self._ring = {}      # bucket index -> sketch
+        self._spare = []     # recycled sketches
+        self._current = None
+        self.heavy = {}      # key -> estimated window count
+        self._floor = 0      # smallest tracked estimate once full
+
+    def _index(self, when):
+        return int(when // self.span)
+
+    def advance(self, now):
+        """Expire buckets that slid out of the window ending at `now`."""
+        current = self._index(now)
+        if self._current is not None and current <= self._current:
+            return
+        self._current = current
+        expired = [i for i in self._ring if i <= current - self.buckets]
+        if not expired:
+            return
+        for i in expired:
+            sketch = self._ring.pop(i)
+            self.total.subtract(sketch)
+            sketch.clear()
+            self._spare.append(sketch)
+        self.heavy = {key: est for key in self.heavy if (est := self.total.estimate(self.hashes.cells(key))) > 0}
+        self._floor = min(self.heavy.values()) if len(self.heavy) >= self.capacity else 0
+
+    def add(self, key, n, when, cells=None):
+        self.advance(when)
+        index = self._index(when)
+        if index <= self._current - self.buckets:
+            return  # older than the window
+        sketch = self._ring.get(index)
+        if sketch is None:
+            sketch = self._ring[index] = self._spare.pop() if self._spare else CountMinSketch(self.width, self.depth)
+        cells = cells or self.hashes.cells(key)
+        sketch.add(cells, n)
+        self.total.add(cells, n)
+        estimate = self.total.estimate(cells)
+        heavy = self.heavy
+        if key in heavy or len(heavy) < self.capacity:
+            heavy[key] = estimate
+        elif estimate > self._floor:
+            heavy.pop(min(heavy, key=heavy.get))
+            heavy[key] = estimate
+            self._floor = min(heavy.values())
+
+    def estimate(self, key):
+        return self.total.estimate(self.hashes.cells(key))
+
+    def top(self, limit, now):
+        self.advance(now)
+        return heapq.nlargest(limit, self.heavy.items(), key=lambda item: item[1])
+
+    @property
+    def nbytes(self):
+        sketches = 1 + len(self._ring) + len(self._spare)
+        return sketches * self.total.nbytes
+
+
+# -------- engine --------
+class TrendingEngine:
+    def __init__(self, cfg=None):
+        self.config = cfg or config()
+        self._lock = threading.Lock()
+        self.windows = self._windows()
+        self._tags = OrderedDict()  # post id -> hashtags (LRU)
+        self.started_at = time.time()
+        self.synced_at = None
+        # windows a running sync() is building, and the time its replay stops at
+        self._building = None
+        self._cutoff = None
+
+    def _windows(self):
+        cfg = self.config
+        hashes = Hashes(cfg["WIDTH"], cfg["DEPTH"])
+        return {
+            kind: {
+                name: SlidingWindow(seconds, buckets, cfg["WIDTH"], cfg["DEPTH"], cfg["TOP_K"], hashes)
+                for name, (seconds, buckets) in cfg["WINDOWS"].items()
+            }
+            for kind in KINDS
+        }
+
+    # -------- hashtags per post --------
+    def note_post(self, post_id, content):
+        with self._lock:
+            self._remember(post_id, hashtags(content))
+
+    def forget_post(self, post_id):
+        with self._lock:
+            self._tags.pop(post_id, None)
+
+    def _remember(self, post_id, tags):
+        self._tags[post_id] = tags
+        self._tags.move_to_end(post_id)
+        while len(self._tags) > self.config["TAG_CACHE_SIZE"]:
+            self._tags.popitem(last=False)
+
+    def tags_for(self, post_ids):
+        from .models import Post
+
+        with self._lock:
+            found = {pid: self._tags[pid] for pid in post_ids if pid in self._tags}
+        missing = [pid for pid in post_ids if pid not in found]
+        for i in range(0, len(missing), 500):
+            rows = Post.objects.filter(pk__in=missing[i:i + 500]).values_list("pk", "content")
+            loaded = {pid: hashtags(text) for pid, text in rows}
+            with self._lock:
+                for pid, tags in loaded.items():
+                    self._remember(pid, tags)
+            found.update(loaded)
+        return found
+
+    # -------- events --------
+    def record(self, kind, post_ids, n=1, when=None):
+        """`n` events of `kind` ("post", "like", "comment", "bookmark") on each post."""
+        post_ids = list(post_ids)
+        if not post_ids:
+            return
+        weight = self.config["WEIGHTS"][kind] * n
+        when = when.timestamp() if when is not None else time.time()
+        tags = self.tags_for(post_ids)
+        with self._lock:
+            self._add(self.windows, kind, post_ids, tags, weight, when)
+            if self._building is not None and when >= self._cutoff:
+                self._add(self._building, kind, post_ids, tags, weight, when)
+
+    @staticmethod
+    def _add(windows, kind, post_ids, tags, weight, when):
+        for pid in post_ids:
+            if kind != "post":  # a new post is not engagement, but its hashtags are in use
+                for window in windows["posts"].values():
+                    window.add(pid, weight, when)
+            for tag in tags.get(pid, ()):
+                for window in windows["tags"].values():
+                    window.add(tag, weight, when)
+
+    # -------- reads --------
+    def top(self, kind, window, limit):
+        """[(post id or hashtag, estimated weighted count)], highest first."""
+        self._maybe_sync()
+        with self._lock:
+            return self.windows[kind][window].top(limit, time.time())
+
+    def _maybe_sync(self):
+        resync = self.config["RESYNC_SECONDS"]
+        if resync and time.time() - (self.synced_at or self.started_at) > resync:
+            self.sync_in_background()
+
+    def sync_in_background(self):
+        """Run sync() on a daemon thread unless one is already running."""
+        if self._building is not None:
+            return
+
+        def run():
+            try:
+                self.sync()
+            except Exception:
+                logger.exception("trending sync failed")
+            finally:
+                close_old_connections()
+
+        threading.Thread(target=run, name="trending-sync", daemon=True).start()
+
+    def sync(self):
+        """
+        Rebuild every window from the events stored in the database, then swap it in.
+        Events recorded meanwhile go into both sets of windows; the replay stops where
+        they start.
+        """
+        from .models import Post, Like, Comment, Bookmark
+
+        windows = self._windows()
+        with self._lock:
+            if self._building is not None:
+                return  # one rebuild at a time; readers keep the current windows
+            self._building, self._cutoff = windows, time.time()
+        try:
+            longest = max(seconds for seconds, _ in self.config["WINDOWS"].values())
+            span = {
+                "created_at__gte": datetime.fromtimestamp(self._cutoff - longest, dt_timezone.utc),
+                "created_at__lt": datetime.fromtimestamp(self._cutoff, dt_timezone.utc),
+            }
+            weights = self.config["WEIGHTS"]
+            tags = {}
+            posts = Post.objects.filter(**span).values_list("pk", "content", "created_at")
+            for pid, content, created_at in posts.iterator(chunk_size=2000):
+                tags[pid] = hashtags(content)
+                with self._lock:
+                    self._add(windows, "post", [pid], tags, weights["post"], created_at.timestamp())
+            for kind, model in (("like", Like), ("comment", Comment), ("bookmark", Bookmark)):
+                events = model.objects.filter(**span).values_list("post_id", "created_at")
+                pending = [(pid, created_at.timestamp()) for pid, created_at in events.iterator(chunk_size=2000)]
+                tags.update(self.tags_for(list({pid for pid, _ in pending if pid not in tags})))
+                with self._lock:
+                    for pid, when in pending:
+                        self._add(windows, kind, [pid], tags, weights[kind], when)
+            with self._lock:
+                self.windows = windows
+                for pid, post_tags in tags.items():
+                    self._remember(pid, post_tags)
+            self.synced_at = time.time()
+        finally:
+            with self._lock:
+                self._building = self._cutoff = None
+
+    def nbytes(self):
+        return sum(window.nbytes for by_name in self.windows.values() for window in by_name.values())
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The process-wide engine, or None when TRENDING["ENABLED"] is off."""
+    global _engine
+    cfg = config()
+    if not cfg["ENABLED"]:
+        return None
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = TrendingEngine(cfg)
+    return _engine
+
+
+def warm():
+    """Replay the database into this process's engine in the background (process startup)."""
+    engine = get_engine()
+    if engine is not None and engine.config["WARM"]:
+        engine.sync_in_background()
+
+
+def record(kind, post_ids, n=1, when=None):
+    engine = get_engine()
+    if engine is not None:
+        engine.record(kind, post_ids, n, when)
+
+
+def reset():
+    global _engine
+    _engine = None
+
+
+@receiver(setting_changed)
+def _reset_engine(setting, **kwargs):
+    if setting == "TRENDING":
+        reset()
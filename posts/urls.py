@@ -8,10 +8,15 @@ from posts.views import (
     CommentViewSet,
     FollowViewSet,
     FeedViewSet,
+    TrendingViewSet,
+    ExportViewSet,
+    TagViewSet,
+    MediaViewSet,
 )
 
+from users.views import ThrottledTokenObtainPairView, UserViewSet
+
 from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
     TokenRefreshView,
 )
 
@@ -24,13 +29,18 @@ router.register(r"posts", PostViewSet, basename="posts")          # /api/posts/.
 router.register(r"comments", CommentViewSet, basename="comments") # /api/comments/...
 router.register(r"follow", FollowViewSet, basename="follow")      # /api/follow/...
 router.register(r"feed", FeedViewSet, basename="feed")            # /api/feed/ (list-only)
+router.register(r"trending", TrendingViewSet, basename="trending") # /api/trending/posts|tags/
+router.register(r"users", UserViewSet, basename="users")          # /api/users/<id>/followers|following/
+router.register(r"tags", TagViewSet, basename="tags")              # /api/tags/<name>/posts/
+router.register(r"export", ExportViewSet, basename="export")      # /api/export/ (NDJSON stream)
+router.register(r"media", MediaViewSet, basename="media")          # /api/media/ (image uploads)
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include(router.urls)),
 
     # JWT auth
-    path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
+    path("api/token/", ThrottledTokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
 ]
 
@@ -0,0 +1,104 @@
+# posts/viewer.py
+"""
+Per-viewer flags (is_liked / is_bookmarked / is_following_author) resolved for a
+whole page of posts at once, so serializing N posts costs a constant number of queries.
+"""
+import asyncio
+
+from . import likebuffer
+from .followgraph import get_graph
+from .models import Like, Bookmark
+
+
+FLAGS = {
+    "is_liked": "liked",
+    "is_bookmarked": "bookmarked",
+    "is_following_author": "following",
+}
+
+
+class ViewerState:
+    """Sets of ids the current viewer has liked / bookmarked / follows, scoped to a page."""
+
+    __slots__ = ("post_ids", "liked", "bookmarked", "following")
+
+    def __init__(self, post_ids=(), liked=(), bookmarked=(), following=()):
+        self.post_ids = frozenset(post_ids)
+        self.liked = frozenset(liked)
+        self.bookmarked = frozenset(bookmarked)
+        self.following = frozenset(following)
+
+    def covers(self, post):
+        return post.pk in self.post_ids
+
+    @classmethod
+    def for_posts(cls, user, posts, flags=None):
+        """
+        One query per flag for the whole page: likes/bookmarks by post id;
+        followed authors come from the cached follow graph.
+        `flags` limits the work to some of FLAGS' serializer field names.
+        """
+        post_ids = [p.pk for p in posts]
+        if not post_ids or user is None or not user.is_authenticated:
+            return cls(post_ids)
+
+        wanted = cls._wanted(flags)
+        liked = bookmarked = following = ()
+        if "liked" in wanted:
+            liked = cls._ids(Like, user, post_ids)
+        if "bookmarked" in wanted:
+            bookmarked = cls._ids(Bookmark, user, post_ids)
+        author_ids = cls._author_ids(user, posts, wanted)
+        if author_ids:
+            followed = get_graph().following(user.pk)
+            following = [a for a in author_ids if a in followed]
+        return cls(post_ids, cls._with_pending(user, liked, wanted), bookmarked, following)
+
+    @classmethod
+    async def afor_posts(cls, user, posts, flags=None):
+        """for_posts for async views: the lookups run concurrently on the async ORM."""
+        post_ids = [p.pk for p in posts]
+        if not post_ids or user is None or not user.is_authenticated:
+            return cls(post_ids)
+
+        wanted = cls._wanted(flags)
+        author_ids = cls._author_ids(user, posts, wanted)
+
+        async def ids(model, flag):
+            if flag not in wanted:
+                return ()
+            return [pid async for pid in cls._ids(model, user, post_ids)]
+
+        async def followed():
+            if not author_ids:
+                return ()
+            graph = await get_graph().afollowing(user.pk)
+            return [a for a in author_ids if a in graph]
+
+        liked, bookmarked, following = await asyncio.gather(
+            ids(Like, "liked"), ids(Bookmark, "bookmarked"), followed()
+        )
+        return cls(post_ids, cls._with_pending(user, liked, wanted), bookmarked, following)
+
+    @staticmethod
+    def _wanted(flags):
+        return set(FLAGS.values()) if flags is None else {FLAGS[f] for f in flags if f in FLAGS}
+
+    @staticmethod
+    def _ids(model, user, post_ids):
+        return model.objects.filter(user=user, post_id__in=post_ids).values_list("post_id", flat=True)
+
+    @staticmethod
+    def _author_ids(user, posts, wanted):
+        return {p.author_id for p in posts} - {user.pk} if "following" in wanted else ()
+
+    @staticmethod
+    def _with_pending(user, liked, wanted):
+        # buffered (not yet written) like/unlike intents win over the table
+        buffer = likebuffer.get_buffer()
+        if buffer is not None and "liked" in wanted:
+            pending = buffer.pending_for_user(user.pk)
+            if pending:
+                liked = {pid for pid in liked if pending.get(pid, True)}
+                liked |= {pid for pid, state in pending.items() if state}
+        return liked
@@ -1,15 +1,32 @@
 # posts/views.py
-from django.db.models import Q
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, F, Window
+from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, mixins, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 
-from .models import Post, Follow, Like, Comment, Bookmark
+from . import engagement, export, imaging, likebuffer, media, search, tags, timeline, trending
+from .asyncviews import AsyncPostReadMixin, AsyncReadMixin
+from .dbrouting import ReplicaReadMixin
+from .conditional import ConditionalGetMixin, PostConditionalGetMixin
+from .instrumentation import TimedViewMixin
+from .previews import CommentsPreviewViewMixin
+from .ratelimit import TokenBucketThrottle
+from .responsecache import ResponseCacheMixin
+from .sparse import SparseFieldsViewMixin
+from .models import Post, Follow, Like, Comment, Bookmark, Tag, MediaAsset
 from .serializers import (
     PostSerializer,
     FollowSerializer,
     LikeSerializer,
     CommentSerializer,
+    EngagementBatchSerializer,
+    TagSerializer,
+    MediaAssetSerializer,
 )
 
 
@@ -22,27 +39,68 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         return owner == request.user
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class SearchMixin:
+    """
+    ?q= full-text search (posts/search.py). Ranked results page by score
+    instead of (created_at, id).
+    """
+
+    def search(self, qs):
+        q = self.request.query_params.get("q")
+        if not q:
+            return qs
+        if search.is_available():
+            self.cursor_ordering = search.CURSOR_ORDERING
+        return search.apply(qs, q)
+
+
+class PostViewSet(ReplicaReadMixin, AsyncPostReadMixin, TimedViewMixin, ResponseCacheMixin, CommentsPreviewViewMixin,
+                  PostConditionalGetMixin, SearchMixin, SparseFieldsViewMixin, viewsets.ModelViewSet):
     """
     CRUD for posts.
     - Auth required to create/update/delete.
     - Only the author can update/delete.
     - Filtering: ?author=<user_id>
-    - Search: ?q=keyword (in content)
+    - Search: ?q=words, prefix*, "a phrase" (full-text, ranked)
+    - Pagination: ?cursor=<opaque> (default) or ?page=<n>
+    - Conditional GET: ETag (+ Last-Modified on details), 304 on If-None-Match / If-Modified-Since
+    - Anonymous reads are served from the shared response cache
+    - Sparse fieldsets: ?fields=id,content,created_at or ?exclude=is_liked,...
+    - ?comments_preview=N embeds each post's N newest comments (one query per page)
+    - list/retrieve are async-native under ASGI (posts/asyncviews.py)
+    - Reads go to a read replica when configured (posts/dbrouting.py)
+    - like/unlike/bookmark/unbookmark/batch are rate-limited per user (429 + Retry-After)
     """
-    queryset = Post.objects.select_related("author").all()
+    queryset = Post.objects.select_related("author", "media").all()
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    # token buckets per user (posts/ratelimit.py); other actions aren't limited
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scopes = {
+        "like": "engagement",
+        "unlike": "engagement",
+        "bookmark": "engagement",
+        "unbookmark": "engagement",
+        "batch": "batch",
+    }
+    # followed likers named in ?summary=1
+    LIKERS_SAMPLE = 3
+
+    def get_cache_tags(self):
+        if self.kwargs.get("pk"):
+            return [f"post:{self.kwargs['pk']}"]
+        return ["posts"]
+
+    def get_row_cache_tags(self, rows):
+        # a page moves with its posts' counters; a detail's key already has its tag
+        return [] if self.kwargs.get("pk") else [f"post:{row.pk}" for row in rows]
 
     def get_queryset(self):
         qs = super().get_queryset()
         author = self.request.query_params.get("author")
-        q = self.request.query_params.get("q")
         if author:
             qs = qs.filter(author_id=author)
-        if q:
-            qs = qs.filter(Q(content__icontains=q))
-        return qs
+        return self.search(self.sparse_queryset(qs))
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -53,8 +111,14 @@ class PostViewSet(viewsets.ModelViewSet):
         """
         POST /api/posts/{id}/like/
         Idempotent: 201 on first like, 200 if already liked.
+        With LIKE_WRITE_BEHIND enabled the like is buffered and written in a batch.
         """
         post = self.get_object()
+        buffer = likebuffer.get_buffer()
+        if buffer is not None:
+            if buffer.submit(request.user.id, post.id, liked=True):
+                return Response({"detail": "liked"}, status=status.HTTP_201_CREATED)
+            return Response({"detail": "already liked"}, status=status.HTTP_200_OK)
         obj, created = Like.objects.get_or_create(user=request.user, post=post)
         if created:
             return Response(LikeSerializer(obj).data, status=status.HTTP_201_CREATED)
@@ -66,7 +130,11 @@ class PostViewSet(viewsets.ModelViewSet):
         DELETE /api/posts/{id}/unlike/
         """
         post = self.get_object()
-        deleted, _ = Like.objects.filter(user=request.user, post=post).delete()
+        buffer = likebuffer.get_buffer()
+        if buffer is not None:
+            deleted = buffer.submit(request.user.id, post.id, liked=False)
+        else:
+            deleted, _ = Like.objects.filter(user=request.user, post=post).delete()
         if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response({"detail": "not liked"}, status=status.HTTP_404_NOT_FOUND)
@@ -74,11 +142,41 @@ class PostViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=["get"], permission_classes=[permissions.IsAuthenticated])
     def likes(self, request, pk=None):
         """
-        GET /api/posts/{id}/likes/
+        GET /api/posts/{id}/likes/  -> who liked it, newest first (cursor-paginated)
+        GET /api/posts/{id}/likes/?summary=1
+            -> {"count", "followed_count", "followed_sample": [...]}: "liked by N people you follow"
+        Rows are plain dicts (user_id, username, created_at) read with values(),
+        paged over the (post, -created_at) index.
         """
         post = self.get_object()
-        qs = Like.objects.filter(post=post).select_related("user")
-        return Response(LikeSerializer(qs, many=True).data)
+        if request.query_params.get("summary") in ("1", "true"):
+            return Response(self._likes_summary(post, request.user))
+
+        qs = Like.objects.filter(post=post).values("id", "user_id", "created_at", username=F("user__username"))
+        self.cursor_ordering = ("created_at", "id")
+        page = self.paginate_queryset(qs)
+        rows = [
+            {"user_id": row["user_id"], "username": row["username"], "created_at": row["created_at"]}
+            for row in (page if page is not None else qs)
+        ]
+        if page is not None:
+            return self.get_paginated_response(rows)
+        return Response(rows)
+
+    def _likes_summary(self, post, user):
+        # one query: the newest followed likers, with how many there are in total
+        followed = (
+            Like.objects.filter(post=post, user_id__in=Follow.objects.filter(follower=user).values("following_id"))
+            .annotate(total=Window(Count("id")))
+            .order_by("-created_at", "-id")
+            .values("user_id", "total", username=F("user__username"))[:self.LIKERS_SAMPLE]
+        )
+        rows = list(followed)
+        return {
+            "count": post.likes_count,
+            "followed_count": rows[0]["total"] if rows else 0,
+            "followed_sample": [{"user_id": row["user_id"], "username": row["username"]} for row in rows],
+        }
 
     # -------- Bookmarks --------
     @action(detail=True, methods=["post"], permission_classes=[permissions.IsAuthenticated])
@@ -103,6 +201,20 @@ class PostViewSet(viewsets.ModelViewSet):
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response({"detail": "not bookmarked"}, status=status.HTTP_404_NOT_FOUND)
 
+    # -------- Batch --------
+    @action(detail=False, methods=["post"], permission_classes=[permissions.IsAuthenticated])
+    def batch(self, request):
+        """
+        POST /api/posts/batch/
+        {"operations": [{"action": "like|unlike|bookmark|unbookmark", "post_id": 1}, ...]}
+        Applied in order in one transaction; each result carries the status the
+        single-post endpoint would have returned (201/200/204/404).
+        """
+        ser = EngagementBatchSerializer(data=request.data)
+        ser.is_valid(raise_exception=True)
+        results = engagement.apply_batch(request.user, ser.validated_data["operations"])
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=["get"], permission_classes=[permissions.IsAuthenticated])
     def bookmarks(self, request):
         """
@@ -110,9 +222,13 @@ class PostViewSet(viewsets.ModelViewSet):
         """
         qs = (
             Post.objects.filter(bookmarks__user=request.user)
-            .select_related("author")
-            .order_by("-bookmarks__created_at")
+            .select_related("author", "media")
+            .annotate(bookmarked_at=F("bookmarks__created_at"), bookmark_id=F("bookmarks__id"))
+            .order_by("-bookmarked_at", "-bookmark_id")
         )
+        qs = self.sparse_queryset(qs)
+        # keyset over the bookmark row, not the post
+        self.cursor_ordering = ("bookmarked_at", "bookmark_id")
         page = self.paginate_queryset(qs)
         if page is not None:
             ser = self.get_serializer(page, many=True)
@@ -121,31 +237,44 @@ class PostViewSet(viewsets.ModelViewSet):
         return Response(ser.data)
 
 
-class CommentViewSet(viewsets.GenericViewSet,
+class CommentViewSet(ReplicaReadMixin,
+                     AsyncReadMixin,
+                     TimedViewMixin,
+                     ResponseCacheMixin,
+                     ConditionalGetMixin,
+                     SearchMixin,
+                     SparseFieldsViewMixin,
+                     viewsets.GenericViewSet,
                      mixins.CreateModelMixin,
                      mixins.UpdateModelMixin,
                      mixins.DestroyModelMixin,
                      mixins.ListModelMixin):
 
-    queryset = Comment.objects.select_related("user", "post").all()
+    # serialized with the post id only: no need to join the post (and read its body)
+    queryset = Comment.objects.select_related("user").all()
     serializer_class = CommentSerializer
+    etag_fields = ("id", "user_id", "post_id", "updated_at")
     permission_classes = [permissions.IsAuthenticatedOrReadOnly, IsOwnerOrReadOnly]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scopes = {"create": "comment"}
+
+    def get_cache_tags(self):
+        post_id = self.request.query_params.get("post")
+        return [f"comments:post:{post_id}"] if post_id else ["comments"]
 
     def get_queryset(self):
         qs = super().get_queryset()
         post_id = self.request.query_params.get("post")
         if post_id:
             qs = qs.filter(post_id=post_id)
-        q = self.request.query_params.get("q")
-        if q:
-            qs = qs.filter(content__icontains=q)
-        return qs
+        return self.search(self.sparse_queryset(qs))
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
-class FollowViewSet(mixins.CreateModelMixin,
+class FollowViewSet(TimedViewMixin,
+                    mixins.CreateModelMixin,
                     mixins.DestroyModelMixin,
                     viewsets.GenericViewSet):
     """
@@ -163,22 +292,176 @@ class FollowViewSet(mixins.CreateModelMixin,
         serializer.save(follower=self.request.user)
 
 
-class FeedViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
-
+class FeedViewSet(ReplicaReadMixin, AsyncPostReadMixin, TimedViewMixin, CommentsPreviewViewMixin, PostConditionalGetMixin,
+                  SearchMixin, SparseFieldsViewMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    GET /api/feed/  -> posts from people I follow + my own, newest first.
+    GET /api/feed/?rank=top  -> same posts, highest time-decayed engagement first
+    (see posts/ranking.py).
+    ?comments_preview=N embeds each post's N newest comments (posts/previews.py).
+    Served from the fan-out timeline table (see posts/timeline.py).
+    """
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        following_ids = Follow.objects.filter(
-            follower=self.request.user
-        ).values_list("following_id", flat=True)
+        return self._feed(timeline.feed_queryset(self.request.user, self.get_rank()))
 
-        qs = (
-            Post.objects.filter(Q(author_id__in=following_ids) | Q(author=self.request.user))
-            .select_related("author")
+    async def aget_queryset(self):
+        return self._feed(await timeline.afeed_queryset(self.request.user, self.get_rank()))
+
+    def get_rank(self):
+        rank = self.request.query_params.get("rank", "latest")
+        if rank not in timeline.RANKS:
+            raise ValidationError({"rank": f"Must be one of: {', '.join(timeline.RANKS)}."})
+        self.cursor_ordering = timeline.RANK_ORDERING if rank == "top" else timeline.FEED_ORDERING
+        return rank
+
+    def _feed(self, qs):
+        return self.search(self.sparse_queryset(qs.select_related("author", "media")))
+
+
+class TrendingViewSet(TimedViewMixin, viewsets.GenericViewSet):
+    """
+    GET /api/trending/posts/?window=1h&limit=10  -> most engaged-with posts in the window
+    GET /api/trending/tags/?window=24h           -> hashtags with the most posts + engagement
+    Served from in-memory sliding-window counters (posts/trending.py), not the database.
+    """
+    serializer_class = PostSerializer
+    permission_classes = [permissions.AllowAny]
+    pagination_class = None
+
+    def _top(self, kind):
+        engine = trending.get_engine()
+        if engine is None:
+            raise NotFound("Trending is disabled.")
+        windows = list(engine.config["WINDOWS"])
+        window = self.request.query_params.get("window", windows[0])
+        if window not in windows:
+            raise ValidationError({"window": f"Must be one of: {', '.join(windows)}."})
+        try:
+            limit = int(self.request.query_params.get("limit", 10))
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+        limit = max(1, min(limit, engine.config["TOP_K"]))
+        return window, engine.top(kind, window, limit)
+
+    @action(detail=False, methods=["get"])
+    def posts(self, request):
+        window, top = self._top("posts")
+        found = Post.objects.select_related("author", "media").in_bulk([pid for pid, _ in top])
+        rows = [(found[pid], score) for pid, score in top if pid in found]
+        data = self.get_serializer([post for post, _ in rows], many=True).data
+        for item, (_, score) in zip(data, rows):
+            item["trending_score"] = score
+        return Response({"window": window, "results": data})
+
+    @action(detail=False, methods=["get"])
+    def tags(self, request):
+        window, top = self._top("tags")
+        return Response({"window": window, "results": [{"tag": tag, "score": score} for tag, score in top]})
+
+
+class TagViewSet(ReplicaReadMixin, TimedViewMixin, SparseFieldsViewMixin,
+                 mixins.ListModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    GET /api/tags/               -> hashtags, most used first (cursor-paginated)
+    GET /api/tags/{name}/        -> one hashtag with its stored posts_count
+    GET /api/tags/{name}/posts/  -> posts using it, newest first (cursor-paginated)
+    Served from the Tag / PostTag index kept by posts/tags.py; names are case-insensitive.
+    """
+    queryset = Tag.objects.all()
+    serializer_class = TagSerializer
+    permission_classes = [permissions.AllowAny]
+    lookup_field = "name"
+    lookup_value_regex = r"\w+"
+    cursor_ordering = ("posts_count", "id")
+
+    def get_serializer_class(self):
+        if self.action == "posts":
+            return PostSerializer
+        return super().get_serializer_class()
+
+    def get_object(self):
+        tag = get_object_or_404(self.get_queryset(), name=self.kwargs["name"].lower())
+        self.check_object_permissions(self.request, tag)
+        return tag
+
+    @action(detail=True, methods=["get"])
+    def posts(self, request, name=None):
+        qs = self.sparse_queryset(tags.posts_for(self.get_object()).select_related("author", "media"))
+        # keyset over the PostTag row: read straight off the (tag, -created_at, -post) index
+        self.cursor_ordering = tags.TAG_ORDERING
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(qs, many=True).data)
+
+
+class ExportViewSet(viewsets.ViewSet):
+    """
+    GET /api/export/                     -> my posts, comments, likes, bookmarks and follows as NDJSON
+    GET /api/export/?compression=gzip    -> the same, gzip-compressed (.ndjson.gz)
+    GET /api/export/?cursor=likes:1234   -> resume after the last line received
+    Streamed straight from the database (posts/export.py), as an async iterator
+    under ASGI.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def list(self, request):
+        cursor = request.query_params.get("cursor")
+        compression = request.query_params.get("compression", "")
+        if compression not in ("", "gzip"):
+            raise ValidationError({"compression": "Must be gzip (or omitted)."})
+        try:
+            export.parse_cursor(cursor)
+        except export.InvalidCursor as e:
+            raise ValidationError({"cursor": str(e)})
+
+        gzip = compression == "gzip"
+        stream = export.astream if isinstance(request._request, ASGIRequest) else export.stream
+        response = StreamingHttpResponse(
+            stream(request.user.pk, cursor, compress=gzip),
+            content_type="application/gzip" if gzip else "application/x-ndjson",
         )
+        filename = f"export-{request.user.username}.ndjson" + (".gz" if gzip else "")
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
 
-        q = self.request.query_params.get("q")
-        if q:
-            qs = qs.filter(content__icontains=q)
-        return qs
+
+class MediaUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Image uploads are not available."
+    default_code = "media_unavailable"
+
+
+class MediaViewSet(TimedViewMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    POST /api/media/  (multipart, field "file")  -> 201 with the stored upload,
+                                                    200 if the same image was uploaded before
+    GET  /api/media/{id}/                        -> its status and variant URLs once rendered
+    Put the returned `url` in a post's media_url or a profile's avatar_url; variants
+    are rendered in the background (posts/media.py). Uploads are rate-limited per user.
+    """
+    queryset = MediaAsset.objects.all()
+    serializer_class = MediaAssetSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scopes = {"create": "upload"}
+
+    def create(self, request):
+        if not media.available():
+            raise MediaUnavailable()
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError({"file": "An image file is required."})
+        limit = media.config()["MAX_UPLOAD_BYTES"]
+        if upload.size > limit:
+            raise ValidationError({"file": f"Images are limited to {limit} bytes."})
+        try:
+            asset, created = media.ingest(upload.read())
+        except imaging.InvalidImage as e:
+            raise ValidationError({"file": str(e)})
+        return Response(self.get_serializer(asset).data,
+                        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
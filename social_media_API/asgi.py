@@ -2,4 +2,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "social_media_API.settings")
+# async-native read views (posts/asyncviews.py) are opt-in with DJANGO_ASYNC_READS=1:
+# run_server_benchmark shows no throughput gain over the sync views on SQLite
+# each request's ORM calls run on a new thread, so persistent connections wouldn't be reused
+os.environ.setdefault("DJANGO_CONN_MAX_AGE", "0")
 application = get_asgi_application()
+
+# replay recent events into the trending counters, off the request path
+from posts import trending  # noqa: E402
+
+trending.warm()
@@ -1,4 +1,5 @@
 # social_media_API/settings.py
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -23,10 +24,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "posts.instrumentation.ServerTimingMiddleware",  # Server-Timing + per-request SQL stats
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "posts.dbrouting.ReadYourWritesMiddleware",  # keeps a writer's reads on the primary for a while
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -51,32 +54,192 @@ TEMPLATES = [
     },
 ]
 
+# Applied to every new SQLite connection (OPTIONS["init_command"])
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",        # readers don't block the writer
+    "synchronous": "NORMAL",      # fsync at checkpoints only (safe with WAL)
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,     # negative = KiB, i.e. 64 MiB page cache
+}
+_sqlite_init = "; ".join(f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items())
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # persistent connections; asgi.py sets 0 (ASGI runs each request's ORM calls on a fresh thread)
+        "CONN_MAX_AGE": int(os.environ.get("DJANGO_CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {"init_command": _sqlite_init},
     }
 }
 
+# Read replica: a second SQLite file kept in sync by `manage.py replicate_sqlite`.
+# Reads of the post/feed/comment endpoints go there (posts/dbrouting.py).
+if os.environ.get("DJANGO_READ_REPLICA"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.environ["DJANGO_READ_REPLICA"],
+        "OPTIONS": {"init_command": _sqlite_init + "; PRAGMA query_only=1"},
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["posts.dbrouting.ReadReplicaRouter"]
+DB_ROUTING = {
+    "PRIMARY": "default",
+    "STICKY_SECONDS": 5,  # how long a writer's reads stay on the primary
+    # cache for the sticky marks; must be shared by all workers ("shared" below when a
+    # replica is configured -- a process-local cache fails the startup check)
+    "ALIAS": "shared" if "replica" in DATABASES else "default",
+}
+
 # DRF defaults (JWT auth + pagination + filters)
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        # JWT, with the user + profile served from a short-lived cache
+        "users.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ),
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    # keyset pagination on (created_at, id); ?page=<n> falls back to page numbers
+    "DEFAULT_PAGINATION_CLASS": "posts.pagination.KeysetPagination",
     "PAGE_SIZE": 10,
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
         "rest_framework.filters.SearchFilter",
         "rest_framework.filters.OrderingFilter",
     ],
+    # Reverse proxies in front of the app that append to X-Forwarded-For. 0 = use
+    # REMOTE_ADDR (otherwise any client can pick its own IP for the per-IP rate limits).
+    "NUM_PROXIES": int(os.environ.get("DJANGO_NUM_PROXIES", 0)),
     # If you prefer endpoints without trailing slash, uncomment:
     # "DEFAULT_ROUTER_TRAILING_SLASH": False,
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "social-media-api",
+    },
+    # To share caches between workers on one host, point an alias at e.g.
+    # "django.core.cache.backends.filebased.FileBasedCache" (LOCATION: a directory)
+    # or a local memcached/redis, and select it below.
+}
+if "replica" in DATABASES:
+    # read-your-writes marks (DB_ROUTING) have to be seen by every worker
+    CACHES["shared"] = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("DJANGO_SHARED_CACHE_DIR", str(BASE_DIR / ".cache" / "shared")),
+    }
+
+# Shared response cache for anonymous reads (posts/responsecache.py)
+RESPONSE_CACHE = {
+    "ENABLED": True,
+    "ALIAS": "default",
+    "TIMEOUT": 60,        # seconds
+    "LOCK_TIMEOUT": 5,    # stampede lock
+    "WAIT": 2.0,          # how long concurrent misses wait for the first one
+}
+
+# Per-request timing (posts/instrumentation.py). Log lines go to the
+# "posts.instrumentation" logger at INFO; add a handler in LOGGING to ship them.
+SERVER_TIMING = {
+    "ENABLED": True,
+    "SAMPLE_RATE": 1.0 if DEBUG else 0.05,  # fraction of requests instrumented
+    "HEADER": True,                         # emit Server-Timing
+    "LOG": True,                            # emit one JSON log line
+    "REPEAT_THRESHOLD": 3,                  # identical statements flagged as N+1
+}
+
+# Authenticated-user cache (users/usercache.py); uses CACHES[ALIAS]
+AUTH_USER_CACHE = {
+    "ALIAS": "default",
+    "TTL": 60,  # seconds, capped at 300
+}
+
+# Feed fan-out (posts/timeline.py)
+FEED_FANOUT_MAX_FOLLOWERS = 10_000  # above this, an author's posts are merged at read time
+FEED_FOLLOW_BACKFILL = 200          # posts copied into a timeline on a new follow
+
+# Ranked feed, ?rank=top (posts/ranking.py); `manage.py rank_feed` recomputes periodically.
+FEED_RANKING = {
+    "HALF_LIFE_HOURS": 24,   # an event's weight halves every HALF_LIFE_HOURS
+    "WEIGHTS": {"post": 1.0, "like": 1.0, "comment": 3.0, "bookmark": 2.0},
+    "AFFINITY_WEIGHT": 0.5,  # reader/author multiplier = 1 + weight * ln(1 + interactions)
+    "AFFINITY_DAYS": 30,
+}
+
+# Trending posts / hashtags (posts/trending.py): in-memory sliding-window count-min
+# sketches. Memory ~ 8 bytes x WIDTH x DEPTH x (buckets + 1) per window, for posts and
+# for tags (~5 MB as below); overcount <= e / WIDTH x window events, w.p. 1 - e^-DEPTH.
+# `manage.py run_trending_benchmark` shows the accuracy/memory trade-off.
+TRENDING = {
+    "WIDTH": 2048,
+    "DEPTH": 4,
+    "TOP_K": 50,
+    "WINDOWS": {"1h": (3600, 12), "24h": (86400, 24)},  # name -> (seconds, buckets)
+    "RESYNC_SECONDS": None,  # set (e.g. 300) with several workers: each only sees its own writes
+}
+
+# Follow-graph cache (posts/followgraph.py). BACKEND "process" is a per-worker LRU, only
+# consistent within one worker (others see a follow/unfollow up to TTL late); with several
+# workers use "django", which shares entries through CACHES[ALIAS] (e.g. a FileBasedCache).
+FOLLOW_GRAPH_CACHE = {
+    "BACKEND": "process",
+    "ALIAS": "default",
+    "TTL": 300,                        # seconds
+    "MAX_ENTRIES": 50_000,
+    "MAX_BYTES": 64 * 1024 * 1024,     # memory ceiling for the process backend
+}
+
+# Write-behind likes (posts/likebuffer.py): buffer like/unlike and write in batches
+LIKE_WRITE_BEHIND = {
+    "ENABLED": False,
+    "MAX_BATCH": 500,        # intents per flush transaction / size trigger
+    "FLUSH_INTERVAL": 0.25,  # seconds between background flushes
+    "MAX_PENDING": 50_000,   # writers flush inline past this depth
+}
+
+# Token-bucket rate limits on writes (posts/ratelimit.py): "<n>/<s|min|h|day>" per user
+# (per IP when anonymous) = bursts of n, refilled at n per period. BACKEND "process"
+# keeps buckets per worker; "django" shares them through CACHES[ALIAS].
+RATE_LIMITS = {
+    "ENABLED": True,
+    "BACKEND": "process",
+    "ALIAS": "default",
+    "RATES": {
+        "engagement": "120/min",  # like / unlike / bookmark / unbookmark
+        "batch": "20/min",        # POST /api/posts/batch/
+        "comment": "20/min",      # POST /api/comments/
+        "auth": "10/min",         # POST /api/token/, per IP
+        "upload": "30/h",         # POST /api/media/
+    },
+}
+
+# Image uploads (posts/media.py): originals stored once per sha256 under MEDIA_ROOT,
+# resized / re-encoded variants rendered off the request path by WORKERS processes
+# (0 renders inline, in the committing request). Needs Pillow.
+MEDIA_PIPELINE = {
+    "WORKERS": 2,
+    "FORMAT": "WEBP",   # JPEG where Pillow lacks WebP
+    "QUALITY": 80,
+    "MAX_UPLOAD_BYTES": 10 * 1024 * 1024,
+    "VARIANTS": {       # name -> (width, height, crop)
+        "thumb": (160, 160, True),
+        "feed": (1080, 1350, False),
+        "full": (2048, 2048, False),
+    },
+}
+
+# Async-native list/retrieve for posts, feed and comments (posts/asyncviews.py).
+# Opt-in (DJANGO_ASYNC_READS=1) and only useful under ASGI; WSGI workers keep the
+# plain sync views either way.
+ASYNC_READS = os.environ.get("DJANGO_ASYNC_READS", "0") == "1"
+
+# Full-text search (posts/search.py): score boost per day of recency on top of bm25
+SEARCH_RECENCY_WEIGHT = 0.05
+
 LANGUAGE_CODE = "en-us"
 TIME_ZONE = "Africa/Addis_Ababa"   # friendlier locally
 USE_I18N = True
@@ -7,9 +7,15 @@ from posts.views import (
     CommentViewSet,  
     FollowViewSet,
     FeedViewSet,
+    TrendingViewSet,
+    ExportViewSet,
+    TagViewSet,
+    MediaViewSet,
 )
 
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from users.views import ThrottledTokenObtainPairView, UserViewSet
+
+from rest_framework_simplejwt.views import TokenRefreshView
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -18,11 +24,16 @@ router.register(r"posts", PostViewSet, basename="posts")
 router.register(r"comments", CommentViewSet, basename="comments")  # 👈 this creates /api/comments/
 router.register(r"follow", FollowViewSet, basename="follow")
 router.register(r"feed",  FeedViewSet,  basename="feed")
+router.register(r"trending", TrendingViewSet, basename="trending")
+router.register(r"users", UserViewSet, basename="users")
+router.register(r"tags", TagViewSet, basename="tags")
+router.register(r"export", ExportViewSet, basename="export")
+router.register(r"media", MediaViewSet, basename="media")
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include(router.urls)),
-    path("api/token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
+    path("api/token/", ThrottledTokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
 ]
 
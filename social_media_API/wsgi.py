@@ -3,3 +3,8 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "social_media_API.settings")
 application = get_wsgi_application()
+
+# replay recent events into the trending counters, off the request path
+from posts import trending  # noqa: E402
+
+trending.warm()
@@ -0,0 +1,65 @@
+from django.contrib.auth.models import User
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from . import usercache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that serves the user (and request.user.profile) from
+    users/usercache.py instead of loading the row on every request.
+    Active and revoked-token checks still run against the cached snapshot.
+    `aauthenticate` is the same for async views (posts/asyncviews.py).
+    """
+
+    def _user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+    def get_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        user = usercache.get(user_id)
+        if user is None:
+            try:
+                user = usercache.load(user_id)
+            except (User.DoesNotExist, ValueError, TypeError) as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            usercache.store(user)
+        return self._check(user, validated_token)
+
+    async def aget_user(self, validated_token):
+        user_id = self._user_id(validated_token)
+        user = await usercache.aget(user_id)
+        if user is None:
+            try:
+                user = await usercache.aload(user_id)
+            except (User.DoesNotExist, ValueError, TypeError) as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            await usercache.astore(user)
+        return self._check(user, validated_token)
+
+    def _check(self, user, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != usercache.password_digest(user):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        # token validation is CPU only; the user lookup is the one awaitable step
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
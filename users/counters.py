@@ -0,0 +1,73 @@
+# users/counters.py
+"""
+Helpers for the denormalized follow counts stored on Profile
+(followers_count, following_count).
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# counter field on Profile -> Follow column that points at the profile's user
+COUNTER_FIELDS = {
+    "followers_count": "following",
+    "following_count": "follower",
+}
+
+
+def _count_subquery(follow_model, column, user_ref):
+    return Coalesce(
+        Subquery(
+            follow_model.objects.filter(**{column: user_ref})
+            .order_by()
+            .values(column)
+            .annotate(n=Count("pk"))
+            .values("n"),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def ensure(profile_model, follow_model, user_id):
+    """The user's profile, created with counts taken from the Follow table if missing."""
+    profile, _ = profile_model.objects.get_or_create(user_id=user_id, defaults={
+        field: follow_model.objects.filter(**{column: user_id}).count()
+        for field, column in COUNTER_FIELDS.items()
+    })
+    return profile
+
+
+def bump(profile_model, follow_model, user_id, field, delta):
+    """
+    Atomically add `delta` to Profile.<field> (UPDATE ... SET x = x + n); decrements
+    never go below zero. A user without a profile gets one, counted from scratch, on
+    increments only: decrements also come from deleting the user, profile first.
+    """
+    if not delta:
+        return 0
+    qs = profile_model.objects.filter(user_id=user_id)
+    if delta < 0:
+        return qs.filter(**{f"{field}__gte": -delta}).update(**{field: F(field) + delta})
+    updated = qs.update(**{field: F(field) + delta})
+    if not updated:
+        ensure(profile_model, follow_model, user_id)
+    return updated
+
+
+def create_missing(profile_model, users, batch_size=1000):
+    """Give each user in the `users` queryset that has no profile an empty one; returns how many."""
+    missing = users.filter(profile__isnull=True).values_list("pk", flat=True)
+    profiles = [profile_model(user_id=pk) for pk in missing]
+    profile_model.objects.bulk_create(profiles, batch_size=batch_size, ignore_conflicts=True)
+    return len(profiles)
+
+
+def rebuild(profile_model, follow_model, queryset=None):
+    """
+    Recompute both counts from the Follow table in a single UPDATE.
+    Works with migration apps too. Returns the number of profiles updated.
+    """
+    qs = queryset if queryset is not None else profile_model.objects.all()
+    return qs.update(**{
+        field: _count_subquery(follow_model, column, OuterRef("user_id"))
+        for field, column in COUNTER_FIELDS.items()
+    })
@@ -0,0 +1,24 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from posts.models import Follow
+from users import counters
+from users.models import Profile
+
+
+class Command(BaseCommand):
+    help = "Recompute Profile.followers_count / following_count from scratch (creating missing profiles)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", dest="users",
+                            help="Only rebuild the given user id (repeatable).")
+
+    def handle(self, *args, **options):
+        users, qs = User.objects.all(), Profile.objects.all()
+        if options["users"]:
+            users, qs = users.filter(pk__in=options["users"]), qs.filter(user_id__in=options["users"])
+        created = counters.create_missing(Profile, users)
+        updated = counters.rebuild(Profile, Follow, queryset=qs)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt follow counts for {updated} profile(s) ({created} created)."
+        ))
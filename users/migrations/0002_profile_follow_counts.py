@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:08
+
+from django.db import migrations, models
+
+
+def backfill_counts(apps, schema_editor):
+    from users import counters
+
+    counters.rebuild(apps.get_model("users", "Profile"), apps.get_model("posts", "Follow"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('posts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
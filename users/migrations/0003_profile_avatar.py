@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_media_assets'),
+        ('users', '0002_profile_follow_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='avatar',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.mediaasset'),
+        ),
+    ]
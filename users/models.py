@@ -5,6 +5,14 @@ class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="profile")
     bio = models.CharField(max_length=280, blank=True)
     avatar_url = models.URLField(blank=True)
+    # the uploaded image avatar_url points at, with its resized variants (posts/media.py)
+    avatar = models.ForeignKey(
+        "posts.MediaAsset", null=True, blank=True, on_delete=models.SET_NULL, related_name="+", editable=False
+    )
+    # Denormalized follow counts (kept in sync by users/signals.py,
+    # rebuilt by `manage.py rebuild_follow_counts`)
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
+    following_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f"Profile({self.user.username})"
@@ -1,12 +1,18 @@
 # users/serializers.py
 from django.contrib.auth.models import User
 from rest_framework import serializers
+from posts import media
 from .models import Profile
 
 class ProfileSerializer(serializers.ModelSerializer):
+    # resized variants of the uploaded image avatar_url points at (posts/media.py)
+    avatar = serializers.SerializerMethodField()
     class Meta:
         model = Profile
-        fields = ["bio", "avatar_url"]
+        fields = ["bio", "avatar_url", "avatar", "followers_count", "following_count"]
+
+    def get_avatar(self, obj):
+        return media.variant_urls(obj.avatar)
 
 class UserSerializer(serializers.ModelSerializer):
     profile = ProfileSerializer(read_only=True)
@@ -14,6 +20,13 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ["id", "username", "email", "profile"]
 
+class PublicUserSerializer(serializers.ModelSerializer):
+    """Another user's profile header (no email)."""
+    profile = ProfileSerializer(read_only=True)
+    class Meta:
+        model = User
+        fields = ["id", "username", "profile"]
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
     class Meta:
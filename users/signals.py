@@ -0,0 +1,54 @@
+# users/signals.py
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from posts import media
+from posts.models import Follow
+
+from . import counters, usercache
+from .models import Profile
+
+
+# -------- Authenticated-user cache --------
+# covers profile edits, deactivation (is_active) and password changes (set_password + save)
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    usercache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    usercache.invalidate(instance.user_id)
+
+
+# -------- Avatar (posts/media.py) --------
+
+@receiver(pre_save, sender=Profile)
+def profile_link_avatar(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None:
+        instance.avatar_id = media.asset_for_url(instance.avatar_url)
+
+
+# -------- Follow counts --------
+# post_delete also fires for follows cascaded from a deleted user. bump() is a
+# queryset.update(), so the cached users (and their profile counts) are dropped here.
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(Profile, Follow, instance.follower_id, "following_count", 1)
+        counters.bump(Profile, Follow, instance.following_id, "followers_count", 1)
+        usercache.invalidate(instance.follower_id)
+        usercache.invalidate(instance.following_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump(Profile, Follow, instance.follower_id, "following_count", -1)
+    counters.bump(Profile, Follow, instance.following_id, "followers_count", -1)
+    usercache.invalidate(instance.follower_id)
+    usercache.invalidate(instance.following_id)
@@ -1,3 +1,121 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
 from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from posts.models import Follow
+
+from . import usercache
+from .models import Profile
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("alice")
+        Profile.objects.create(user=self.user, bio="hi")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def test_user_is_loaded_once(self):
+        # first request loads user + profile in one query, the page is another
+        with self.assertNumQueries(2):
+            self.client.get("/api/posts/bookmarks/")
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/posts/bookmarks/")
+        self.assertEqual(res.status_code, 200)
+
+    def test_deactivation_invalidates(self):
+        self.client.get("/api/posts/bookmarks/")
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get("/api/posts/bookmarks/").status_code, 401)
+
+    def test_password_hash_is_not_cached(self):
+        self.user.set_password("pass12345")
+        self.user.save()
+        # simplejwt rebinds api_settings on setting_changed; imported references keep the old object
+        with mock.patch.object(api_settings, "CHECK_REVOKE_TOKEN", True):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+            self.assertEqual(client.get("/api/posts/bookmarks/").status_code, 200)
+            self.assertIsNone(usercache.get(self.user.pk).password)
+            # revoked-token check against the cached digest
+            self.assertEqual(client.get("/api/posts/bookmarks/").status_code, 200)
+            self.user.set_password("changed12345")
+            self.user.save()
+            self.assertEqual(client.get("/api/posts/bookmarks/").status_code, 401)
+
+    def test_profile_save_invalidates(self):
+        self.client.get("/api/posts/bookmarks/")
+        profile = self.user.profile
+        profile.bio = "changed"
+        profile.save()
+        with self.assertNumQueries(2):
+            self.client.get("/api/posts/bookmarks/")
+
+    def test_follows_invalidate_both_users(self):
+        bob = User.objects.create_user("bob")
+        self.client.get("/api/posts/bookmarks/")
+        usercache.store(bob)
+        follow = Follow.objects.create(follower=bob, following=self.user)
+        self.assertEqual((usercache.get(self.user.pk), usercache.get(bob.pk)), (None, None))
+
+        self.client.get("/api/posts/bookmarks/")
+        self.assertEqual(usercache.get(self.user.pk).profile.followers_count, 1)
+        follow.delete()
+        self.assertIsNone(usercache.get(self.user.pk))
+
+
+class FollowDirectoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user("alice")
+        Profile.objects.create(user=self.alice)
+        self.fans = [User.objects.create_user(f"fan{n}") for n in range(4)]
+        for fan in self.fans:
+            Follow.objects.create(follower=fan, following=self.alice)
+        self.client = APIClient()
+
+    def test_counts_follow_and_unfollow(self):
+        self.alice.profile.refresh_from_db()
+        self.assertEqual((self.alice.profile.followers_count, self.alice.profile.following_count), (4, 0))
+        # fans had no profile: created on their first follow, counted from the Follow table
+        self.assertEqual(Profile.objects.get(user=self.fans[0]).following_count, 1)
+
+        Follow.objects.get(follower=self.fans[0]).delete()
+        Follow.objects.create(follower=self.alice, following=self.fans[1])
+        with self.assertNumQueries(1):
+            data = self.client.get(f"/api/users/{self.alice.id}/").data
+        self.assertEqual((data["profile"]["followers_count"], data["profile"]["following_count"]), (3, 1))
+        self.assertNotIn("email", data)
+
+        # deleting a user cascades their follows into everyone else's counts
+        self.fans[2].delete()
+        self.alice.profile.refresh_from_db()
+        self.assertEqual(self.alice.profile.followers_count, 2)
+
+    def test_directory_pages(self):
+        seen, url = [], f"/api/users/{self.alice.id}/followers/?page_size=3"
+        while url:
+            data = self.client.get(url).data
+            seen += [row["username"] for row in data["results"]]
+            url = data["next"]
+        self.assertEqual(seen, ["fan3", "fan2", "fan1", "fan0"])
+        following = self.client.get(f"/api/users/{self.fans[0].id}/following/").data["results"]
+        self.assertEqual([(row["user_id"], row["username"]) for row in following], [(self.alice.id, "alice")])
+        self.assertEqual(self.client.get("/api/users/999999/followers/").status_code, 404)
 
-# Create your tests here.
+    def test_rebuild_command(self):
+        Profile.objects.update(followers_count=0, following_count=7)
+        call_command("rebuild_follow_counts", stdout=StringIO())
+        self.assertEqual(
+            sorted(Profile.objects.values_list("followers_count", "following_count")),
+            [(0, 1)] * 4 + [(4, 0)],
+        )
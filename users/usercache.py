@@ -0,0 +1,83 @@
+# users/usercache.py
+"""
+Short-lived cache of authenticated users (with their profile) keyed by user id.
+Entries are dropped on User/Profile save or delete and on follow/unfollow, whose
+count updates bypass Profile signals (users/signals.py); anything else that
+bypasses signals (queryset.update) is bounded by the TTL.
+
+The password hash is never cached: entries hold its digest for the revoked-token
+check instead (password_digest), and password is None, so saving a cached user
+fails rather than overwriting the stored hash.
+"""
+import copy
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+DEFAULTS = {
+    "ALIAS": "default",
+    "TTL": 60,          # seconds
+    "MAX_TTL": 300,
+    "KEY_PREFIX": "authuser",
+}
+
+
+def _config():
+    return {**DEFAULTS, **getattr(settings, "AUTH_USER_CACHE", {})}
+
+
+def _cache():
+    return caches[_config()["ALIAS"]]
+
+
+def _key(user_id):
+    return f"{_config()['KEY_PREFIX']}:{user_id}"
+
+
+def load(user_id):
+    """Fetch the user and profile in one query (raises User.DoesNotExist)."""
+    return User.objects.select_related("profile").get(pk=user_id)
+
+
+async def aload(user_id):
+    return await User.objects.select_related("profile").aget(pk=user_id)
+
+
+def get(user_id):
+    return _cache().get(_key(user_id))
+
+
+async def aget(user_id):
+    return await _cache().aget(_key(user_id))
+
+
+def _timeout():
+    config = _config()
+    return min(config["TTL"], config["MAX_TTL"])
+
+
+def _snapshot(user):
+    snapshot = copy.copy(user)
+    snapshot._password_digest = get_md5_hash_password(user.password)
+    snapshot.password = None
+    return snapshot
+
+
+def password_digest(user):
+    """What CHECK_REVOKE_TOKEN compares with the token's claim, for cached and loaded users."""
+    digest = getattr(user, "_password_digest", None)
+    return digest if digest is not None else get_md5_hash_password(user.password)
+
+
+def store(user):
+    _cache().set(_key(user.pk), _snapshot(user), _timeout())
+
+
+async def astore(user):
+    await _cache().aset(_key(user.pk), _snapshot(user), _timeout())
+
+
+def invalidate(user_id):
+    _cache().delete(_key(user_id))
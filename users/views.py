@@ -1,11 +1,21 @@
 # users/views.py
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
-from rest_framework import generics, permissions
+from django.db.models import F
+from rest_framework import generics, mixins, permissions, viewsets
 from rest_framework.authtoken.models import Token
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .serializers import RegisterSerializer, UserSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView
+
+from posts.instrumentation import TimedViewMixin
+from posts.ratelimit import TokenBucketThrottle
+from posts.models import Follow
+
+from . import counters
+from .models import Profile
+from .serializers import PublicUserSerializer, RegisterSerializer, UserSerializer
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -19,6 +29,8 @@ class MeView(APIView):
 
 class ObtainAuthTokenView(APIView):
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [TokenBucketThrottle]  # per IP (posts/ratelimit.py)
+    throttle_scope = "auth"
     def post(self, request):
         user = authenticate(
             username=request.data.get("username"),
@@ -28,3 +40,51 @@ class ObtainAuthTokenView(APIView):
             return Response({"detail": "Invalid credentials"}, status=400)
         token, _ = Token.objects.get_or_create(user=user)
         return Response({"token": token.key})
+
+
+
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    """POST /api/token/ with the same per-IP limit as ObtainAuthTokenView."""
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = "auth"
+
+
+class UserViewSet(TimedViewMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    GET /api/users/{id}/            -> profile header (bio, followers_count, following_count)
+    GET /api/users/{id}/followers/  -> who follows them, newest first (cursor-paginated)
+    GET /api/users/{id}/following/  -> who they follow, newest first (cursor-paginated)
+    Counts are stored on Profile; directory rows are values() dicts
+    (user_id, username, created_at) read over the Follow (user, created_at) indexes.
+    """
+    queryset = User.objects.select_related("profile", "profile__avatar")
+    serializer_class = PublicUserSerializer
+
+    def get_object(self):
+        user = super().get_object()
+        if not hasattr(user, "profile"):
+            user.profile = counters.ensure(Profile, Follow, user.pk)
+        return user
+
+    def _directory(self, column, other):
+        user_id = self.get_object().pk
+        qs = Follow.objects.filter(**{column: user_id}).values(
+            "id", "created_at", user_id=F(other), username=F(f"{other}__username")
+        )
+        self.cursor_ordering = ("created_at", "id")
+        page = self.paginate_queryset(qs)
+        rows = [
+            {"user_id": row["user_id"], "username": row["username"], "created_at": row["created_at"]}
+            for row in (page if page is not None else qs)
+        ]
+        if page is not None:
+            return self.get_paginated_response(rows)
+        return Response(rows)
+
+    @action(detail=True, methods=["get"])
+    def followers(self, request, pk=None):
+        return self._directory("following", "follower")
+
+    @action(detail=True, methods=["get"])
+    def following(self, request, pk=None):
+        return self._directory("follower", "following")